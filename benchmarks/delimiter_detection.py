@@ -0,0 +1,129 @@
+"""
+Time delimiter detection with the consistent-count fast path against
+clevercsv alone, on the csv files of the test data and generated files of
+a few dialects, and check that no file gets a different delimiter.
+
+    python benchmarks/delimiter_detection.py [--runs N]
+"""
+
+import argparse
+import glob
+import importlib
+import io
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import clevercsv  # type: ignore # NOQA: E402
+
+fables_parse = importlib.import_module("fables.parse")
+
+DATA_DIR = os.path.join(ROOT, "tests", "integration", "data")
+
+
+def clevercsv_delimiter(data: bytes) -> str:
+    """How delimiters were sniffed before the fast path: clevercsv on the
+    first 4 KB."""
+    sample = data[: 4 * 1024].decode("utf-8")
+    dialect = clevercsv.Sniffer().sniff(
+        sample, delimiters="".join(fables_parse.ACCEPTED_DELIMITERS)
+    )
+    return str(dialect.delimiter)
+
+
+def generated_file(rng: random.Random, delimiter: str, kind: str) -> bytes:
+    num_cols = rng.randint(3, 12)
+    header = delimiter.join(f"Column {i}" for i in range(num_cols))
+    rows = []
+    for _ in range(rng.randint(50, 400)):
+        cells = []
+        for i in range(num_cols):
+            if kind == "quoted" and i % 3 == 0:
+                cells.append(f'"Smith, J{delimiter}r. ""Jack"""')
+            elif kind == "long":
+                cells.append("x" * rng.randint(200, 2000))
+            elif kind == "decimal_commas" and delimiter != ",":
+                cells.append(f"{rng.randint(0, 9999)},{rng.randint(0, 99):02d}")
+            else:
+                cells.append(str(rng.randint(0, 10**6)))
+        rows.append(delimiter.join(cells))
+    lines = [header] + rows
+    if kind == "preamble":
+        lines = ["Payroll export", "Generated 2020-03-31 12:00", ""] + lines
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def corpus() -> List[Tuple[str, bytes, Optional[str]]]:
+    """(name, data, the delimiter it was written with, if known)"""
+    files: List[Tuple[str, bytes, Optional[str]]] = []
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, "*"))):
+        if os.path.splitext(path)[1] in {".csv", ".tsv", ".txt"}:
+            with open(path, "rb") as f:
+                files.append((os.path.basename(path), f.read(), None))
+    rng = random.Random(0)
+    for delimiter in [",", ";", "\t", "|"]:
+        for kind in ["plain", "quoted", "long", "decimal_commas", "preamble"]:
+            for i in range(4):
+                name = f"generated_{kind}_{ord(delimiter)}_{i}.csv"
+                files.append((name, generated_file(rng, delimiter, kind), delimiter))
+    return files
+
+
+def median_seconds(detect: Callable[[bytes], str], data: bytes, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        detect(data)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    def tiered_delimiter(data: bytes) -> str:
+        return str(fables_parse.sniff_delimiter(io.BytesIO(data), None))
+
+    totals: Dict[str, float] = {"clevercsv": 0.0, "tiered": 0.0}
+    fast_path = 0
+    regressions = []
+    wrong_before = wrong_after = 0
+    files = corpus()
+    for name, data, written_with in files:
+        before = clevercsv_delimiter(data)
+        after = tiered_delimiter(data)
+        totals["clevercsv"] += median_seconds(clevercsv_delimiter, data, args.runs)
+        totals["tiered"] += median_seconds(tiered_delimiter, data, args.runs)
+        sample = fables_parse._sniff_sample(io.BytesIO(data), "utf-8")
+        fast_path += fables_parse.consistent_delimiter(sample) is not None
+        if written_with is None:
+            if after != before:
+                regressions.append(f"{name}: {before!r} -> {after!r}")
+        else:
+            wrong_before += before != written_with
+            wrong_after += after != written_with
+            if after != written_with and before == written_with:
+                regressions.append(f"{name}: {before!r} -> {after!r}")
+
+    print(f"{len(files)} files, {fast_path} decided by the fast path")
+    for method, seconds in totals.items():
+        print(f"{method + ':':11} {seconds / len(files) * 1e6:9.1f} us/file")
+    print(f"speedup:    {totals['clevercsv'] / totals['tiered']:9.1f}x")
+    print(
+        f"wrong delimiters on generated files: {wrong_before} before, {wrong_after} after"
+    )
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Time `import fables` followed by `fables.detect()` on a zip, in fresh
+interpreters, and list the heavy dependencies that got imported. None of
+them should be: detection only needs the standard library and libmagic.
+
+    python benchmarks/import_time.py [path] [--runs N]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = [
+    "pandas",
+    "numpy",
+    "clevercsv",
+    "xlrd",
+    "pyxlsb",
+    "cchardet",
+    "msoffcrypto",
+]
+
+DEFAULT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..",
+    "tests",
+    "integration",
+    "data",
+    "basic.zip",
+)
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import fables
+imported = time.perf_counter()
+fables.detect(sys.argv[1])
+detected = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "detect": detected - imported,
+    "heavy": [name for name in sys.argv[2:] if name in sys.modules],
+}))
+"""
+
+
+def run_once(path: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, path] + HEAVY_MODULES,
+        check=True,
+        stdout=subprocess.PIPE,
+        cwd=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."),
+    ).stdout
+    return json.loads(output)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path", nargs="?", default=DEFAULT_PATH)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [run_once(args.path) for _ in range(args.runs)]
+    import_ms = statistics.median(run["import"] for run in runs) * 1000
+    detect_ms = statistics.median(run["detect"] for run in runs) * 1000
+    heavy = sorted({name for run in runs for name in run["heavy"]})
+    print(f"import fables:   {import_ms:7.1f} ms (median of {args.runs})")
+    print(f"fables.detect(): {detect_ms:7.1f} ms")
+    print(f"heavy modules imported: {', '.join(heavy) or 'none'}")
+    return 1 if heavy else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
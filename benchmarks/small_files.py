@@ -0,0 +1,95 @@
+"""
+Parse a zip of many tiny csv files, with and without the small-file path,
+and report files/second. The files are split between `--layouts` headers,
+like the pieces of a few exports.
+
+    python benchmarks/small_files.py [--files N] [--rows N] [--layouts N] [--runs N]
+"""
+
+import argparse
+import importlib
+import io
+import os
+import random
+import statistics
+import sys
+import time
+import zipfile
+from typing import Callable, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import fables  # NOQA: E402
+
+fables_parse = importlib.import_module("fables.parse")
+
+
+def tiny_csv_zip(num_files: int, num_rows: int, num_layouts: int) -> bytes:
+    rng = random.Random(0)
+    headers = [
+        f"Employee ID,Job Title {layout},Base Salary,Start Date"
+        for layout in range(num_layouts)
+    ]
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for i in range(num_files):
+            lines = [headers[i % num_layouts]] + [
+                f"{rng.randint(1, 99999)},Analyst {rng.randint(1, 5)},"
+                f"{rng.randint(30000, 150000)}.50,2020-{rng.randint(1, 12):02d}-01"
+                for _ in range(num_rows)
+            ]
+            zf.writestr(f"export/part_{i:05d}.csv", "\n".join(lines) + "\n")
+    return buffer.getvalue()
+
+
+def parse_tables(data: bytes) -> List["fables.Table"]:
+    results = fables.parse(io.BytesIO(data), stream_file_name="export.zip")
+    return [table for result in results for table in result.tables]
+
+
+def files_per_second(parse: Callable[[], object], num_files: int, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        parse()
+        times.append(time.perf_counter() - start)
+    return num_files / statistics.median(times)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--rows", type=int, default=40)
+    parser.add_argument("--layouts", type=int, default=3)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    data = tiny_csv_zip(args.files, args.rows, args.layouts)
+    print(
+        f"{args.files} csv files of {args.rows} rows ({args.layouts} layouts), "
+        f"{len(data) / 1024:.0f} KB zipped"
+    )
+
+    small_file_size = fables_parse.SMALL_FILE_SIZE
+    fast_tables = parse_tables(data)
+    fast = files_per_second(lambda: parse_tables(data), args.files, args.runs)
+    fables_parse.SMALL_FILE_SIZE = 0
+    try:
+        slow_tables = parse_tables(data)
+        slow = files_per_second(lambda: parse_tables(data), args.files, args.runs)
+    finally:
+        fables_parse.SMALL_FILE_SIZE = small_file_size
+
+    same = len(fast_tables) == len(slow_tables) == args.files and all(
+        fast_table.df.equals(slow_table.df)
+        and list(fast_table.df.columns) == list(slow_table.df.columns)
+        for fast_table, slow_table in zip(fast_tables, slow_tables)
+    )
+    print(f"small-file path:    {fast:8.1f} files/s")
+    print(f"without it:         {slow:8.1f} files/s ({fast / slow:.2f}x)")
+    print(f"same tables: {'yes' if same else 'NO'}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,43 +3,67 @@ Define functions, classes, and constants that are exposed to the client,
 enabling calls to fables.* .
 """
 
-from fables.api import detect, parse
+from fables.api import detect, parse, register_node_type
 from fables.tree import (
     StreamManager,
     FileNode,
     MimeTypeFileNode,
     Directory,
     Zip,
+    Tar,
+    CompressedFile,
+    Gzip,
+    Bz2,
+    Xz,
     Csv,
     Xls,
     Xlsx,
     Xlsb,
     Skip,
+    NodeTypeRegistry,
+    NODE_TYPES,
     mimetype_from_stream,
     mimetype_and_extension,
 )
 from fables.table import Table
-from fables.errors import ParseError, ExtractError
+from fables.dtypes import DtypeInference
+from fables.layouts import LayoutCache
+from fables.streams import BlockCachedStream
+from fables.walk import DirectoryFilter
+from fables.errors import ParseError, ExtractError, ParseTimeoutError
 from fables.constants import OS_PATTERNS_TO_SKIP, MAX_FILE_SIZE
 
 __all__ = [
     "detect",
     "parse",
+    "register_node_type",
     "StreamManager",
     "FileNode",
     "MimeTypeFileNode",
     "Directory",
     "Zip",
+    "Tar",
+    "CompressedFile",
+    "Gzip",
+    "Bz2",
+    "Xz",
     "Csv",
     "Xls",
     "Xlsx",
     "Xlsb",
     "Skip",
+    "NodeTypeRegistry",
+    "NODE_TYPES",
     "mimetype_from_stream",
     "mimetype_and_extension",
     "Table",
+    "DtypeInference",
+    "LayoutCache",
+    "BlockCachedStream",
+    "DirectoryFilter",
     "ParseError",
     "ExtractError",
+    "ParseTimeoutError",
     "OS_PATTERNS_TO_SKIP",
     "MAX_FILE_SIZE",
 ]
@@ -0,0 +1,10 @@
+"""
+Enables `python -m fables`, the same as the `fables` console script.
+"""
+
+import sys
+
+from fables.cli import main
+
+
+sys.exit(main())
@@ -1,16 +1,30 @@
 """
 Implements the two main function entry points for fables:
-`parse()` and `detect()`.
+`parse()` and `detect()`, and `register_node_type()` for adding
+file formats.
 """
 
 import os
-from io import BufferedIOBase
-from typing import Any, Dict, IO, Iterable, Optional, Tuple, Union
+import threading
+from io import BufferedIOBase, RawIOBase
+from typing import Any, Dict, IO, Iterable, List, Optional, Tuple, Type, Union
 
-from fables.constants import MAX_FILE_SIZE
-from fables.parse import ParseVisitor
+from fables.constants import MAX_FILE_SIZE, NUM_BYTES_FOR_MIMETYPE_DETECTION
+from fables.dtypes import DtypeInference
+from fables.isolation import ISOLATIONS
+from fables.layouts import LayoutCache
+from fables.parse import ParseVisitor, RowPredicate, VisitMethod
+from fables.passwords import Passwords
 from fables.results import ParseResult
-from fables.tree import FileNode, node_from_file
+from fables.streams import StreamSpooler, cached_stream, needs_spooling
+from fables.tree import (
+    NODE_TYPES,
+    FileNode,
+    MimeTypeFileNode,
+    mimetype_from_bytes,
+    node_from_file,
+)
+from fables.walk import DirectoryFilter
 
 
 def _check_file_size(name: str) -> Tuple[bool, int]:
@@ -29,9 +43,13 @@ def _parse_user_input(
     io: Union[str, IO[bytes], None],
     calling_func_name: str,
     password: Optional[str] = None,
-    passwords: Optional[Dict[str, str]] = {},
+    passwords: Optional[Passwords] = None,
     stream_file_name: Optional[str] = None,
-) -> Tuple[Optional[str], Optional[IO[bytes]], Dict[str, str]]:
+) -> Tuple[Optional[str], Optional[IO[bytes]], Passwords, Optional[str]]:
+    """Validate the input, and return its name, stream, passwords and, for
+    streams that had to be spooled, their mimetype.
+    """
+    mimetype = None
     if isinstance(io, str):
         stream = None
         name = io
@@ -41,14 +59,30 @@ def _parse_user_input(
             )
         size_is_too_big, size = _check_file_size(name)
     else:
-        if not isinstance(io, BufferedIOBase):
+        if not isinstance(io, (BufferedIOBase, RawIOBase)):
             raise TypeError(
                 f"Argument io for '{calling_func_name}' must be instance of "
-                + "str or a subclass of 'io.BufferedIOBase'"
+                + "str or a subclass of 'io.BufferedIOBase' or 'io.RawIOBase'"
             )
-        stream = io
-        name = getattr(stream, "name", stream_file_name)
-        size_is_too_big, size = _check_stream_size(stream)
+        name = getattr(io, "name", stream_file_name)
+        if not isinstance(name, str):
+            # e.g. the file descriptor number of a pipe
+            name = stream_file_name
+        if needs_spooling(io):
+            # pipes, sockets, HTTP bodies: the mimetype is detected from
+            # the first bytes while the rest are still being copied
+            spooler = StreamSpooler(
+                io,
+                max_size=MAX_FILE_SIZE,
+                head_size=NUM_BYTES_FOR_MIMETYPE_DETECTION,
+            )
+            mimetype = mimetype_from_bytes(spooler.head())
+            stream, size, size_is_too_big = spooler.result()
+        else:
+            # so that the many short reads and seeks of detection don't
+            # each become a request on remote streams
+            stream = cached_stream(io)
+            size_is_too_big, size = _check_stream_size(stream)
 
     if size_is_too_big:
         raise ValueError(
@@ -62,18 +96,28 @@ def _parse_user_input(
             f"Argument 'passwords' in {calling_func_name} must be of type dict"
         )
 
+    for candidates in (passwords or {}).values():
+        if not isinstance(candidates, (str, list)) or not all(
+            isinstance(candidate, str) for candidate in candidates
+        ):
+            raise ValueError(
+                f"The values of argument 'passwords' in {calling_func_name} must be "
+                + "a password str or a list of candidate password strs"
+            )
+
     if password is not None and not isinstance(password, str):
         raise ValueError(
             f"Argument 'password' in {calling_func_name} must be of type str"
         )
 
-    if passwords is None:
-        passwords = {}
+    # a copy, so that the password added below doesn't end up in the
+    # caller's dict
+    passwords = dict(passwords) if passwords is not None else {}
 
     if name is not None and password is not None:
         passwords[name] = password
 
-    return name, stream, passwords
+    return name, stream, passwords, mimetype
 
 
 def detect(
@@ -81,19 +125,28 @@ def detect(
     *,
     calling_func_name: Optional[str] = None,
     password: Optional[str] = None,
-    passwords: Optional[Dict[str, str]] = None,
+    passwords: Optional[Passwords] = None,
     stream_file_name: Optional[str] = None,
+    directory_filter: Optional[DirectoryFilter] = None,
+    workers: Optional[int] = None,
 ) -> FileNode:
     if calling_func_name is None:
         calling_func_name = "detect"
-    name, stream, passwords = _parse_user_input(
+    name, stream, passwords, mimetype = _parse_user_input(
         io=io,
         calling_func_name=calling_func_name,
         password=password,
         passwords=passwords,
         stream_file_name=stream_file_name,
     )
-    return node_from_file(name=name, stream=stream, passwords=passwords)
+    return node_from_file(
+        name=name,
+        stream=stream,
+        mimetype=mimetype,
+        passwords=passwords,
+        directory_filter=directory_filter,
+        workers=workers,
+    )
 
 
 def parse(
@@ -101,11 +154,69 @@ def parse(
     *,
     tree: Optional[FileNode] = None,
     password: Optional[str] = None,
-    passwords: Optional[Dict[str, str]] = None,
+    passwords: Optional[Passwords] = None,
     stream_file_name: Optional[str] = None,
+    directory_filter: Optional[DirectoryFilter] = None,
+    workers: Optional[int] = None,
     force_numeric: bool = True,
+    dtype_inference: Optional[DtypeInference] = None,
+    sheets: Optional[List[str]] = None,
+    leaf_timeout: Optional[float] = None,
+    isolation: str = "thread",
+    cancel: Optional[threading.Event] = None,
+    layout_cache: Optional[LayoutCache] = None,
+    dedup: bool = False,
+    preview_rows: Optional[int] = None,
+    columns: Optional[List[Any]] = None,
+    where: Optional[RowPredicate] = None,
     pandas_kwargs: Dict[str, Any] = {},
 ) -> Iterable[ParseResult]:
+    """Parse the tables of every leaf file (csv, excel, ...) of the input.
+
+    With `leaf_timeout`, a leaf that takes longer than that many seconds
+    to parse gives a `ParseError` with `exception_type=ParseTimeoutError`
+    and parsing moves on to the next leaf. `isolation` is "thread" or
+    "process"; only "process" can stop a leaf stuck in C code (see
+    `fables.isolation`). Setting the `cancel` event stops parsing at the
+    next leaf or sheet.
+
+    With a `layout_cache`, delimited files and xls/xlsx sheets whose layout
+    was parsed before are read with the recorded encoding, delimiter,
+    header row and dtypes instead of being detected again (see
+    `fables.layouts`).
+
+    With `dedup`, files with the same content (e.g. a workbook copied
+    into several archives or a backup directory) are parsed once, and the
+    `Table`s of the copies share the DataFrames of the first one, as long
+    as the caller holds on to those.
+
+    With `preview_rows`, each table holds only its first `preview_rows`
+    rows, and files and sheets are only read as far as those rows (and the
+    rows before the header). Tables with more rows are `truncated`.
+
+    `columns` keeps only the columns of each table with those header names,
+    in that order; a table without one of them gives a `ParseError`. `where`
+    takes rows of a table (a DataFrame, of the selected columns) and returns
+    a boolean mask of those to keep. Both are pushed into the csv and excel
+    readers, so unselected columns aren't typed and csv rows are filtered
+    as they're read. Rows are dropped only when they're empty in every
+    column, selected or not, the same as without `columns`.
+    """
+    if isolation not in ISOLATIONS:
+        raise ValueError(f"Argument 'isolation' in parse must be one of {ISOLATIONS}")
+    if preview_rows is not None and (
+        isinstance(preview_rows, bool)
+        or not isinstance(preview_rows, int)
+        or preview_rows < 1
+    ):
+        raise ValueError("Argument 'preview_rows' in parse must be a positive int")
+    if columns is not None and (isinstance(columns, str) or not len(columns)):
+        raise ValueError(
+            "Argument 'columns' in parse must be a non-empty list of names"
+        )
+    if where is not None and not callable(where):
+        raise ValueError("Argument 'where' in parse must be callable")
+
     if tree is None:
         if io is None:
             raise ValueError(
@@ -118,7 +229,42 @@ def parse(
             password=password,
             passwords=passwords,
             stream_file_name=stream_file_name,
+            directory_filter=directory_filter,
+            workers=workers,
         )
 
-    visitor = ParseVisitor(force_numeric=force_numeric, pandas_kwargs=pandas_kwargs)
+    visitor = ParseVisitor(
+        force_numeric=force_numeric,
+        dtype_inference=dtype_inference,
+        sheets=sheets,
+        leaf_timeout=leaf_timeout,
+        isolation=isolation,
+        cancel=cancel,
+        layout_cache=layout_cache,
+        dedup=dedup,
+        preview_rows=preview_rows,
+        columns=columns,
+        where=where,
+        pandas_kwargs=pandas_kwargs,
+    )
     yield from visitor.visit(tree)
+
+
+def register_node_type(
+    node_type: Type[MimeTypeFileNode],
+    *,
+    visit: Optional[VisitMethod] = None,
+    priority: int = 0,
+) -> None:
+    """Teach `detect()` and `parse()` a new kind of file.
+
+    `node_type` is matched on its MIMETYPES, EXTENSIONS and
+    EXTENSIONS_TO_EXCLUDE after the built-in types, unless it has a
+    greater `priority` (the built-in types have priority 0). `visit` is
+    called as `visit(visitor, node)` to produce the `ParseResult`s of a
+    node of the type; without it, `parse()` looks for a
+    `visit_<NodeTypeName>` method on the `ParseVisitor`.
+    """
+    NODE_TYPES.register(node_type, priority=priority)
+    if visit is not None:
+        ParseVisitor.register_visit(node_type, visit)
@@ -0,0 +1,334 @@
+"""
+The `fables` command line tool.
+
+    fables detect PATH [PATH ...]
+    fables parse PATH [PATH ...] --output-dir OUT [--output-format csv]
+    fables serve --socket PATH [--workers N]
+
+`detect` prints the detection tree of each input. `parse` parses every
+file, directory and zip given, writing each table to its own file in the
+output directory as soon as it is parsed, then prints a throughput and
+timing summary. With `--workers N` the input files are parsed by N
+processes. `serve` runs a parse server with warm workers on a Unix domain
+socket (see `fables/server.py`).
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, TextIO
+
+from fables.api import detect, parse
+from fables.constants import OS_PATTERNS_TO_SKIP
+from fables.passwords import Passwords
+from fables.table import Table
+from fables.tree import FileNode
+from fables.walk import scan_directory
+
+
+OUTPUT_FORMATS = {"csv": "csv", "parquet": "parquet", "arrow": "arrow"}
+
+# Longest stem of an output file name, which keeps it under the 255 byte
+# limit of most file systems.
+MAX_STEM_LENGTH = 200
+
+
+@dataclass
+class JobSummary:
+    """What parsing one input file produced."""
+
+    name: str
+    num_bytes: int = 0
+    num_tables: int = 0
+    num_rows: int = 0
+    outputs: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+
+def input_files(paths: List[str]) -> Iterator[str]:
+    """Expand the directories among `paths` into the files they contain,
+    so each file can be handed to a worker on its own.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for entry in scan_directory(path):
+                if any(pattern in entry.path for pattern in OS_PATTERNS_TO_SKIP):
+                    continue
+                yield from input_files([entry.path])
+        else:
+            yield path
+
+
+def _output_path(
+    output_dir: str, input_path: str, table: Table, output_format: str
+) -> str:
+    """The file that `table`, parsed from the input file `input_path`, is
+    written to. It's named after the absolute path of the input, the path
+    of the table's file inside it and the sheet, e.g.
+    `home__me__export.zip__data.csv.csv`. When the name doesn't spell those
+    out exactly (characters were replaced, a part could be misread around
+    the `__` separators, or it was too long), a hash of them is added, so
+    no two tables are written to the same file.
+    """
+    name = table.name or "stream"
+    parts = os.path.splitdrive(os.path.abspath(input_path))[1].split(os.sep)[1:]
+    exact = True
+    if name != input_path:
+        archive_prefix = os.path.join(os.path.basename(input_path), "")
+        if name.startswith(archive_prefix):
+            member_start = len(archive_prefix)
+            parts += re.split(r"[/\\]", name[member_start:])
+        else:
+            # e.g. the file of a compressed file, which is named after it
+            parts.append(os.path.basename(name))
+            exact = os.path.dirname(name) == os.path.dirname(input_path)
+    if table.sheet is not None:
+        parts.append(table.sheet)
+
+    safe_parts = [re.sub(r"[^\w.\-]+", "_", part) for part in parts]
+    exact = exact and all(
+        part == safe_part and part.strip("_") == part and "__" not in part
+        for part, safe_part in zip(parts, safe_parts)
+    )
+    stem = "__".join(safe_parts)
+    if not exact or len(stem) > MAX_STEM_LENGTH:
+        identity = repr((os.path.abspath(input_path), name, table.sheet))
+        digest = hashlib.sha1(identity.encode("utf-8")).hexdigest()[:12]
+        stem = f"{stem[-MAX_STEM_LENGTH:]}-{digest}"
+    return os.path.join(output_dir, f"{stem}.{OUTPUT_FORMATS[output_format]}")
+
+
+def write_table(table: Table, path: str, output_format: str) -> None:
+    df = table.df
+    if output_format == "csv":
+        df.to_csv(path, index=False)
+        return
+
+    # parquet and arrow IPC files need string column names
+    df = df.rename(columns=str)
+    if output_format == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        import pyarrow  # type: ignore
+        import pyarrow.feather  # type: ignore
+
+        pyarrow.feather.write_feather(
+            pyarrow.Table.from_pandas(df, preserve_index=False), path
+        )
+
+
+def parse_to_files(
+    name: str,
+    output_dir: str,
+    output_format: str,
+    passwords: Passwords,
+    sheets: Optional[List[str]],
+) -> JobSummary:
+    """Parse the file `name` and write its tables to `output_dir`. Runs in
+    the worker processes, so only the small summary is sent back.
+    """
+    summary = JobSummary(name=name, num_bytes=os.path.getsize(name))
+    try:
+        for parse_result in parse(name, passwords=dict(passwords), sheets=sheets):
+            for table in parse_result.tables:
+                path = _output_path(output_dir, name, table, output_format)
+                write_table(table, path, output_format)
+                summary.num_tables += 1
+                summary.num_rows += len(table.df)
+                summary.outputs.append(path)
+            for error in parse_result.errors:
+                location = str(error.name)
+                if error.sheet is not None:
+                    location += f"[{error.sheet}]"
+                summary.errors.append(
+                    f"{location}: {error.exception_type.__name__}: {error.message}"
+                )
+    except Exception as e:
+        summary.errors.append(f"{name}: {type(e).__name__}: {e}")
+    return summary
+
+
+def _print_tree(node: FileNode, out: TextIO, depth: int = 0) -> None:
+    encrypted = " (encrypted)" if node.encrypted else ""
+    print(f"{'  ' * depth}{node}{encrypted}", file=out)
+    for child in node.children:
+        _print_tree(child, out, depth + 1)
+    for error in node.extract_errors:
+        print(f"{'  ' * (depth + 1)}{error}", file=out)
+
+
+def _load_passwords(passwords_file: Optional[str]) -> Passwords:
+    if passwords_file is None:
+        return {}
+    with open(passwords_file) as f:
+        passwords = json.load(f)
+    if not isinstance(passwords, dict):
+        raise ValueError(
+            f"'{passwords_file}' must contain a JSON object of path -> password(s)"
+        )
+    return passwords
+
+
+def _run_detect(args: argparse.Namespace, out: TextIO) -> int:
+    passwords = _load_passwords(args.passwords_file)
+    for path in args.paths:
+        node = detect(path, passwords=dict(passwords), workers=args.workers)
+        _print_tree(node, out)
+    return 0
+
+
+def _run_parse(args: argparse.Namespace, out: TextIO, err: TextIO) -> int:
+    if args.output_format in ("parquet", "arrow"):
+        try:
+            import pyarrow  # type: ignore # NOQA
+        except ImportError:
+            print(
+                f"--output-format {args.output_format} requires pyarrow to be "
+                + "installed",
+                file=err,
+            )
+            return 2
+
+    passwords = _load_passwords(args.passwords_file)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    summaries: List[JobSummary] = []
+    start = time.perf_counter()
+
+    def report(summary: JobSummary) -> None:
+        summaries.append(summary)
+        for output in summary.outputs:
+            print(output, file=out)
+        for error in summary.errors:
+            print(error, file=err)
+
+    job_args = (args.output_dir, args.output_format, passwords, args.sheets)
+    names = list(input_files(args.paths))
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = [
+                executor.submit(parse_to_files, name, *job_args) for name in names
+            ]
+            for future in as_completed(futures):
+                report(future.result())
+    else:
+        for name in names:
+            report(parse_to_files(name, *job_args))
+
+    elapsed = time.perf_counter() - start
+    _print_summary(summaries, elapsed, args.workers, out)
+    return 1 if any(summary.errors for summary in summaries) else 0
+
+
+def _print_summary(
+    summaries: List[JobSummary], elapsed: float, workers: int, out: TextIO
+) -> None:
+    num_files = len(summaries)
+    num_bytes = sum(summary.num_bytes for summary in summaries)
+    num_tables = sum(summary.num_tables for summary in summaries)
+    num_rows = sum(summary.num_rows for summary in summaries)
+    num_errors = sum(len(summary.errors) for summary in summaries)
+    per_second = 1 / elapsed if elapsed > 0 else float("inf")
+
+    print(
+        f"\nparsed {num_files} files ({num_bytes / 1024 ** 2:.2f} MB) into "
+        + f"{num_tables} tables ({num_rows} rows) with {num_errors} errors "
+        + f"in {elapsed:.2f}s using {workers} worker(s)",
+        file=out,
+    )
+    print(
+        f"throughput: {num_files * per_second:.1f} files/s, "
+        + f"{num_bytes / 1024 ** 2 * per_second:.2f} MB/s, "
+        + f"{num_rows * per_second:.0f} rows/s",
+        file=out,
+    )
+
+
+def _argument_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="fables", description="Detect and parse tables in files."
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("paths", nargs="+", help="files, directories or zips")
+    common.add_argument(
+        "--workers", type=int, default=1, help="number of parallel workers"
+    )
+    common.add_argument(
+        "--passwords-file",
+        help="JSON file with an object of path (or glob) -> password, or a list "
+        + "of candidate passwords to try in order",
+    )
+
+    subparsers.add_parser(
+        "detect", parents=[common], help="print the detection tree of each path"
+    )
+
+    parse_parser = subparsers.add_parser(
+        "parse", parents=[common], help="parse each path to table files"
+    )
+    parse_parser.add_argument(
+        "-o", "--output-dir", required=True, help="directory to write tables to"
+    )
+    parse_parser.add_argument(
+        "--output-format", choices=sorted(OUTPUT_FORMATS), default="csv"
+    )
+    parse_parser.add_argument(
+        "--sheets",
+        type=lambda sheets: sheets.split(","),
+        help="comma separated names of the excel sheets to parse",
+    )
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="take detect and parse requests on a Unix domain socket"
+    )
+    serve_parser.add_argument(
+        "--socket", required=True, help="path of the socket to listen on"
+    )
+    serve_parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes, started up front",
+    )
+    return parser
+
+
+def _run_serve(args: argparse.Namespace, out: TextIO) -> int:
+    # imported here, as the server imports this module
+    from fables.server import ParseServer
+
+    with ParseServer(args.socket, workers=args.workers) as server:
+        print(
+            f"serving on {args.socket} with {args.workers} worker(s)",
+            file=out,
+            flush=True,
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+def main(
+    argv: Optional[List[str]] = None,
+    out: Optional[TextIO] = None,
+    err: Optional[TextIO] = None,
+) -> int:
+    out = out or sys.stdout
+    err = err or sys.stderr
+    args = _argument_parser().parse_args(argv)
+    if args.command == "detect":
+        return _run_detect(args, out)
+    if args.command == "serve":
+        return _run_serve(args, out)
+    return _run_parse(args, out, err)
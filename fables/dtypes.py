@@ -0,0 +1,215 @@
+"""
+Infer and cast the dtypes of all the columns of a DataFrame in one
+vectorized pass.
+
+When `remove_data_before_header` strips rows off the top of a table, every
+column was read with at least one string cell (the real header), so all of
+the columns come out of the reader as `object`. Instead of calling
+`pd.to_numeric` on each column, the whole block is flattened into a single
+object array, converted once, and the result is reshaped to decide, per
+column, which kind of data it holds.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from fables.lazy import LazyModule
+
+if TYPE_CHECKING:
+    import numpy as np  # type: ignore
+    import pandas as pd  # type: ignore
+else:
+    np = LazyModule("numpy")
+    pd = LazyModule("pandas")
+
+
+NUMERIC = "numeric"
+DATETIME = "datetime"
+BOOLEAN = "boolean"
+STRING = "string"
+
+TRUE_STRINGS = ["true", "yes"]
+FALSE_STRINGS = ["false", "no"]
+
+
+@dataclass
+class DtypeInference:
+    """Options for `infer_dtypes`.
+
+    - sample_size: classify columns from the first `sample_size` rows only.
+      Columns classified as non-string are still validated on every row
+      when they are cast, and left as they are if the validation fails.
+      None classifies on every row.
+    - nullable_integers: cast integral columns that contain nulls to the
+      pandas nullable 'Int64' dtype instead of float64.
+    - datetimes: cast columns whose values all parse as dates to datetime64.
+    - booleans: cast columns whose values are all true/false/yes/no (in any
+      case) or bools to the pandas nullable 'boolean' dtype.
+
+    The defaults only convert numeric columns, to the dtype a per-column
+    `pd.to_numeric(..., errors="ignore")` gives them: int64 when all the
+    values are integers (e.g. "12"), float64 when any is written as a float
+    (e.g. "1.0" or "1e3") or the column has nulls. Columns of bools are
+    left as they are, unless `booleans` casts them.
+    """
+
+    sample_size: Optional[int] = None
+    nullable_integers: bool = False
+    datetimes: bool = False
+    booleans: bool = False
+
+
+def _all_valid_by_column(values: np.ndarray, converted_nulls: np.ndarray) -> np.ndarray:
+    """A column is valid for a conversion when the conversion introduced no
+    new nulls, i.e. every non-null cell was converted to a non-null value.
+    """
+    return np.asarray(~(converted_nulls & ~pd.isnull(values)).any(axis=0))
+
+
+def _to_numeric_block(values: np.ndarray) -> np.ndarray:
+    flat = pd.to_numeric(values.ravel(order="F"), errors="coerce")
+    return np.asarray(flat, dtype="float64").reshape(values.shape, order="F")
+
+
+def _to_boolean_block(values: np.ndarray) -> np.ndarray:
+    """Returns a float block of 1.0/0.0/nan."""
+    lowered = pd.Series(values.ravel(order="F"), dtype=object)
+    is_bool = lowered.map(lambda value: isinstance(value, (bool, np.bool_))).values
+    lowered = lowered.str.strip().str.lower()
+    block = np.full(len(lowered), np.nan)
+    block[lowered.isin(TRUE_STRINGS).values] = 1.0
+    block[lowered.isin(FALSE_STRINGS).values] = 0.0
+    bools = values.ravel(order="F")[is_bool].astype(bool)
+    block[is_bool] = bools.astype(float)
+    return block.reshape(values.shape, order="F")
+
+
+def _to_datetime_block(values: np.ndarray) -> np.ndarray:
+    flat = pd.to_datetime(
+        pd.Series(values.ravel(order="F"), dtype=object), errors="coerce"
+    )
+    return np.asarray(flat.values).reshape(values.shape, order="F")
+
+
+def classify_columns(
+    df: pd.DataFrame, inference: Optional[DtypeInference] = None
+) -> List[str]:
+    """Return one of NUMERIC, DATETIME, BOOLEAN or STRING for every column
+    of `df`, by position. Columns that are entirely null are STRING so
+    they are left as they are.
+    """
+    inference = inference or DtypeInference()
+    sample = df if inference.sample_size is None else df.iloc[: inference.sample_size]
+    values = sample.to_numpy(dtype=object)
+    kinds = np.full(values.shape[1], STRING, dtype=object)
+    if not values.size:
+        return list(kinds)
+
+    has_data = np.asarray(~pd.isnull(values).all(axis=0))
+    undecided = has_data.copy()
+    # pd.to_numeric turns bools into 1 and 0, which the pandas reader doesn't
+    is_bool = np.array(
+        [
+            pd.api.types.infer_dtype(values[:, i], skipna=True) == "boolean"
+            for i in range(values.shape[1])
+        ],
+        dtype=bool,
+    )
+
+    if inference.booleans:
+        booleans = _to_boolean_block(values[:, undecided])
+        is_boolean = _all_valid_by_column(values[:, undecided], np.isnan(booleans))
+        kinds[np.flatnonzero(undecided)[is_boolean]] = BOOLEAN
+        undecided[np.flatnonzero(undecided)[is_boolean]] = False
+    undecided &= ~is_bool
+
+    numerics = _to_numeric_block(values[:, undecided])
+    is_numeric = _all_valid_by_column(values[:, undecided], np.isnan(numerics))
+    kinds[np.flatnonzero(undecided)[is_numeric]] = NUMERIC
+    undecided[np.flatnonzero(undecided)[is_numeric]] = False
+
+    if inference.datetimes and undecided.any():
+        datetimes = _to_datetime_block(values[:, undecided])
+        is_datetime = _all_valid_by_column(values[:, undecided], pd.isnull(datetimes))
+        kinds[np.flatnonzero(undecided)[is_datetime]] = DATETIME
+
+    return list(kinds)
+
+
+def _numeric_series(
+    column: np.ndarray, original: np.ndarray, nullable_integers: bool
+) -> pd.Series:
+    """`column` is the float64 conversion of the `original` values. Columns
+    of whole numbers are converted again from the `original` values, and
+    are integers only if `pd.to_numeric` makes them integers: float64 only
+    holds integers up to 2**53 exactly, and "1.0" is a float, not an int.
+    """
+    nulls = np.isnan(column)
+    present = column[~nulls]
+    whole = bool(np.isfinite(present).all()) and bool((np.mod(present, 1) == 0).all())
+    if whole and (nullable_integers or not nulls.any()):
+        integers = np.asarray(pd.to_numeric(original[~nulls]))
+        if integers.dtype.kind == "i":
+            if not nulls.any():
+                return pd.Series(integers.astype("int64"))
+            filled = np.zeros(len(column), dtype="int64")
+            filled[~nulls] = integers
+            return pd.Series(pd.arrays.IntegerArray(filled, nulls))
+    return pd.Series(column)
+
+
+def infer_dtypes(
+    df: pd.DataFrame, inference: Optional[DtypeInference] = None
+) -> pd.DataFrame:
+    """Classify every column of `df` and cast the non-string ones in bulk.
+    The conversions of all the columns of one kind happen in a single call
+    over the flattened block of those columns.
+    """
+    inference = inference or DtypeInference()
+    kinds = classify_columns(df, inference)
+    if all(kind == STRING for kind in kinds):
+        return df
+
+    values = df.to_numpy(dtype=object)
+    new_columns: Dict[int, pd.Series] = {}
+
+    for kind, to_block in [
+        (NUMERIC, _to_numeric_block),
+        (BOOLEAN, _to_boolean_block),
+        (DATETIME, _to_datetime_block),
+    ]:
+        positions = [i for i, column_kind in enumerate(kinds) if column_kind == kind]
+        if not positions:
+            continue
+        block = to_block(values[:, positions])
+        if kind == DATETIME:
+            valid = _all_valid_by_column(values[:, positions], pd.isnull(block))
+        else:
+            valid = _all_valid_by_column(values[:, positions], np.isnan(block))
+        for j, position in enumerate(positions):
+            # only columns that passed on the sample can fail here
+            if not valid[j]:
+                continue
+            if kind == NUMERIC:
+                series = _numeric_series(
+                    block[:, j], values[:, position], inference.nullable_integers
+                )
+            elif kind == BOOLEAN:
+                series = pd.Series(block[:, j]).astype("boolean")
+            else:
+                series = pd.Series(block[:, j])
+            new_columns[position] = series
+
+    data = {
+        position: (
+            new_columns[position].values
+            if position in new_columns
+            else df.iloc[:, position].values
+        )
+        for position in range(len(df.columns))
+    }
+    inferred = pd.DataFrame(data, index=df.index)
+    inferred.columns = df.columns
+    return inferred
@@ -7,6 +7,9 @@ parsed for tabular data, and some error occured.
 An `ExtractError` is a bundled object returned from yielding a nodes
 children from an archive file. This could happen when the archive is
 password protected, but a password is not supplied by the user.
+
+A `ParseTimeoutError` is the `exception_type` of the `ParseError` of a
+file that took longer to parse than the time limit given to `parse()`.
 """
 
 from dataclasses import dataclass
@@ -38,3 +41,9 @@ class InsufficientEncodingDetectorConfidenceError(Exception):
             f"The confidence returned by the encoding detector was"
             f" less than the threshold {confidence_threshold}."
         )
+
+
+class ParseTimeoutError(TimeoutError):
+    def __init__(self, timeout: float):
+        super().__init__(f"Parsing took longer than the time limit of {timeout}s.")
+        self.timeout = timeout
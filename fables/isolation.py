@@ -0,0 +1,143 @@
+"""
+Run a unit of parsing work with a time limit and cooperative cancellation.
+
+- "thread" isolation runs the work on a daemon thread. A time limit or
+  cancellation stops waiting for it, but the thread itself can't be
+  stopped, so it keeps using CPU until it finishes on its own.
+- "process" isolation runs the work in a child process, which is killed
+  when it runs out of time or is cancelled. This also stops work stuck in
+  C code (e.g. a regex or the pandas tokenizer), at the cost of sending
+  the input and the result between processes. The function and its
+  arguments must be picklable.
+"""
+
+import multiprocessing
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple, TypeVar
+
+from fables.errors import ParseTimeoutError
+
+
+T = TypeVar("T")
+
+ISOLATIONS = ["thread", "process"]
+
+# How often waiting on isolated work wakes up to check for cancellation.
+CANCELLATION_POLL_INTERVAL = 0.05  # seconds
+
+
+class Cancelled(Exception):
+    pass
+
+
+def _check_limits(
+    elapsed: float, timeout: Optional[float], cancel: Optional[threading.Event]
+) -> None:
+    if cancel is not None and cancel.is_set():
+        raise Cancelled()
+    if timeout is not None and elapsed >= timeout:
+        raise ParseTimeoutError(timeout)
+
+
+def _wait_step(elapsed: float, timeout: Optional[float]) -> float:
+    if timeout is None:
+        return CANCELLATION_POLL_INTERVAL
+    return max(0.0, min(CANCELLATION_POLL_INTERVAL, timeout - elapsed))
+
+
+def call_in_thread(
+    func: Callable[..., T],
+    args: Tuple[Any, ...],
+    timeout: Optional[float],
+    cancel: Optional[threading.Event] = None,
+) -> T:
+    """Return `func(*args)`, or raise `ParseTimeoutError` after `timeout`
+    seconds, or `Cancelled` once `cancel` is set.
+    """
+    outcome: List[Tuple[bool, Any]] = []
+
+    def target() -> None:
+        try:
+            outcome.append((True, func(*args)))
+        except BaseException as e:
+            outcome.append((False, e))
+
+    thread = threading.Thread(target=target, daemon=True)
+    start = time.monotonic()
+    thread.start()
+    while True:
+        thread.join(_wait_step(time.monotonic() - start, timeout))
+        if not thread.is_alive():
+            break
+        _check_limits(time.monotonic() - start, timeout, cancel)
+
+    succeeded, value = outcome[0]
+    if not succeeded:
+        raise value
+    return value  # type: ignore
+
+
+def _child_main(connection: Any, func: Callable[..., Any], args: Any) -> None:
+    try:
+        result = (True, func(*args))
+    except BaseException as e:
+        result = (False, e)
+    connection.send(result)
+    connection.close()
+
+
+def call_in_process(
+    func: Callable[..., T],
+    args: Tuple[Any, ...],
+    timeout: Optional[float],
+    cancel: Optional[threading.Event] = None,
+) -> T:
+    """Same as `call_in_thread`, but `func` runs in a child process that is
+    terminated when the time limit is hit or `cancel` is set.
+    """
+    context = multiprocessing.get_context()
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(
+        target=_child_main, args=(sender, func, args), daemon=True
+    )
+    start = time.monotonic()
+    process.start()
+    sender.close()
+    try:
+        while True:
+            if receiver.poll(_wait_step(time.monotonic() - start, timeout)):
+                break
+            _check_limits(time.monotonic() - start, timeout, cancel)
+
+        try:
+            succeeded, value = receiver.recv()
+        except EOFError:
+            process.join()
+            raise ChildProcessError(
+                f"Parsing process exited unexpectedly with code {process.exitcode}"
+            )
+        process.join()
+    finally:
+        if process.is_alive():
+            process.terminate()
+            process.join()
+        receiver.close()
+
+    if not succeeded:
+        raise value
+    return value  # type: ignore
+
+
+def call_isolated(
+    isolation: str,
+    func: Callable[..., T],
+    args: Tuple[Any, ...],
+    timeout: Optional[float],
+    cancel: Optional[threading.Event] = None,
+) -> T:
+    if isolation == "thread":
+        return call_in_thread(func, args, timeout, cancel)
+    if isolation == "process":
+        return call_in_process(func, args, timeout, cancel)
+    raise ValueError(f"isolation must be one of {ISOLATIONS}, not '{isolation}'")
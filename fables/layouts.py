@@ -0,0 +1,164 @@
+"""
+Remember how files of a given layout were parsed, so the next file with
+the same layout can skip detection.
+
+Customers tend to send the same export every pay period. The first time a
+layout is seen, fables parses it in full (encoding detection, delimiter
+sniffing, the search for the header row, dtype inference) and records the
+outcome as a `Layout`, keyed by a `LayoutSignature` that is cheap to
+compute from the first bytes of a file (or the first row of a sheet). A
+later file with the same signature is read in one pass with the recorded
+settings, and the result is checked against the recorded header and
+columns; if the check fails, the file goes through full detection and the
+layout is re-recorded.
+
+A `LayoutCache` can be saved to and loaded from a JSON file, so that it
+survives between runs.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from dataclasses import asdict, astuple, dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+# Bytes counted in the first line of a delimited file for its byte profile.
+PROFILE_BYTES = b",\t;:|\"'"
+
+# Number of leading bytes used to compute the signature of a delimited file.
+NUM_BYTES_FOR_SIGNATURE = 4096
+
+
+@dataclass(frozen=True)
+class LayoutSignature:
+    first_line_hash: str
+    byte_profile: Tuple[int, ...]
+    num_columns: int
+    sheet_names: Tuple[str, ...] = ()
+    sheet: Optional[str] = None
+    # parse() options that change the outcome, e.g. force_numeric
+    options: str = ""
+
+    @property
+    def key(self) -> str:
+        return hashlib.sha1(repr(astuple(self)).encode("utf-8")).hexdigest()
+
+
+def _hash(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def text_signature(head: bytes, options: str = "") -> LayoutSignature:
+    """The signature of a delimited file from its first bytes."""
+    first_line = head.split(b"\n", 1)[0].rstrip(b"\r")
+    byte_profile = tuple(first_line.count(byte) for byte in PROFILE_BYTES)
+    num_columns = 1 + max(byte_profile[:5])
+    return LayoutSignature(
+        first_line_hash=_hash(first_line),
+        byte_profile=byte_profile,
+        num_columns=num_columns,
+        options=options,
+    )
+
+
+def sheet_signature(
+    sheet_names: Sequence[str], sheet: str, first_row: Sequence[Any], options: str = ""
+) -> LayoutSignature:
+    """The signature of a sheet of a workbook from the workbook's sheet
+    names and the sheet's first row.
+    """
+    first_line = "\x1f".join(str(value) for value in first_row).encode("utf-8")
+    return LayoutSignature(
+        first_line_hash=_hash(first_line),
+        byte_profile=(),
+        num_columns=len(first_row),
+        sheet_names=tuple(sheet_names),
+        sheet=sheet,
+        options=options,
+    )
+
+
+@dataclass
+class Layout:
+    """How a file (or sheet) of some layout was parsed.
+
+    - encoding: the encoding that decoded the file, None for the default.
+    - delimiter: the delimiter of a delimited file.
+    - num_pre_header_rows: the number of non-blank rows before the header
+      (see `fables.parse.find_header_row`).
+    - header: the names of the header row, by position (None for blank
+      names). Names that aren't JSON types are kept as strings.
+    - dtypes: the final dtype of each kept column, keyed by its position
+      in the header. A file read with the layout must end up with the
+      same columns (and, if it has pre-header rows, the same dtypes).
+    """
+
+    encoding: Optional[str] = None
+    delimiter: Optional[str] = None
+    num_pre_header_rows: int = 0
+    header: List[Any] = field(default_factory=list)
+    dtypes: Dict[int, str] = field(default_factory=dict)
+
+
+class LayoutCache:
+    """A thread-safe map of `LayoutSignature` -> `Layout`.
+
+    `hits` counts files read with a recorded layout, `misses` files with no
+    recorded layout, and `fallbacks` files whose recorded layout failed
+    validation and had to be detected in full.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+        self._layouts: Dict[str, Layout] = {}
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self) -> int:
+        return len(self._layouts)
+
+    def get(self, signature: LayoutSignature) -> Optional[Layout]:
+        with self._lock:
+            layout = self._layouts.get(signature.key)
+            if layout is None:
+                self.misses += 1
+            return layout
+
+    def put(self, signature: LayoutSignature, layout: Layout) -> None:
+        with self._lock:
+            self._layouts[signature.key] = layout
+
+    def record_hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+    def record_fallback(self, signature: LayoutSignature) -> None:
+        with self._lock:
+            self.fallbacks += 1
+            self._layouts.pop(signature.key, None)
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        if path is None:
+            raise ValueError("LayoutCache.save needs a path")
+        with self._lock:
+            layouts = {key: asdict(layout) for key, layout in self._layouts.items()}
+        with open(path, "w") as f:
+            json.dump(layouts, f)
+
+    def load(self, path: str) -> None:
+        with open(path) as f:
+            layouts = json.load(f)
+        with self._lock:
+            for key, layout in layouts.items():
+                # json object keys are always strings
+                layout["dtypes"] = {
+                    int(position): dtype for position, dtype in layout["dtypes"].items()
+                }
+                self._layouts[key] = Layout(**layout)
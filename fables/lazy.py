@@ -0,0 +1,41 @@
+"""
+Import heavy dependencies the first time they're used.
+
+`detect()` only needs the standard library and libmagic, but pandas and
+numpy take most of the time of `import fables`, which matters to short
+jobs that only detect files. The modules that parse bind them with
+
+    if TYPE_CHECKING:
+        import pandas as pd
+    else:
+        pd = LazyModule("pandas")
+
+(and `from __future__ import annotations`, so that annotations don't use
+them), and import the readers of each file format in the functions that
+use them.
+"""
+
+import importlib
+from types import ModuleType
+from typing import Any, Optional
+
+
+class LazyModule:
+    """Stands in for the module `name`, which is imported when one of its
+    attributes is first looked up. The import lock makes that safe from
+    several threads at once.
+    """
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+        self._module: Optional[ModuleType] = None
+
+    def __getattr__(self, attribute: str) -> Any:
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attribute)
+
+    def __repr__(self) -> str:
+        state = "imported" if self._module is not None else "not imported yet"
+        return f"<lazy module '{self._name}' ({state})>"
@@ -14,36 +14,246 @@ the visitor pattern in Python:
 - pypy: https://github.com/mozillazg/pypy/blob/master/pypy/interpreter/astcompiler/ast.py#L3675
 """
 
-import clevercsv  # type: ignore
-from typing import Any, Dict, IO, Iterable, Optional, Union
+from __future__ import annotations
 
-import xlrd  # type: ignore
-import pandas as pd  # type: ignore
-import cchardet as chardet  # type: ignore
+import codecs
+import hashlib
+import io
+import itertools
+import mmap
+import os
+import re
+import threading
+import weakref
+import zipfile
+from contextlib import ExitStack, contextmanager
+from dataclasses import replace
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    IO,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    Union,
+)
 
 from fables.constants import ENCODING_DETECTION_CONFIDENCE_THRESHOLD
+from fables.dtypes import DtypeInference, infer_dtypes
 from fables.errors import InsufficientEncodingDetectorConfidenceError, ParseError
+from fables.isolation import Cancelled, call_isolated
+from fables.lazy import LazyModule
+from fables.layouts import (
+    NUM_BYTES_FOR_SIGNATURE,
+    Layout,
+    LayoutCache,
+    LayoutSignature,
+    sheet_signature,
+    text_signature,
+)
 from fables.results import ParseResult
+from fables.streams import spooled_copy
 from fables.table import Table
-from fables.tree import FileNode, Directory, Zip, Csv, Xls, Xlsx, Xlsb, Skip
+from fables.transport import (
+    SharedParseResult,
+    load_results,
+    make_shared_directory,
+    remove_shared_directory,
+    share_results,
+)
+from fables.tree import (
+    FileNode,
+    Directory,
+    Zip,
+    Tar,
+    CompressedFile,
+    Csv,
+    ExcelEncryptionMixin,
+    Xls,
+    Xlsx,
+    Xlsb,
+    Skip,
+)
 
+if TYPE_CHECKING:
+    import numpy as np  # type: ignore
+    import pandas as pd  # type: ignore
+else:
+    np = LazyModule("numpy")
+    pd = LazyModule("pandas")
+
+
+VisitMethod = Callable[[Any, Any], Iterable[ParseResult]]
+
+# Takes rows of a table and returns a boolean mask of the ones to keep.
+RowPredicate = Callable[["pd.DataFrame"], Any]
 
 ACCEPTED_DELIMITERS = {",", "\t", ";", ":", "|"}
 FALLBACK_DELIMITER = ","
+
+# Bytes of a csv file that its delimiter is sniffed from. The sample is
+# doubled, up to SNIFF_MAX_SAMPLE_SIZE, while it has fewer than
+# SNIFF_MIN_ROWS rows, for files with very long lines.
+SNIFF_SAMPLE_SIZE = 4 * 1024
+SNIFF_MAX_SAMPLE_SIZE = 64 * 1024
+SNIFF_MIN_ROWS = 5
+
+SNIFF_ROW_END = re.compile(r"\r\n?|\n")
+QUOTED_FIELD = re.compile(r'"[^"]*(?:""[^"]*)*"')
 FRACTION_OF_BLANK_HEADERS_ALLOWED = 0.5
 
+# Initial number of rows of the column buffers of an xlsb sheet, and the
+# number of rows they take at a time.
+XLSB_INITIAL_CAPACITY = 1024
+XLSB_CHUNK_ROWS = 512
+
+# Csv files up to this size take the small-file path: they're read into
+# memory in one go, and files in the same container share the layouts
+# found for each other (see ParseVisitor.visit_Csv).
+SMALL_FILE_SIZE = 64 * 1024
+
+# Bytes of a leaf stream hashed (and copied, see _content_key) at a time
+# for deduplication.
+DEDUP_CHUNK_SIZE = 1024**2
+
+# Rows read past the requested number in a preview, to find the header
+# below rows of noise and to make up for rows dropped as empty. The rows
+# read double until there are enough.
+PREVIEW_LOOKAHEAD_ROWS = 32
+
+# Bytes of a csv file that its encoding is detected from in a preview.
+PREVIEW_ENCODING_BYTES = 64 * 1024
+
+# Bytes of an xlsx sheet read at a time in a preview.
+PREVIEW_SHEET_CHUNK_SIZE = 64 * 1024
+
+PREVIEW_SHEET_ROW_END = re.compile(rb"</(?:\w+:)?row>|<(?:\w+:)?row\b[^>]*/>")
+PREVIEW_SHEET_TAG = re.compile(rb"<(\w+:)?(worksheet|sheetData)\b")
+
+# Rows of a csv file read at a time when rows are filtered as they're read.
+SELECTION_CHUNK_ROWS = 64 * 1024
+
+# pd.api.types.infer_dtype kinds of cells that fit a float64 column.
+NUMBER_KINDS = {"floating", "integer", "mixed-integer-float", "empty"}
+
+# Strings the pandas csv reader treats as missing by default (its
+# STR_NA_VALUES, which isn't public and moved between versions).
+NA_STRINGS = {
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "n/a",
+    "nan",
+    "null",
+}
+
+# pandas_kwargs that change how a file is laid out into a table, which turn
+# off the layout cache
+LAYOUT_PANDAS_KWARGS = {"sep", "delimiter", "header", "names", "skiprows", "usecols"}
+
+# pandas_kwargs that selecting columns and rows in the reader would clash
+# with, which leave the selection to be made on the parsed tables
+SELECTION_PANDAS_KWARGS = LAYOUT_PANDAS_KWARGS | {"dtype", "chunksize", "iterator"}
+
+
+# The readers of each format are imported by the functions that use them,
+# so that e.g. parsing csv files doesn't import xlrd and pyxlsb.
+
 
 def sniff_delimiter(bytesio: IO[bytes], encoding: Optional[str]) -> str:
-    encoding = encoding if encoding is not None else "utf-8"
-    sample = bytesio.read(1024 * 4).decode(encoding=encoding)
-    bytesio.seek(0)
-    sniffer = clevercsv.Sniffer()
+    """The delimiter of a csv file, from a sample of its first rows. When
+    one delimiter is `consistent_delimiter` of the sample it's taken as is,
+    and clevercsv, which takes far longer, only decides the others.
+    """
+    sample = _sniff_sample(bytesio, encoding if encoding is not None else "utf-8")
+    delimiter = consistent_delimiter(sample)
+    if delimiter is not None:
+        return delimiter
+
+    import clevercsv  # type: ignore
+
+    sniffer = getattr(_SNIFFERS, "sniffer", None)
+    if sniffer is None:
+        sniffer = _SNIFFERS.sniffer = clevercsv.Sniffer()
     dialect = sniffer.sniff(sample, delimiters="".join(ACCEPTED_DELIMITERS))
     return str(dialect.delimiter)
 
 
-def detect_encoding(bytesio: IO[bytes]) -> str:
-    detection = chardet.detect(bytesio.read())
+# clevercsv's sniffer keeps nothing between samples, so each thread reuses
+# one rather than making one per file.
+_SNIFFERS = threading.local()
+
+
+def _sniff_sample(bytesio: IO[bytes], encoding: str) -> str:
+    """The first SNIFF_SAMPLE_SIZE bytes of a csv file, decoded, or more of
+    them if that doesn't hold SNIFF_MIN_ROWS rows. A row cut off by the end
+    of the sample is left out, unless it's the only one.
+    """
+    size = SNIFF_SAMPLE_SIZE
+    data = bytesio.read(size)
+    at_end = len(data) < size
+    while (
+        not at_end
+        and size < SNIFF_MAX_SAMPLE_SIZE
+        and data.count(b"\n") < SNIFF_MIN_ROWS
+    ):
+        more = bytesio.read(size)
+        data += more
+        at_end = len(more) < size
+        size *= 2
+    bytesio.seek(0)
+
+    # a character cut off by the end of the sample is left out too
+    sample = codecs.getincrementaldecoder(encoding)().decode(data, final=at_end)
+    if not at_end:
+        rows, row_end, _ = sample.rpartition("\n")
+        if rows:
+            sample = rows + row_end
+    return sample
+
+
+def consistent_delimiter(sample: str) -> Optional[str]:
+    """The one delimiter of ACCEPTED_DELIMITERS that every row of `sample`
+    has the same, non-zero, number of outside double quoted fields. None if
+    no delimiter or more than one does, or if there are fewer than two rows.
+    """
+    rows = [row for row in SNIFF_ROW_END.split(QUOTED_FIELD.sub('""', sample)) if row]
+    if len(rows) < 2:
+        return None
+    consistent = [
+        delimiter
+        for delimiter in ACCEPTED_DELIMITERS
+        if rows[0].count(delimiter)
+        and all(row.count(delimiter) == rows[0].count(delimiter) for row in rows)
+    ]
+    if len(consistent) == 1:
+        return consistent[0]
+    return None
+
+
+def detect_encoding(bytesio: IO[bytes], num_bytes: int = -1) -> str:
+    import cchardet as chardet  # type: ignore
+
+    detection = chardet.detect(bytesio.read(num_bytes))
     bytesio.seek(0)
     if detection["confidence"] >= ENCODING_DETECTION_CONFIDENCE_THRESHOLD:
         return str(detection["encoding"])
@@ -55,7 +265,9 @@ def detect_encoding(bytesio: IO[bytes]) -> str:
 
 def _extract_data_frame_from_csv(
     bytesio: IO[bytes], pandas_kwargs: Dict[str, Any]
-) -> pd.DataFrame:
+) -> Tuple[pd.DataFrame, str]:
+    import clevercsv
+
     encoding = pandas_kwargs.get("encoding", None)
     try:
         delimiter = sniff_delimiter(bytesio, encoding)
@@ -67,124 +279,1287 @@ def _extract_data_frame_from_csv(
         if not delimiter:
             delimiter = FALLBACK_DELIMITER
     df = pd.read_csv(bytesio, skip_blank_lines=True, sep=delimiter, **pandas_kwargs)
-    return df
+    return df, delimiter
+
+
+def _is_blank_header(col: Any) -> bool:
+    # Note that the initial inferred headers might be 'Unnamed: #', but once
+    # we replace the headers with a row of data, missing values will be NaN's.
+    return str(col).startswith("Unnamed: ") or bool(pd.isnull(col))
+
 
+def find_header_row(
+    header: Sequence[Any], row_at: Callable[[int], Sequence[Any]], num_rows: int
+) -> int:
+    """Return the number of rows at the top of a table that come before its
+    real header. 0 means `header` is the real header, otherwise the header is
+    `row_at(n - 1)` and the data starts at row n.
 
-def remove_data_before_header(df: pd.DataFrame, force_numeric: bool) -> pd.DataFrame:
-    num_cols = len(df.columns)
-    pre_header_row_removal_was_needed = False
+    A header is rejected while greater than FRACTION_OF_BLANK_HEADERS_ALLOWED
+    of its names are blank, in which case the next row is tried.
+    """
+    num_cols = len(header)
+    num_pre_header_rows = 0
     while (
-        len(df)
-        and
-        # Greater than FRACTION_OF_BLANK_HEADERS_ALLOWED of the header names
-        # are blank. Note that the initial inferred headers might be
-        # 'Unnamed: #', but once we replace the headers with the first row,
-        # those missing values will be NaN's.
-        len(
-            [
-                col
-                for col in df.columns
-                if str(col).startswith("Unnamed: ") or pd.isnull(col)
-            ]
-        )
+        num_pre_header_rows < num_rows
+        and sum(_is_blank_header(col) for col in header)
         > FRACTION_OF_BLANK_HEADERS_ALLOWED * num_cols
     ):
-        pre_header_row_removal_was_needed = True
-        # Replace the headers with the first row
-        df.columns = df.iloc[0].values
-        df.drop(df.index[0], inplace=True)
-    if pre_header_row_removal_was_needed:
-        if not len(df):
+        header = row_at(num_pre_header_rows)
+        num_pre_header_rows += 1
+    return num_pre_header_rows
+
+
+def table_extent(
+    header: Sequence[Any], row_at: Callable[[int], Sequence[Any]], null: np.ndarray
+) -> Tuple[int, np.ndarray, np.ndarray]:
+    """Work out which part of a block of raw reader data is the table, given
+    its header, a way to fetch any row of its values, and the 2-D boolean
+    null mask of its values. Nothing is copied: the result describes the
+    table as
+
+    - the number of rows before the real header (see `find_header_row`),
+    - a column mask that drops columns with a blank header and only nulls,
+    - a row mask, over the rows after the header, that drops all-null rows.
+    """
+    num_rows = null.shape[0]
+    blank_header = np.array([_is_blank_header(col) for col in header], dtype=bool)
+    column_mask = ~(blank_header & null.all(axis=0))
+
+    num_pre_header_rows = find_header_row(
+        [col for col, keep in zip(header, column_mask) if keep],
+        lambda i: np.asarray(row_at(i))[column_mask],
+        num_rows,
+    )
+    if num_pre_header_rows and num_pre_header_rows == num_rows:
+        raise ValueError(
+            "Error during pre-header row removal:"
+            " Reached end of file with no valid header row found."
+        )
+
+    row_mask = ~null[num_pre_header_rows:, column_mask].all(axis=1)
+    return num_pre_header_rows, column_mask, row_mask
+
+
+def _indexer(mask: np.ndarray, offset: int = 0) -> Union[slice, np.ndarray]:
+    """Turn a mask into a slice when the kept positions are contiguous, so
+    that pandas can return a view instead of copying the selection.
+    """
+    positions = np.flatnonzero(mask) + offset
+    if not len(positions):
+        return slice(offset, offset)
+    if positions[-1] - positions[0] + 1 == len(positions):
+        return slice(positions[0], positions[-1] + 1)
+    return positions
+
+
+def remove_data_before_header(
+    df: pd.DataFrame,
+    force_numeric: bool,
+    dtype_inference: Optional[DtypeInference] = None,
+) -> pd.DataFrame:
+    num_pre_header_rows = find_header_row(
+        df.columns, lambda i: df.iloc[i].values, len(df)
+    )
+    if num_pre_header_rows:
+        if num_pre_header_rows == len(df):
             raise ValueError(
                 "Error during pre-header row removal:"
                 " Reached end of file with no valid header row found."
             )
+        header = df.iloc[num_pre_header_rows - 1].values
+        df = df.iloc[num_pre_header_rows:]
+        df.columns = header
 
         if force_numeric:
-            for col in df.columns:
-                # Try to convert columns back to numeric type, skipping those that
-                # can't be converted. With the initial parse containing pre-header
-                # data, all columns will have had a string row containing the
-                # read header, so all columns in the DataFrame would be rounded
-                # up to string type.
-                df[col] = pd.to_numeric(df[col], errors="ignore")
+            # Try to convert columns back to numeric (or other inferred) types,
+            # skipping those that can't be converted. With the initial parse
+            # containing pre-header data, all columns will have had a string
+            # row containing the read header, so all columns in the DataFrame
+            # would be rounded up to string type.
+            df = infer_dtypes(df, dtype_inference)
     return df
 
 
-def post_process_dataframe(df: pd.DataFrame, force_numeric: bool) -> pd.DataFrame:
-    # Remove columns that have no header and have only null data.
-    for col in df.columns:
-        if (pd.isnull(col) or str(col).startswith("Unnamed: ")) and df[
-            col
-        ].isnull().all():
-            df.drop(col, axis=1, inplace=True)
-    # Remove data before headers.
-    df = remove_data_before_header(df, force_numeric)
+def _post_process_dataframe(
+    df: pd.DataFrame,
+    force_numeric: bool,
+    dtype_inference: Optional[DtypeInference] = None,
+) -> Tuple[pd.DataFrame, Layout]:
     num_rows_before = len(df)
-    if num_rows_before:
-        # Remove rows that have only nulls.
-        df.dropna(how="all", axis=0, inplace=True)
+    num_pre_header_rows, column_mask, row_mask = table_extent(
+        df.columns, lambda i: df.iloc[i].values, df.isnull().values
+    )
+
+    if num_pre_header_rows:
+        full_header = df.iloc[num_pre_header_rows - 1].values
+    else:
+        full_header = df.columns.values
+    header = full_header[column_mask]
+
+    if not (column_mask.all() and row_mask.all() and not num_pre_header_rows):
+        df = df.iloc[
+            _indexer(row_mask, offset=num_pre_header_rows), _indexer(column_mask)
+        ]
+    df.columns = header
+
+    if num_pre_header_rows and force_numeric:
+        # See remove_data_before_header for why types have to be re-inferred.
+        df = infer_dtypes(df, dtype_inference)
+
+    if num_rows_before and not _is_default_index(df.index):
         # Retain 0-based index.
-        num_rows_after = len(df)
-        df.index = range(num_rows_after)
+        df.index = range(len(df))
+
+    layout = Layout(
+        num_pre_header_rows=num_pre_header_rows,
+        header=[_layout_header_name(col) for col in full_header],
+        dtypes={
+            int(position): str(dtype)
+            for position, dtype in zip(np.flatnonzero(column_mask), df.dtypes)
+        },
+    )
+    return df, layout
+
+
+def _is_default_index(index: pd.Index) -> bool:
+    return isinstance(index, pd.RangeIndex) and index.start == 0 and index.step == 1
 
+
+def post_process_dataframe(
+    df: pd.DataFrame,
+    force_numeric: bool,
+    dtype_inference: Optional[DtypeInference] = None,
+) -> pd.DataFrame:
+    """Remove columns that have no header and have only null data, data
+    before the header, and rows that have only nulls.
+
+    The masks for all three are computed up front from a single null mask
+    and applied with one selection (a view when the kept rows and columns
+    are contiguous), instead of dropping columns and rows one at a time.
+    """
+    df, _ = _post_process_dataframe(df, force_numeric, dtype_inference)
     return df
 
 
+def _layout_header_name(col: Any) -> Any:
+    if pd.isnull(col):
+        return None
+    if isinstance(col, np.generic):
+        col = col.item()
+    if isinstance(col, (str, int, float, bool)):
+        return col
+    return str(col)
+
+
+def _layout_options(
+    force_numeric: bool,
+    dtype_inference: Optional[DtypeInference],
+    pandas_kwargs: Dict[str, Any],
+) -> str:
+    return repr((force_numeric, dtype_inference, sorted(pandas_kwargs.items())))
+
+
+def _layout_cacheable(pandas_kwargs: Dict[str, Any]) -> bool:
+    return not LAYOUT_PANDAS_KWARGS & set(pandas_kwargs)
+
+
+def _apply_layout(
+    df: pd.DataFrame, layout: Layout, dtype_inference: Optional[DtypeInference]
+) -> Optional[pd.DataFrame]:
+    """Finish a frame that was read with `header=layout.num_pre_header_rows`.
+    Returns None when the frame doesn't match the recorded layout: a
+    different header or different empty columns, or, when pre-header rows
+    were skipped, dtypes other than the ones `infer_dtypes` gave.
+    """
+    if len(df.columns) != len(layout.header):
+        return None
+    for read_name, name in zip(df.columns, layout.header):
+        # the reader renames blank and duplicate names, so only check the
+        # names that it would have left alone
+        if name is not None and layout.header.count(name) == 1:
+            if str(read_name) != str(name):
+                return None
+    df.columns = [np.nan if name is None else name for name in layout.header]
+
+    df, read_layout = _post_process_dataframe(df, False, dtype_inference)
+    if read_layout.num_pre_header_rows or set(read_layout.dtypes) != set(layout.dtypes):
+        return None
+    # Without pre-header rows the frame was read just like in full detection.
+    # With them, the reader typed the columns instead of infer_dtypes, which
+    # can disagree, e.g. on integers with nulls or on "TRUE".
+    if layout.num_pre_header_rows and read_layout.dtypes != layout.dtypes:
+        return None
+    return df
+
+
+def _read_csv_with_layout(
+    bytesio: IO[bytes],
+    layout: Layout,
+    *,
+    force_numeric: bool,
+    dtype_inference: Optional[DtypeInference],
+    pandas_kwargs: Dict[str, Any],
+) -> Optional[pd.DataFrame]:
+    read_kwargs = dict(pandas_kwargs)
+    if layout.encoding is not None:
+        read_kwargs.setdefault("encoding", layout.encoding)
+    try:
+        if layout.num_pre_header_rows and not force_numeric:
+            # The values have to stay as read below pre-header rows, so a typed
+            # read isn't possible: only skip the encoding and delimiter detection
+            df = pd.read_csv(
+                bytesio, skip_blank_lines=True, sep=layout.delimiter, **read_kwargs
+            )
+            return post_process_dataframe(df, force_numeric, dtype_inference)
+
+        df = pd.read_csv(
+            bytesio,
+            skip_blank_lines=True,
+            sep=layout.delimiter,
+            header=layout.num_pre_header_rows,
+            **read_kwargs,
+        )
+    except (UnicodeDecodeError, ValueError):
+        return None
+    return _apply_layout(df, layout, dtype_inference)
+
+
 def parse_csv(
-    bytesio: IO[bytes], *, force_numeric: bool = True, pandas_kwargs: Dict[str, Any]
+    bytesio: IO[bytes],
+    *,
+    force_numeric: bool = True,
+    dtype_inference: Optional[DtypeInference] = None,
+    layout_cache: Optional[LayoutCache] = None,
+    pandas_kwargs: Dict[str, Any],
 ) -> pd.DataFrame:
+    signature = None
+    if layout_cache is not None and _layout_cacheable(pandas_kwargs):
+        signature = text_signature(
+            bytesio.read(NUM_BYTES_FOR_SIGNATURE),
+            _layout_options(force_numeric, dtype_inference, pandas_kwargs),
+        )
+        bytesio.seek(0)
+        layout = layout_cache.get(signature)
+        if layout is not None:
+            df = _read_csv_with_layout(
+                bytesio,
+                layout,
+                force_numeric=force_numeric,
+                dtype_inference=dtype_inference,
+                pandas_kwargs=pandas_kwargs,
+            )
+            if df is not None:
+                layout_cache.record_hit()
+                return df
+            layout_cache.record_fallback(signature)
+            bytesio.seek(0)
+
     user_supplied_encoding = pandas_kwargs.get("encoding")
+    detected_encoding = None
     try:
-        df = _extract_data_frame_from_csv(bytesio, pandas_kwargs)
+        df, delimiter = _extract_data_frame_from_csv(bytesio, pandas_kwargs)
     except UnicodeDecodeError:
         if user_supplied_encoding is not None:
             raise
         else:
             bytesio.seek(0)
             detected_encoding = detect_encoding(bytesio)
-            df = _extract_data_frame_from_csv(
+            df, delimiter = _extract_data_frame_from_csv(
                 bytesio, {"encoding": detected_encoding, **pandas_kwargs}
             )
-    df = post_process_dataframe(df, force_numeric)
+    df, layout = _post_process_dataframe(df, force_numeric, dtype_inference)
+
+    if layout_cache is not None and signature is not None:
+        layout.encoding = detected_encoding
+        layout.delimiter = delimiter
+        layout_cache.put(signature, layout)
     return df
 
 
+def _sheet_signature(
+    excel_file: pd.ExcelFile, sheet: str, options: str
+) -> Optional[LayoutSignature]:
+    """Only workbooks read by xlrd can give the first row of a sheet
+    without parsing the whole sheet.
+    """
+    import xlrd  # type: ignore
+
+    book = getattr(excel_file, "book", None)
+    if not isinstance(book, xlrd.Book):
+        return None
+    xlrd_sheet = book.sheet_by_name(sheet)
+    first_row = xlrd_sheet.row_values(0) if xlrd_sheet.nrows else []
+    return sheet_signature(excel_file.sheet_names, sheet, first_row, options)
+
+
 def parse_excel_sheet(
     excel_file: pd.ExcelFile,
     sheet: str,
     *,
     force_numeric: bool = True,
+    dtype_inference: Optional[DtypeInference] = None,
+    layout_cache: Optional[LayoutCache] = None,
     pandas_kwargs: Dict[str, Any],
 ) -> pd.DataFrame:
+    signature = None
+    if layout_cache is not None and _layout_cacheable(pandas_kwargs):
+        signature = _sheet_signature(
+            excel_file,
+            sheet,
+            _layout_options(force_numeric, dtype_inference, pandas_kwargs),
+        )
+    if layout_cache is not None and signature is not None:
+        layout = layout_cache.get(signature)
+        # see _read_csv_with_layout for why pre-header rows need force_numeric
+        if layout is not None and (force_numeric or not layout.num_pre_header_rows):
+            df = excel_file.parse(
+                sheet,
+                skip_blank_lines=True,
+                header=layout.num_pre_header_rows,
+                **pandas_kwargs,
+            )
+            df = _apply_layout(df, layout, dtype_inference)
+            if df is not None:
+                layout_cache.record_hit()
+                return df
+            layout_cache.record_fallback(signature)
+
     df = excel_file.parse(sheet, skip_blank_lines=True, **pandas_kwargs)
-    df = post_process_dataframe(df, force_numeric)
+    df, layout = _post_process_dataframe(df, force_numeric, dtype_inference)
+    if layout_cache is not None and signature is not None:
+        layout_cache.put(signature, layout)
+    return df
+
+
+class ColumnBuffers:
+    """The cells of a sheet, one array per column, filled a chunk of rows
+    at a time.
+
+    A column is a float64 array (NaN for empty cells) until it gets a cell
+    that isn't a number, when it becomes an object array (None for empty
+    cells). The arrays double in length whenever they fill up, so appending
+    n rows copies O(n) cells. Rows are transposed into columns in chunks of
+    XLSB_CHUNK_ROWS, so that number columns are filled by numpy rather
+    than a cell at a time.
+    """
+
+    def __init__(self, capacity: int = XLSB_INITIAL_CAPACITY) -> None:
+        self.capacity = capacity
+        self.num_rows = 0
+        self.columns: List[np.ndarray] = []
+        self._num_flushed_rows = 0
+        self._pending: List[Sequence[Any]] = []
+
+    def append(self, values: Sequence[Any]) -> None:
+        self._pending.append(values)
+        self.num_rows += 1
+        if len(self._pending) >= XLSB_CHUNK_ROWS:
+            self.flush()
+
+    def append_empty(self, num_rows: int) -> None:
+        self._pending.extend([()] * num_rows)
+        self.num_rows += num_rows
+        if len(self._pending) >= XLSB_CHUNK_ROWS:
+            self.flush()
+
+    def flush(self) -> None:
+        pending, self._pending = self._pending, []
+        start, stop = self._num_flushed_rows, self._num_flushed_rows + len(pending)
+        while stop > self.capacity:
+            self._grow()
+        for i, values in enumerate(itertools.zip_longest(*pending)):
+            if i == len(self.columns):
+                self.columns.append(np.full(self.capacity, np.nan))
+            column = self.columns[i]
+            if column.dtype != object and (
+                pd.api.types.infer_dtype(values, skipna=True) in NUMBER_KINDS
+            ):
+                column[start:stop] = np.array(values, dtype="float64")
+            else:
+                if column.dtype != object:
+                    column = self._to_object_column(i)
+                column[start:stop] = [_excel_value(value) for value in values]
+        self._num_flushed_rows = stop
+
+    def _grow(self) -> None:
+        self.capacity *= 2
+        for i, column in enumerate(self.columns):
+            grown = np.full(self.capacity, _empty_cell(column), dtype=column.dtype)
+            grown[: self._num_flushed_rows] = column[: self._num_flushed_rows]
+            self.columns[i] = grown
+
+    def _to_object_column(self, i: int) -> np.ndarray:
+        column = self.columns[i]
+        converted = np.full(self.capacity, None, dtype=object)
+        filled = np.flatnonzero(~np.isnan(column[: self._num_flushed_rows]))
+        converted[filled] = [_excel_value(value) for value in column[filled].tolist()]
+        self.columns[i] = converted
+        return converted
+
+
+def _empty_cell(column: np.ndarray) -> Any:
+    return None if column.dtype == object else np.nan
+
+
+def _excel_value(value: Any) -> Any:
+    # Excel stores every number as a float; whole numbers are read as ints
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _header_names(header: Sequence[Any]) -> List[Any]:
+    """Name columns like the pandas reader: blank names become
+    'Unnamed: <position>' and repeated names get a '.<count>' suffix.
+    """
+    names: List[Any] = []
+    counts: Dict[Any, int] = {}
+    for i, name in enumerate(header):
+        name = _excel_value(name)
+        if name is None or (isinstance(name, str) and not name):
+            name = f"Unnamed: {i}"
+        count = counts.get(name, 0)
+        while count > 0:
+            counts[name] = count + 1
+            name = f"{name}.{count}"
+            count = counts.get(name, 0)
+        counts[name] = count + 1
+        names.append(name)
+    return names
+
+
+def _typed_column(column: np.ndarray) -> np.ndarray:
+    """Type one column of cells the way the pandas reader types the values
+    it is given: empty and NA strings are null, and numbers, bools or
+    strings of numbers are converted when the whole column allows it.
+    """
+    if not len(column):
+        return column.astype(object)
+    if column.dtype != object:
+        if not np.isnan(column).any():
+            integers = column.astype("int64")
+            if (integers == column).all():
+                return integers
+        return column
+
+    column = column.copy()
+    is_na = pd.Series(column).isin(NA_STRINGS).values
+    column[is_na] = None
+    null = pd.isnull(column)
+    column[null] = np.nan
+    if null.all():
+        return column.astype("float64")
+    if not null.any() and all(isinstance(value, bool) for value in column):
+        return column.astype(bool)
+    numeric = pd.to_numeric(column, errors="coerce")
+    if (pd.isnull(numeric) & ~null).any():
+        return column
+    return _typed_column(np.asarray(numeric, dtype="float64"))
+
+
+def parse_xlsb_sheet(
+    rows: Iterable[Tuple[int, Sequence[Any]]],
+    *,
+    force_numeric: bool = True,
+    dtype_inference: Optional[DtypeInference] = None,
+) -> pd.DataFrame:
+    """Build the table of an xlsb sheet from its rows of cell values, each
+    row given as (row number, values).
+
+    The cells go straight into `ColumnBuffers` instead of a list of row
+    lists, and the header, column and row masks are worked out on the
+    buffers (see `table_extent`), so the DataFrame is only built once, from
+    the kept parts of the typed columns. The result is the same as reading
+    the sheet with `pd.ExcelFile(..., engine="pyxlsb")` followed by
+    `post_process_dataframe`.
+    """
+    first_row: Optional[Sequence[Any]] = None
+    buffers = ColumnBuffers()
+    for row_number, values in rows:
+        if all(value is None or value == "" for value in values):
+            continue
+        if first_row is None:
+            # rows without cells aren't stored in the file, but rows before
+            # and between rows with cells still count as (empty) rows
+            first_row = values if row_number == 0 else ()
+            if row_number == 0:
+                continue
+        if row_number - 1 > buffers.num_rows:
+            buffers.append_empty(row_number - 1 - buffers.num_rows)
+        buffers.append(values)
+    buffers.flush()
+
+    if first_row is None:
+        return post_process_dataframe(pd.DataFrame(), force_numeric, dtype_inference)
+
+    num_columns = max(len(first_row), len(buffers.columns))
+    header = _header_names(list(first_row) + [None] * (num_columns - len(first_row)))
+    columns = [_typed_column(column[: buffers.num_rows]) for column in buffers.columns]
+    columns += [
+        np.full(buffers.num_rows, np.nan)
+        if buffers.num_rows
+        else np.empty(0, dtype=object)
+        for _ in range(num_columns - len(columns))
+    ]
+    null = np.column_stack([pd.isnull(column) for column in columns])
+
+    num_pre_header_rows, column_mask, row_mask = table_extent(
+        header,
+        lambda i: pd.Series([column[i] for column in columns], dtype=object),
+        null,
+    )
+    if num_pre_header_rows:
+        header = [column[num_pre_header_rows - 1] for column in columns]
+    keep_rows = _indexer(row_mask, offset=num_pre_header_rows)
+    kept = [i for i in range(num_columns) if column_mask[i]]
+
+    df = pd.DataFrame({j: columns[i][keep_rows] for j, i in enumerate(kept)})
+    if not buffers.num_rows:
+        # like the pandas reader, a sheet with only a header has no RangeIndex
+        df.index = pd.Index([], dtype=object)
+    elif not kept:
+        df.index = range(int(row_mask.sum()))
+    df.columns = [header[i] for i in kept]
+    if num_pre_header_rows and force_numeric:
+        # See remove_data_before_header for why types have to be re-inferred.
+        df = infer_dtypes(df, dtype_inference)
+    return df
+
+
+def _xlsb_sheet_rows(sheet: Any) -> Iterator[Tuple[int, List[Any]]]:
+    """The rows of a pyxlsb sheet that have values, as (row number, values
+    up to the last one).
+
+    The cell records are read here rather than through `sheet.rows()`,
+    which builds every row the width of the sheet's used range: formatting
+    that runs to column XFD would make each row 16,384 cells, and styled
+    blank rows to row 1,048,576 would each be built too.
+    """
+    from pyxlsb import biff12  # type: ignore
+
+    reader = sheet._reader
+    reader.seek(sheet._data_offset, os.SEEK_SET)
+    row_number = -1
+    cells: Dict[int, Any] = {}
+    for record_type, record in reader:
+        if record_type == biff12.ROW and record.r != row_number:
+            if cells:
+                yield row_number, _xlsb_row_values(cells)
+            row_number = record.r
+            cells = {}
+        elif biff12.BLANK <= record_type <= biff12.FORMULA_BOOLERR:
+            value = record.v
+            if record_type == biff12.STRING and sheet._stringtable is not None:
+                value = sheet._stringtable[value]
+            if value is not None and value != "":
+                cells[record.c] = value
+        elif record_type == biff12.SHEETDATA_END:
+            break
+    if cells:
+        yield row_number, _xlsb_row_values(cells)
+
+
+def _xlsb_row_values(cells: Dict[int, Any]) -> List[Any]:
+    values: List[Any] = [None] * (max(cells) + 1)
+    for column, value in cells.items():
+        values[column] = value
+    return values
+
+
+def _trims_empty_strings(pandas_kwargs: Dict[str, Any]) -> bool:
+    """Whether cells holding "" can be trimmed from a sheet like cells
+    without a value: the pandas reader makes them nulls, unless
+    `pandas_kwargs` keep them, and `skipfooter` counts them as rows.
+    """
+    return bool(
+        pandas_kwargs.get("na_filter", True)
+        and pandas_kwargs.get("keep_default_na", True)
+        and "skipfooter" not in pandas_kwargs
+    )
+
+
+def trim_used_range(sheet: Any, *, trim_empty_strings: bool = True) -> None:
+    """Shrink an xlrd sheet, loaded with `ragged_rows=True`, to the rows and
+    columns that have values, and pad its rows to that width.
+
+    Formatting and formulas that give "" make Excel store cells far past
+    the data, often to row 1,048,576 or column XFD. xlrd skips styled cells
+    without a value, but keeps the ""s and (without ragged rows) pads every
+    row to the widest one, so the pandas reader would build every cell of
+    that range before `post_process_dataframe` dropped the empty rows and
+    columns.
+    """
+    import xlrd
+
+    empty_types = {xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK}
+    num_rows = num_columns = 0
+    for i, (types, values) in enumerate(zip(sheet._cell_types, sheet._cell_values)):
+        width = len(types)
+        while width and (
+            types[width - 1] in empty_types
+            or (
+                trim_empty_strings
+                and types[width - 1] == xlrd.XL_CELL_TEXT
+                and values[width - 1] == ""
+            )
+        ):
+            width -= 1
+        if width:
+            num_rows = i + 1
+            num_columns = max(num_columns, width)
+
+    del sheet._cell_types[num_rows:]
+    del sheet._cell_values[num_rows:]
+    for types, values in zip(sheet._cell_types, sheet._cell_values):
+        del types[num_columns:]
+        del values[num_columns:]
+        types.extend(sheet.bt * (num_columns - len(types)))
+        values.extend([""] * (num_columns - len(values)))
+    sheet.nrows = num_rows
+    sheet.ncols = num_columns
+
+
+@contextmanager
+def _workbook_contents(bytesio: IO[bytes]) -> Iterator[Union[bytes, mmap.mmap]]:
+    """The bytes of a workbook, without a copy where possible: the buffer
+    of a BytesIO (e.g. a decrypted file) or a read-only mmap of a file on
+    disk, so that xlrd only pages in the records it decodes.
+    """
+    if isinstance(bytesio, io.BytesIO):
+        # shares the BytesIO's buffer as long as it isn't written to
+        yield bytesio.getvalue()
+        return
+
+    contents: Optional[mmap.mmap] = None
+    try:
+        contents = mmap.mmap(bytesio.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError):
+        # not a file on disk (fileno raises io.UnsupportedOperation, an
+        # OSError), or an empty file, which can't be mapped
+        pass
+    if contents is None:
+        yield bytesio.read()
+        return
+    try:
+        yield contents
+    finally:
+        contents.close()
+
+
+def preview_table(
+    read_rows: Callable[[int], Tuple[Any, bool]],
+    post_process: Callable[[Any], pd.DataFrame],
+    num_rows: int,
+) -> Tuple[pd.DataFrame, bool]:
+    """Return the first `num_rows` rows of a table, and whether the table
+    has more, reading as little of it as possible. `read_rows(n)` reads the
+    first n rows of the file or sheet and tells whether that was all of
+    them, and `post_process` makes a table out of what it read.
+
+    `num_rows + PREVIEW_LOOKAHEAD_ROWS` rows are read first, and twice as
+    many each time the header isn't among them yet, or too few rows are
+    left once empty rows are dropped. Which columns are empty, and their
+    dtypes, are judged from the rows read.
+    """
+    num_read = num_rows + PREVIEW_LOOKAHEAD_ROWS
+    while True:
+        rows, exhausted = read_rows(num_read)
+        try:
+            df = post_process(rows)
+        except ValueError:
+            # no header row among the rows read so far
+            if exhausted:
+                raise
+        else:
+            if exhausted or len(df) > num_rows:
+                return df.iloc[:num_rows], len(df) > num_rows
+        num_read *= 2
+
+
+class _CsvRows:
+    """The `read_rows` of a csv file for `preview_table`, which remembers
+    the encoding it had to detect and the delimiter it sniffed.
+    """
+
+    def __init__(self, bytesio: IO[bytes], pandas_kwargs: Dict[str, Any]) -> None:
+        self.bytesio = bytesio
+        self.read_kwargs = dict(pandas_kwargs)
+        self.delimiter = FALLBACK_DELIMITER
+
+    def __call__(self, num_read: int) -> Tuple[pd.DataFrame, bool]:
+        self.bytesio.seek(0)
+        try:
+            df, self.delimiter = _extract_data_frame_from_csv(
+                self.bytesio, {**self.read_kwargs, "nrows": num_read}
+            )
+        except UnicodeDecodeError:
+            if self.read_kwargs.get("encoding") is not None:
+                raise
+            self.bytesio.seek(0)
+            self.read_kwargs["encoding"] = detect_encoding(
+                self.bytesio, PREVIEW_ENCODING_BYTES
+            )
+            df, self.delimiter = _extract_data_frame_from_csv(
+                self.bytesio, {**self.read_kwargs, "nrows": num_read}
+            )
+        return df, len(df) < num_read
+
+
+def preview_csv(
+    bytesio: IO[bytes],
+    num_rows: int,
+    *,
+    force_numeric: bool = True,
+    dtype_inference: Optional[DtypeInference] = None,
+    pandas_kwargs: Dict[str, Any],
+) -> Tuple[pd.DataFrame, bool]:
+    """The first `num_rows` rows of the table of `parse_csv`, and whether
+    it has more (see `preview_table`). An encoding that has to be detected
+    is detected from the first PREVIEW_ENCODING_BYTES bytes only.
+    """
+    return preview_table(
+        _CsvRows(bytesio, pandas_kwargs),
+        partial(
+            post_process_dataframe,
+            force_numeric=force_numeric,
+            dtype_inference=dtype_inference,
+        ),
+        num_rows,
+    )
+
+
+def _first_xlsb_rows(
+    rows: Iterable[Tuple[int, List[Any]]], num_rows: int
+) -> Tuple[List[Tuple[int, List[Any]]], bool]:
+    """The rows of an xlsb sheet up to row number `num_rows` (the header is
+    row 0), and whether the sheet ends there.
+    """
+    first_rows: List[Tuple[int, List[Any]]] = []
+    for row_number, values in rows:
+        if row_number > num_rows:
+            return first_rows, False
+        first_rows.append((row_number, values))
+    return first_rows, True
+
+
+def _first_rows_of_sheet_xml(member: IO[bytes], num_rows: int) -> bytes:
+    """The xml of an xlsx worksheet cut after its first `num_rows` row
+    elements and closed again, reading no further into it than that.
+    """
+    data = bytearray()
+    scan_from = 0
+    num_rows_seen = 0
+    for chunk in iter(partial(member.read, PREVIEW_SHEET_CHUNK_SIZE), b""):
+        data += chunk
+        for match in PREVIEW_SHEET_ROW_END.finditer(data, scan_from):
+            scan_from = match.end()
+            num_rows_seen += 1
+            if num_rows_seen == num_rows:
+                return _close_sheet_xml(bytes(data[:scan_from]))
+    return bytes(data)
+
+
+def _close_sheet_xml(data: bytes) -> bytes:
+    prefixes: Dict[bytes, bytes] = {}
+    for match in PREVIEW_SHEET_TAG.finditer(data):
+        prefixes.setdefault(match.group(2), match.group(1) or b"")
+        if len(prefixes) == 2:
+            break
+    sheet_data_prefix = prefixes.get(b"sheetData", b"")
+    worksheet_prefix = prefixes.get(b"worksheet", b"")
+    return data + b"</%ssheetData></%sworksheet>" % (
+        sheet_data_prefix,
+        worksheet_prefix,
+    )
+
+
+class _FirstRowsZipFile:
+    """The zip of an xlsx workbook as xlrd sees it in a preview: each
+    worksheet stops after its first `num_rows` rows, so loading the
+    workbook doesn't read the rest of its sheets.
+    """
+
+    def __init__(self, zip_file: zipfile.ZipFile, num_rows: int) -> None:
+        self.zip_file = zip_file
+        self.num_rows = num_rows
+
+    def open(self, name: str) -> IO[bytes]:
+        lower_name = name.lower()
+        if not (
+            lower_name.startswith("xl/worksheets/") and lower_name.endswith(".xml")
+        ):
+            return self.zip_file.open(name)
+        with self.zip_file.open(name) as member:
+            return io.BytesIO(_first_rows_of_sheet_xml(member, self.num_rows))
+
+
+def _open_xlsx(
+    zip_file: zipfile.ZipFile,
+    num_rows: Optional[int] = None,
+    trim_empty_strings: bool = True,
+) -> Any:
+    """An xlrd workbook of the xlsx `zip_file`, or of the first `num_rows`
+    rows of each of its sheets, trimmed to the rows and columns that have
+    values (see `trim_used_range`). Shared strings are read in full.
+
+    This is what `xlrd.open_workbook` does with the bytes of an xlsx file,
+    without needing them all in memory (e.g. a decrypted workbook, see
+    `fables.streams.AgileDecryptedStream`).
+    """
+    import xlrd
+
+    component_names = {
+        xlrd.xlsx.X12Book.convert_filename(name): name for name in zip_file.namelist()
+    }
+    if "xl/workbook.xml" not in component_names:
+        raise xlrd.XLRDError("ZIP file contents not a known type of workbook")
+    workbook = xlrd.xlsx.open_workbook_2007_xml(
+        zip_file if num_rows is None else _FirstRowsZipFile(zip_file, num_rows),
+        component_names,
+        ragged_rows=True,
+    )
+    for sheet in workbook.sheets():
+        trim_used_range(sheet, trim_empty_strings=trim_empty_strings)
+    return workbook
+
+
+def _column_positions(header: Sequence[Any], columns: Sequence[Any]) -> List[int]:
+    header = list(header)
+    missing = [name for name in columns if name not in header]
+    if missing:
+        raise ValueError(f"Columns {missing} are not in the header {header}")
+    return [header.index(name) for name in columns]
+
+
+def select_rows(
+    df: pd.DataFrame,
+    columns: Optional[Sequence[Any]] = None,
+    where: Optional[RowPredicate] = None,
+) -> pd.DataFrame:
+    """Keep the `columns` of a table, in that order, and the rows for which
+    `where` holds.
+    """
+    if columns is not None:
+        df = df.iloc[:, _column_positions(df.columns, columns)]
+        df.columns = list(columns)
+    if where is not None:
+        df = df[np.asarray(where(df), dtype=bool)]
+        df.index = range(len(df))
+    return df
+
+
+def _find_layout(
+    read_rows: Callable[[int], Tuple[pd.DataFrame, bool]],
+    force_numeric: bool,
+    dtype_inference: Optional[DtypeInference],
+) -> Layout:
+    """The layout of a table (where its header is, and which columns are
+    kept) from as few of its first rows as it can be told from.
+    """
+    layouts: List[Layout] = []
+
+    def post_process(df: pd.DataFrame) -> pd.DataFrame:
+        df, layout = _post_process_dataframe(df, force_numeric, dtype_inference)
+        layouts.append(layout)
+        return df
+
+    preview_table(read_rows, post_process, 0)
+    return layouts[-1]
+
+
+def _selection_pushable(pandas_kwargs: Dict[str, Any]) -> bool:
+    return not SELECTION_PANDAS_KWARGS & set(pandas_kwargs)
+
+
+def _selection_read_kwargs(
+    layout: Layout, columns: Optional[Sequence[Any]]
+) -> Tuple[Dict[str, Any], List[int]]:
+    """The reader arguments that read the table of `layout` from its header
+    on, and the positions of the `columns` wanted (every column by default)
+    among the ones read. Every column of the header is read, as rows are
+    only dropped when they're empty in all of them.
+    """
+    read_positions = list(range(len(layout.header)))
+    if columns is None:
+        positions = read_positions
+    else:
+        positions = _column_positions(layout.header, columns)
+    read_kwargs: Dict[str, Any] = {
+        "header": layout.num_pre_header_rows,
+        "usecols": read_positions,
+    }
+    if layout.num_pre_header_rows:
+        # read the values as they are, to be typed like remove_data_before_header
+        # does once the table is complete
+        read_kwargs["dtype"] = object
+    return read_kwargs, positions
+
+
+def _select_from_chunks(
+    chunks: Iterable[pd.DataFrame],
+    layout: Layout,
+    order: List[int],
+    *,
+    columns: Optional[Sequence[Any]],
+    where: Optional[RowPredicate],
+    force_numeric: bool,
+    dtype_inference: Optional[DtypeInference],
+) -> pd.DataFrame:
+    """Build a table out of chunks of rows read with `_selection_read_kwargs`:
+    drop the rows that are empty in every column (like `post_process_dataframe`
+    does, whether or not those columns are selected), keep the selected
+    columns and drop the rows for which `where` doesn't hold, chunk by
+    chunk, then join what's left.
+    Without `columns`, the columns with a blank header and no data in any
+    row are dropped at the end, like `_post_process_dataframe` does.
+    """
+    retype = bool(layout.num_pre_header_rows) and force_numeric
+    kept = []
+    has_data = np.zeros(len(order), dtype=bool)
+    for chunk in chunks:
+        not_null = chunk.notnull().values
+        rows = not_null.any(axis=1)
+        has_data |= not_null[:, order].any(axis=0)
+        chunk = chunk.iloc[rows, order]
+        if columns is not None:
+            chunk.columns = list(columns)
+        elif layout.num_pre_header_rows:
+            chunk.columns = [np.nan if name is None else name for name in layout.header]
+        if retype:
+            # See remove_data_before_header for why types have to be re-inferred.
+            chunk = infer_dtypes(chunk, dtype_inference)
+        if where is not None:
+            chunk = chunk[np.asarray(where(chunk), dtype=bool)]
+        kept.append(chunk)
+
+    if len(kept) == 1:
+        df = kept[0]
+    else:
+        df = pd.concat(kept)
+        if retype:
+            # a column can be typed differently in different chunks
+            df = infer_dtypes(df, dtype_inference)
+    if columns is None:
+        blank_header = np.array(
+            [_is_blank_header(col) for col in df.columns], dtype=bool
+        )
+        column_mask = ~(blank_header & ~has_data)
+        if not column_mask.all():
+            df = df.iloc[:, column_mask]
+    df.index = range(len(df))
     return df
 
 
+def parse_csv_selection(
+    bytesio: IO[bytes],
+    *,
+    columns: Optional[Sequence[Any]] = None,
+    where: Optional[RowPredicate] = None,
+    force_numeric: bool = True,
+    dtype_inference: Optional[DtypeInference] = None,
+    pandas_kwargs: Dict[str, Any],
+) -> pd.DataFrame:
+    """`parse_csv` followed by `select_rows`, without building the columns
+    that aren't selected.
+
+    The header is found in the first rows of the file (as in
+    `preview_table`), then the file is read from the header on, and only
+    the selected columns are typed and kept. With `where`, the rows are read
+    in chunks of SELECTION_CHUNK_ROWS, each filtered as soon as it is read.
+    Rows are dropped by the same rule as `parse_csv`: when they are empty in
+    every column, selected or not.
+    """
+    rows = _CsvRows(bytesio, pandas_kwargs)
+    layout = _find_layout(rows, force_numeric, dtype_inference)
+    read_kwargs, order = _selection_read_kwargs(layout, columns)
+
+    bytesio.seek(0)
+    read = pd.read_csv(
+        bytesio,
+        skip_blank_lines=True,
+        sep=rows.delimiter,
+        chunksize=SELECTION_CHUNK_ROWS if where is not None else None,
+        **read_kwargs,
+        **rows.read_kwargs,
+    )
+    return _select_from_chunks(
+        [read] if where is None else read,
+        layout,
+        order,
+        columns=columns,
+        where=where,
+        force_numeric=force_numeric,
+        dtype_inference=dtype_inference,
+    )
+
+
+def parse_excel_sheet_selection(
+    excel_file: pd.ExcelFile,
+    sheet: str,
+    *,
+    columns: Optional[Sequence[Any]] = None,
+    where: Optional[RowPredicate] = None,
+    force_numeric: bool = True,
+    dtype_inference: Optional[DtypeInference] = None,
+    pandas_kwargs: Dict[str, Any],
+) -> pd.DataFrame:
+    """`parse_excel_sheet` followed by `select_rows`, without typing the
+    columns that aren't selected. The reader still decodes the whole sheet,
+    and `where` is applied once the selected columns are read.
+    """
+
+    def read_rows(num_read: int) -> Tuple[pd.DataFrame, bool]:
+        df = excel_file.parse(
+            sheet, skip_blank_lines=True, **{**pandas_kwargs, "nrows": num_read}
+        )
+        return df, len(df) < num_read
+
+    layout = _find_layout(read_rows, force_numeric, dtype_inference)
+    read_kwargs, order = _selection_read_kwargs(layout, columns)
+    df = excel_file.parse(sheet, skip_blank_lines=True, **read_kwargs, **pandas_kwargs)
+    return _select_from_chunks(
+        [df],
+        layout,
+        order,
+        columns=columns,
+        where=where,
+        force_numeric=force_numeric,
+        dtype_inference=dtype_inference,
+    )
+
+
 class ParseVisitor:
     def __init__(
-        self, *, force_numeric: bool = True, pandas_kwargs: Dict[str, Any]
+        self,
+        *,
+        force_numeric: bool = True,
+        dtype_inference: Optional[DtypeInference] = None,
+        sheets: Optional[List[str]] = None,
+        leaf_timeout: Optional[float] = None,
+        isolation: str = "thread",
+        cancel: Optional[threading.Event] = None,
+        layout_cache: Optional[LayoutCache] = None,
+        dedup: bool = False,
+        preview_rows: Optional[int] = None,
+        columns: Optional[List[Any]] = None,
+        where: Optional[RowPredicate] = None,
+        pandas_kwargs: Dict[str, Any],
     ) -> None:
         self.force_numeric = force_numeric
+        self.dtype_inference = dtype_inference
+        self.sheets = sheets
+        self.leaf_timeout = leaf_timeout
+        self.isolation = isolation
+        self.cancel = cancel
+        self.layout_cache = layout_cache
+        self.dedup = dedup
+        self.preview_rows = preview_rows
+        self.columns = columns
+        self.where = where
         self.pandas_kwargs = pandas_kwargs
+        # with dedup, the results of each leaf content parsed so far
+        self._results_by_content: Dict[Tuple[type, str], _ParsedContent] = {}
+        # the layouts of the small csv files of the container being visited,
+        # when there's no layout cache
+        self._sibling_layouts: Optional[LayoutCache] = None
+
+    def table_options(self) -> Dict[str, Any]:
+        """The arguments that decide what tables look like, e.g. to rebuild
+        this visitor in another process. The layout cache stays in this
+        process, so leaves parsed with "process" isolation don't use it.
+        """
+        return {
+            "force_numeric": self.force_numeric,
+            "dtype_inference": self.dtype_inference,
+            "sheets": self.sheets,
+            "preview_rows": self.preview_rows,
+            "columns": self.columns,
+            "where": self.where,
+            "pandas_kwargs": self.pandas_kwargs,
+        }
+
+    @property
+    def selects(self) -> bool:
+        return self.columns is not None or self.where is not None
+
+    @property
+    def pushes_selection(self) -> bool:
+        """Whether the selection is made by the readers, rather than on
+        the parsed tables.
+        """
+        return (
+            self.selects
+            and self.preview_rows is None
+            and _selection_pushable(self.pandas_kwargs)
+        )
+
+    def _select(self, df: pd.DataFrame) -> pd.DataFrame:
+        return select_rows(df, self.columns, self.where)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel is not None and self.cancel.is_set()
+
+    _registered_visits: Dict[Type[FileNode], VisitMethod] = {}
+    _dispatch_cache: Dict[Tuple[type, type], VisitMethod] = {}
+
+    @classmethod
+    def register_visit(cls, node_type: Type[FileNode], visit: VisitMethod) -> None:
+        """Make `visit(visitor, node)` the way nodes of `node_type` (and of
+        its subclasses without a visit of their own) are parsed.
+        """
+        ParseVisitor._registered_visits[node_type] = visit
+        ParseVisitor._dispatch_cache.clear()
+
+    def _resolve_visit(self, node_type: type) -> VisitMethod:
+        for klass in node_type.__mro__:
+            if klass in self._registered_visits:
+                return self._registered_visits[klass]
+            visit = getattr(type(self), "visit_" + klass.__name__, None)
+            if visit is not None:
+                return visit  # type: ignore
+        raise NotImplementedError(
+            f"{type(self).__name__} has no visit for node type {node_type.__name__}"
+        )
 
     def visit(self, node: FileNode) -> Iterable[ParseResult]:
-        visitor_method_name = "visit_" + node.__class__.__name__
-        visitor_method = getattr(self, visitor_method_name)
-        yield from visitor_method(node)
+        if self.cancelled:
+            return
+        key = (type(self), type(node))
+        visit = self._dispatch_cache.get(key)
+        if visit is None:
+            visit = self._dispatch_cache[key] = self._resolve_visit(type(node))
+
+        if node.IS_CONTAINER:
+            yield from self._visit_container(visit, node)
+        elif isinstance(node, Skip):
+            yield from visit(self, node)
+        elif self.dedup:
+            yield from self._visit_deduplicated_leaf(visit, node)
+        else:
+            yield from self._visit_leaf(visit, node)
+
+    def _visit_container(
+        self, visit: VisitMethod, node: FileNode
+    ) -> Iterable[ParseResult]:
+        """Small csv files in one container are usually pieces of the same
+        export, so the layout found for one of them is tried on the next
+        before detecting it from scratch (see `parse_csv`).
+        """
+        outer_layouts = self._sibling_layouts
+        self._sibling_layouts = LayoutCache()
+        try:
+            yield from visit(self, node)
+        finally:
+            self._sibling_layouts = outer_layouts
+
+    def _visit_leaf(self, visit: VisitMethod, node: FileNode) -> Iterable[ParseResult]:
+        if self.leaf_timeout is None:
+            yield from visit(self, node)
+        else:
+            yield from self._visit_isolated_leaf(visit, node)
+
+    def _visit_deduplicated_leaf(
+        self, visit: VisitMethod, node: FileNode
+    ) -> Iterable[ParseResult]:
+        """Parse each content once: a leaf with the same node type and
+        content as one parsed before (see `_content_key`) gets copies of its
+        results under its own name, whose tables share the DataFrames of the
+        first (or that is parsed again, if the caller has dropped those).
+        """
+        key, parsed_node = _content_key(node)
+        if key is None:
+            yield from self._visit_leaf(visit, node)
+            return
+        parsed = self._results_by_content.get(key)
+        results = None if parsed is None else parsed.renamed(node.name)
+        if results is None:
+            results = list(self._visit_leaf(visit, parsed_node))
+            if not self.cancelled:
+                self._results_by_content[key] = _ParsedContent(results)
+        # handed over one by one, so that only the caller holds on to the tables
+        while results:
+            yield results.pop(0)
+
+    def _visit_isolated_leaf(
+        self, visit: VisitMethod, node: FileNode
+    ) -> Iterable[ParseResult]:
+        try:
+            if self.isolation == "process":
+                with node.stream as bytesio:
+                    data = bytesio.read()
+                args = (self.table_options(), type(node), node.name, node.mimetype)
+                shared_directory = make_shared_directory()
+                try:
+                    shared_results = call_isolated(
+                        self.isolation,
+                        _visit_leaf_bytes,
+                        args + (node.extension, data, shared_directory),
+                        self.leaf_timeout,
+                        self.cancel,
+                    )
+                    results = load_results(shared_results)
+                finally:
+                    remove_shared_directory(shared_directory)
+            else:
+                results = call_isolated(
+                    self.isolation,
+                    lambda: list(visit(self, node)),
+                    (),
+                    self.leaf_timeout,
+                    self.cancel,
+                )
+        except Cancelled:
+            return
+        except Exception as e:
+            error = ParseError(message=str(e), exception_type=type(e), name=node.name)
+            results = [ParseResult(name=node.name, tables=[], errors=[error])]
+        yield from results
 
     def visit_Csv(self, node: Csv) -> Iterable[ParseResult]:
         tables = []
         errors = []
         with node.stream as bytesio:
+            size = _known_size(bytesio)
+            small = size is not None and size <= SMALL_FILE_SIZE
+            if small and not isinstance(bytesio, io.BytesIO):
+                # it's read from several times over
+                bytesio = io.BytesIO(bytesio.read())
             try:
-                df = parse_csv(
-                    bytesio,
-                    force_numeric=self.force_numeric,
-                    pandas_kwargs=self.pandas_kwargs,
-                )
-                table = Table(df=df, name=node.name)
+                if self.preview_rows is not None:
+                    df, truncated = preview_csv(
+                        bytesio,
+                        self.preview_rows,
+                        force_numeric=self.force_numeric,
+                        dtype_inference=self.dtype_inference,
+                        pandas_kwargs=self.pandas_kwargs,
+                    )
+                    df = self._select(df)
+                elif self.pushes_selection:
+                    df = parse_csv_selection(
+                        bytesio,
+                        columns=self.columns,
+                        where=self.where,
+                        force_numeric=self.force_numeric,
+                        dtype_inference=self.dtype_inference,
+                        pandas_kwargs=self.pandas_kwargs,
+                    )
+                    truncated = False
+                else:
+                    layout_cache = self.layout_cache
+                    if layout_cache is None and small:
+                        layout_cache = self._sibling_layouts
+                    df = parse_csv(
+                        bytesio,
+                        force_numeric=self.force_numeric,
+                        dtype_inference=self.dtype_inference,
+                        layout_cache=layout_cache,
+                        pandas_kwargs=self.pandas_kwargs,
+                    )
+                    df = self._select(df)
+                    truncated = False
+                table = Table(df=df, name=node.name, truncated=truncated)
                 tables.append(table)
             except Exception as e:
                 parse_error = ParseError(
@@ -193,27 +1568,224 @@ class ParseVisitor:
                 errors.append(parse_error)
         yield ParseResult(name=node.name, tables=tables, errors=errors)
 
+    def _parse_sheet(self, excel_file: pd.ExcelFile, sheet: str) -> pd.DataFrame:
+        if self.pushes_selection:
+            return parse_excel_sheet_selection(
+                excel_file,
+                sheet,
+                columns=self.columns,
+                where=self.where,
+                force_numeric=self.force_numeric,
+                dtype_inference=self.dtype_inference,
+                pandas_kwargs=self.pandas_kwargs,
+            )
+        df = parse_excel_sheet(
+            excel_file,
+            sheet,
+            force_numeric=self.force_numeric,
+            dtype_inference=self.dtype_inference,
+            layout_cache=self.layout_cache,
+            pandas_kwargs=self.pandas_kwargs,
+        )
+        return self._select(df)
+
+    def _trim_used_range(self, xlrd_sheet: Any) -> None:
+        trim_used_range(
+            xlrd_sheet, trim_empty_strings=_trims_empty_strings(self.pandas_kwargs)
+        )
+
+    def _open_workbook(
+        self, node: Union[Xls, Xlsx, Xlsb], bytesio: IO[bytes], resources: ExitStack
+    ) -> Tuple[List[str], Callable[[str], pd.DataFrame]]:
+        """Return the sheet names of the workbook of `node`, and a function
+        that parses one sheet. Whatever has to be closed when the visit is
+        done is pushed on `resources`.
+        """
+        import pyxlsb  # type: ignore
+        import xlrd
+
+        if isinstance(node, Xlsb) and not (self.pandas_kwargs or self.pushes_selection):
+            # pandas_kwargs, and the columns to read, only apply to the
+            # pandas reader
+            xlsb_workbook = resources.enter_context(pyxlsb.open_workbook(bytesio))
+
+            def parse_xlsb(sheet: str) -> pd.DataFrame:
+                with xlsb_workbook.get_sheet(sheet) as xlsb_sheet:
+                    df = parse_xlsb_sheet(
+                        _xlsb_sheet_rows(xlsb_sheet),
+                        force_numeric=self.force_numeric,
+                        dtype_inference=self.dtype_inference,
+                    )
+                return self._select(df)
+
+            return list(xlsb_workbook.sheets), parse_xlsb
+
+        if isinstance(node, Xlsb):
+            excel_file = pd.ExcelFile(bytesio.read(), engine="pyxlsb")
+        elif isinstance(node, Xls):
+            # Legacy workbooks load one sheet at a time, and each sheet is
+            # unloaded once it is parsed, so that memory holds one decoded
+            # sheet rather than all of them.
+            contents = resources.enter_context(_workbook_contents(bytesio))
+            workbook = xlrd.open_workbook(
+                file_contents=contents, on_demand=True, ragged_rows=True
+            )
+            resources.callback(workbook.release_resources)
+            excel_file = pd.ExcelFile(workbook, engine="xlrd")
+
+            def parse_on_demand(sheet: str) -> pd.DataFrame:
+                try:
+                    self._trim_used_range(workbook.sheet_by_name(sheet))
+                    return self._parse_sheet(excel_file, sheet)
+                finally:
+                    workbook.unload_sheet(sheet)
+
+            return list(excel_file.sheet_names), parse_on_demand
+        else:
+            workbook = _open_xlsx(
+                resources.enter_context(zipfile.ZipFile(bytesio)),
+                trim_empty_strings=_trims_empty_strings(self.pandas_kwargs),
+            )
+            excel_file = pd.ExcelFile(workbook, engine="xlrd")
+        return list(excel_file.sheet_names), partial(self._parse_sheet, excel_file)
+
+    def _open_workbook_preview(
+        self, node: Union[Xls, Xlsx, Xlsb], bytesio: IO[bytes], resources: ExitStack
+    ) -> Tuple[List[str], Callable[[str], Tuple[pd.DataFrame, bool]]]:
+        """Like `_open_workbook`, but the function previews the first
+        `preview_rows` rows of a sheet (see `preview_table`) and also tells
+        whether the sheet has more.
+        """
+        import pyxlsb
+        import xlrd
+
+        assert self.preview_rows is not None
+        num_rows = self.preview_rows
+        post_process = partial(
+            post_process_dataframe,
+            force_numeric=self.force_numeric,
+            dtype_inference=self.dtype_inference,
+        )
+
+        if isinstance(node, Xlsb) and not self.pandas_kwargs:
+            xlsb_workbook = resources.enter_context(pyxlsb.open_workbook(bytesio))
+
+            def preview_xlsb(sheet: str) -> Tuple[pd.DataFrame, bool]:
+                def read_rows(num_read: int) -> Tuple[Any, bool]:
+                    with xlsb_workbook.get_sheet(sheet) as xlsb_sheet:
+                        return _first_xlsb_rows(_xlsb_sheet_rows(xlsb_sheet), num_read)
+
+                return preview_table(
+                    read_rows,
+                    partial(
+                        parse_xlsb_sheet,
+                        force_numeric=self.force_numeric,
+                        dtype_inference=self.dtype_inference,
+                    ),
+                    num_rows,
+                )
+
+            return list(xlsb_workbook.sheets), preview_xlsb
+
+        def read_sheet_rows(
+            excel_file: pd.ExcelFile, sheet: str, num_read: int
+        ) -> Tuple[pd.DataFrame, bool]:
+            df = excel_file.parse(
+                sheet,
+                skip_blank_lines=True,
+                **{**self.pandas_kwargs, "nrows": num_read},
+            )
+            return df, len(df) < num_read
+
+        if isinstance(node, Xlsx):
+            # xlrd loads every sheet of an xlsx workbook when it is opened,
+            # so it's reopened from a view of the zip whose sheets stop
+            # after the rows to read
+            zip_file = resources.enter_context(zipfile.ZipFile(bytesio))
+            excel_files: Dict[int, pd.ExcelFile] = {}
+
+            def first_rows_file(num_read: int) -> pd.ExcelFile:
+                if num_read not in excel_files:
+                    # the header row and the rows after it
+                    workbook = _open_xlsx(
+                        zip_file,
+                        num_read + 1,
+                        trim_empty_strings=_trims_empty_strings(self.pandas_kwargs),
+                    )
+                    excel_files[num_read] = pd.ExcelFile(workbook, engine="xlrd")
+                return excel_files[num_read]
+
+            def read_xlsx_rows(sheet: str, num_read: int) -> Tuple[pd.DataFrame, bool]:
+                return read_sheet_rows(first_rows_file(num_read), sheet, num_read)
+
+            def preview_xlsx(sheet: str) -> Tuple[pd.DataFrame, bool]:
+                return preview_table(
+                    partial(read_xlsx_rows, sheet), post_process, num_rows
+                )
+
+            sheet_names = first_rows_file(num_rows + PREVIEW_LOOKAHEAD_ROWS).sheet_names
+            return list(sheet_names), preview_xlsx
+
+        if isinstance(node, Xlsb):
+            excel_file = pd.ExcelFile(bytesio.read(), engine="pyxlsb")
+
+            def preview_sheet(sheet: str) -> Tuple[pd.DataFrame, bool]:
+                return preview_table(
+                    partial(read_sheet_rows, excel_file, sheet), post_process, num_rows
+                )
+
+            return list(excel_file.sheet_names), preview_sheet
+
+        # xlrd decodes the whole of an xls sheet when it's loaded, but only
+        # the rows read are turned into a DataFrame
+        contents = resources.enter_context(_workbook_contents(bytesio))
+        workbook = xlrd.open_workbook(
+            file_contents=contents, on_demand=True, ragged_rows=True
+        )
+        resources.callback(workbook.release_resources)
+        excel_file = pd.ExcelFile(workbook, engine="xlrd")
+
+        def preview_on_demand(sheet: str) -> Tuple[pd.DataFrame, bool]:
+            try:
+                self._trim_used_range(workbook.sheet_by_name(sheet))
+                return preview_table(
+                    partial(read_sheet_rows, excel_file, sheet), post_process, num_rows
+                )
+            finally:
+                workbook.unload_sheet(sheet)
+
+        return list(excel_file.sheet_names), preview_on_demand
+
     def _visit_excel(self, node: Union[Xls, Xlsx, Xlsb]) -> Iterable[ParseResult]:
         tables = []
         errors = []
 
-        with node.stream as bytesio:
+        with node.stream as bytesio, ExitStack() as workbook_resources:
             try:
-                if isinstance(node, Xlsb):
-                    excel_file = pd.ExcelFile(bytesio.read(), engine="pyxlsb")
+                if self.preview_rows is not None:
+                    sheet_names, read_sheet = self._open_workbook_preview(
+                        node, bytesio, workbook_resources
+                    )
                 else:
-                    workbook = xlrd.open_workbook(file_contents=bytesio.read())
-                    excel_file = pd.ExcelFile(workbook, engine="xlrd")
-                sheets = excel_file.sheet_names
+                    sheet_names, parse_sheet = self._open_workbook(
+                        node, bytesio, workbook_resources
+                    )
+                    read_sheet = partial(_not_truncated, parse_sheet)
+                if self.preview_rows is not None and self.selects:
+                    read_sheet = partial(_selected_preview, self._select, read_sheet)
+                sheets = [
+                    sheet
+                    for sheet in sheet_names
+                    if self.sheets is None or sheet in self.sheets
+                ]
                 for sheet in sheets:
+                    if self.cancelled:
+                        break
                     try:
-                        df = parse_excel_sheet(
-                            excel_file,
-                            sheet,
-                            force_numeric=self.force_numeric,
-                            pandas_kwargs=self.pandas_kwargs,
+                        df, truncated = read_sheet(sheet)
+                        table = Table(
+                            df=df, name=node.name, sheet=sheet, truncated=truncated
                         )
-                        table = Table(df=df, name=node.name, sheet=sheet)
                         tables.append(table)
                     except Exception as e:
                         error = ParseError(
@@ -249,5 +1821,154 @@ class ParseVisitor:
         for child in node.children:
             yield from self.visit(child)
 
+    def visit_Tar(self, node: Tar) -> Iterable[ParseResult]:
+        for child in node.children:
+            yield from self.visit(child)
+
+    def visit_CompressedFile(self, node: CompressedFile) -> Iterable[ParseResult]:
+        for child in node.children:
+            yield from self.visit(child)
+
     def visit_Skip(self, _node: Skip) -> Iterable[ParseResult]:
         yield from []
+
+
+def _not_truncated(
+    parse_sheet: Callable[[str], pd.DataFrame], sheet: str
+) -> Tuple[pd.DataFrame, bool]:
+    return parse_sheet(sheet), False
+
+
+def _selected_preview(
+    select: Callable[[pd.DataFrame], pd.DataFrame],
+    preview_sheet: Callable[[str], Tuple[pd.DataFrame, bool]],
+    sheet: str,
+) -> Tuple[pd.DataFrame, bool]:
+    df, truncated = preview_sheet(sheet)
+    return select(df), truncated
+
+
+def _known_size(stream: IO[bytes]) -> Optional[int]:
+    """The size of an in-memory or on-disk stream, or None for a stream that
+    can only tell by being read to the end (e.g. a decompressing one).
+    """
+    if isinstance(stream, io.BytesIO):
+        with stream.getbuffer() as buffer:
+            return buffer.nbytes
+    try:
+        return os.fstat(stream.fileno()).st_size
+    except (AttributeError, OSError):
+        return None
+
+
+def _content_key(node: FileNode) -> Tuple[Optional[Tuple[Any, ...]], FileNode]:
+    """What makes the results of `node` the same as those of another leaf
+    (None if it can't be read): its type and a hash of its content. Also
+    returns the node to parse `node` from.
+
+    The content is hashed without reading it again where that would cost
+    more than the hash: streams in memory (zip and tar members, spooled
+    inputs) are hashed in place, encrypted workbooks are hashed as they
+    are stored, with the password that opens them, instead of being
+    decrypted, and streams that aren't files (e.g. the decompressed data of
+    a .gz) are copied as they're hashed, the returned node reading the
+    copy. Only a file on disk is read a second time, from the page cache
+    the hashing read has just filled.
+    """
+    digest = hashlib.sha1()
+    parsed_node = node
+    password = None
+    try:
+        if isinstance(node, ExcelEncryptionMixin):
+            stream_manager = node.raw_stream
+            if not node.encrypted:
+                password = node.working_password
+        else:
+            stream_manager = node.stream
+        with stream_manager as bytesio:
+            if isinstance(bytesio, io.BytesIO):
+                with bytesio.getbuffer() as buffer:
+                    digest.update(buffer)
+            elif _is_file(bytesio):
+                for chunk in iter(partial(bytesio.read, DEDUP_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+            else:
+                copy = spooled_copy(bytesio, digest, chunk_size=DEDUP_CHUNK_SIZE)
+                parsed_node = type(node)(
+                    name=node.name,
+                    stream=copy,
+                    mimetype=node.mimetype,
+                    extension=node.extension,
+                    passwords=node.passwords,
+                )
+    except Exception:
+        return None, node
+    return (type(node), digest.hexdigest(), password), parsed_node
+
+
+def _is_file(stream: IO[bytes]) -> bool:
+    # not just a `fileno()`, which e.g. a GzipFile has from the file it reads
+    return isinstance(getattr(stream, "raw", stream), io.FileIO)
+
+
+class _ParsedContent:
+    """The results of a leaf parsed with dedup, for the leaves with the same
+    content. Only weak references to the DataFrames are kept, so a table
+    the caller has dropped is freed; a copy whose tables are gone is parsed
+    again.
+    """
+
+    def __init__(self, results: List[ParseResult]) -> None:
+        self._results = [
+            (
+                [
+                    (weakref.ref(table.df), table.sheet, table.truncated)
+                    for table in result.tables
+                ],
+                result.errors,
+            )
+            for result in results
+        ]
+
+    def renamed(self, name: Optional[str]) -> Optional[List[ParseResult]]:
+        """The results under `name`, sharing the DataFrames of the first,
+        or None if one of those was freed.
+        """
+        renamed = []
+        for tables, errors in self._results:
+            renamed_tables = []
+            for df_ref, sheet, truncated in tables:
+                df = df_ref()
+                if df is None:
+                    return None
+                renamed_tables.append(
+                    Table(df=df, name=name, sheet=sheet, truncated=truncated)
+                )
+            renamed.append(
+                ParseResult(
+                    name=name,
+                    tables=renamed_tables,
+                    errors=[replace(error, name=name) for error in errors],
+                )
+            )
+        return renamed
+
+
+def _visit_leaf_bytes(
+    table_options: Dict[str, Any],
+    node_type: Type[FileNode],
+    name: Optional[str],
+    mimetype: Optional[str],
+    extension: Optional[str],
+    data: bytes,
+    shared_directory: str,
+) -> List[SharedParseResult]:
+    """Parse a leaf node rebuilt from its (decrypted) bytes. This runs in
+    the child process of "process" isolation, and hands the tables back
+    through files in `shared_directory` (see `fables.transport`).
+    """
+    node = node_type(
+        name=name, stream=io.BytesIO(data), mimetype=mimetype, extension=extension
+    )
+    results = list(ParseVisitor(**table_options).visit(node))
+    return share_results(results, shared_directory)
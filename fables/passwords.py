@@ -0,0 +1,148 @@
+"""
+Pick the passwords to try on an encrypted file, and remember the keys
+derived from them.
+
+`passwords` maps a path pattern to a password or to a list of candidate
+passwords, which are tried in order. A node tries the candidates of the
+pattern that best matches its name first (see `password_candidates`), so
+`{"*": [...]}` gives fallbacks for every file.
+
+Deriving an office file key from a password runs a hash 100,000 times
+(the "spin count"), which dominates detection when several candidates
+are tried on many files. `DERIVED_KEYS` remembers, per set of encryption
+parameters (salt, spin count, ...) and password, the key that decrypted
+a file and the passwords that didn't, so that re-detecting a file, or a
+file that shares its encryption parameters, doesn't derive them again.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from fnmatch import fnmatch
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+PasswordCandidates = Union[str, List[str]]
+Passwords = Dict[str, PasswordCandidates]
+
+# Number of derived keys (and of passwords known not to work) remembered.
+MAX_DERIVED_KEYS = 1024
+
+
+def _as_list(candidates: PasswordCandidates) -> List[str]:
+    return [candidates] if isinstance(candidates, str) else list(candidates)
+
+
+def password_candidates(name: Optional[str], passwords: Passwords) -> List[str]:
+    """The passwords to try on the file `name`, best first: those keyed by
+    the longest os-normalized sub-path of the name (or pattern) that
+    matches it, then those of shorter matches. The candidates of one key
+    keep their order. Each candidate can cost a key derivation, so keys
+    that don't match aren't tried, except that with no match at all, the
+    first candidate of the longest key is the one guess.
+    """
+    if name is None:
+        return []
+
+    ranked: List[Tuple[bool, int, str, List[str]]] = []
+    for path, candidates in passwords.items():
+        candidate_list = _as_list(candidates)
+        if not candidate_list:
+            continue
+        is_match = fnmatch(name, f"*{path}")
+        ranked.append((is_match, len(path), candidate_list[0], candidate_list))
+    ranked.sort(key=lambda rank: rank[:3], reverse=True)
+
+    if ranked and not ranked[0][0]:
+        return [ranked[0][2]]
+    ordered: List[str] = []
+    for is_match, *_, candidate_list in ranked:
+        if not is_match:
+            break
+        for candidate in candidate_list:
+            if candidate not in ordered:
+                ordered.append(candidate)
+    return ordered
+
+
+def encryption_parameters(office_file: Any) -> Optional[Tuple[Any, ...]]:
+    """What the key of an ECMA-376 (xlsx, xlsb) encrypted file is derived
+    from, besides the password. None for formats whose keys aren't
+    remembered (e.g. the RC4 of xls, which is cheap to derive).
+    """
+    info: Dict[str, Any] = getattr(office_file, "info", {})
+    kind = getattr(office_file, "type", None)
+    if kind == "agile":
+        return (
+            kind,
+            info["passwordSalt"],
+            info["passwordHashAlgorithm"],
+            info["spinValue"],
+            info["passwordKeyBits"],
+            info["encryptedKeyValue"],
+        )
+    if kind == "standard":
+        header = info["header"]
+        return (
+            kind,
+            header["algId"],
+            header["algIdHash"],
+            header["providerType"],
+            header["keySize"],
+            info["verifier"]["salt"],
+        )
+    return None
+
+
+class DerivedKeyCache:
+    """A thread-safe LRU map of (encryption parameters, password) -> the
+    key that decrypted a file, or None for a password that didn't.
+    Passwords are only kept hashed.
+    """
+
+    def __init__(self, max_size: int = MAX_DERIVED_KEYS) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self._keys: "OrderedDict[str, Optional[bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(parameters: Tuple[Any, ...], password: str) -> str:
+        digest = hashlib.sha256(repr(parameters).encode("utf-8"))
+        digest.update(password.encode("utf-8"))
+        return digest.hexdigest()
+
+    def lookup(
+        self, parameters: Tuple[Any, ...], password: str
+    ) -> Tuple[bool, Optional[bytes]]:
+        """Return (known, key): known is False when the password hasn't been
+        tried with these parameters, and key is None when it didn't work.
+        """
+        cache_key = self._cache_key(parameters, password)
+        with self._lock:
+            if cache_key not in self._keys:
+                return False, None
+            self._keys.move_to_end(cache_key)
+            self.hits += 1
+            return True, self._keys[cache_key]
+
+    def _store(self, cache_key: str, key: Optional[bytes]) -> None:
+        with self._lock:
+            self._keys[cache_key] = key
+            self._keys.move_to_end(cache_key)
+            while len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+
+    def verified(self, parameters: Tuple[Any, ...], password: str, key: bytes) -> None:
+        self._store(self._cache_key(parameters, password), key)
+
+    def rejected(self, parameters: Tuple[Any, ...], password: str) -> None:
+        self._store(self._cache_key(parameters, password), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys.clear()
+            self.hits = 0
+
+
+DERIVED_KEYS = DerivedKeyCache()
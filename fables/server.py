@@ -0,0 +1,294 @@
+"""
+A parse server with warm worker processes, for batch jobs that would
+otherwise start a Python process, import fables and spin up a pool for
+every few files.
+
+    fables serve --socket /tmp/fables.sock --workers 4
+
+starts a `ParseServer`, which starts its `workers` processes once and
+warms them up (pandas and the file readers imported, libmagic loaded, the
+csv sniffer run), then takes detect and parse requests over a Unix domain
+socket. `ParseClient` sends them:
+
+    with ParseClient('/tmp/fables.sock') as client:
+        tree = client.detect('dump.zip')
+        summaries = client.parse('dump.zip', 'tables/', output_format='arrow')
+
+The workers write the tables to Arrow IPC, Parquet or csv files in the
+output directory (see `fables.cli.parse_to_files`) and the response lists
+them, so tables never go through the socket. The files of a directory are
+parsed by all the workers at once.
+
+Requests and responses are JSON objects, one per line. A request is
+`{"command": "detect" | "parse", "path": ..., ...}` and its response is
+`{"result": ...}` or `{"error": "<exception type>: <message>"}`. Paths are
+read by the server, so the client makes them absolute.
+"""
+
+import io
+import json
+import multiprocessing
+import os
+import socket
+import socketserver
+import stat
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional
+
+from fables.api import detect, parse
+from fables.cli import OUTPUT_FORMATS, JobSummary, input_files, parse_to_files
+from fables.passwords import Passwords
+from fables.tree import FileNode
+
+
+# imported by each worker before it takes requests, besides what parsing
+# a csv file imports
+WARM_UP_MODULES = ["xlrd", "pyxlsb", "msoffcrypto"]
+
+COMMANDS = ["detect", "parse"]
+
+# how long the workers wait for each other to warm up
+WARM_UP_TIMEOUT = 60  # seconds
+
+
+class ServerError(Exception):
+    """A request the parse server couldn't carry out."""
+
+
+def warm_up(ready: Optional[Any] = None) -> None:
+    """Pay the start-up costs of parsing in a worker process, before it
+    takes its first request. With a `multiprocessing.Barrier` as `ready`,
+    wait for the other workers to warm up too.
+    """
+    import importlib
+
+    for name in WARM_UP_MODULES:
+        importlib.import_module(name)
+    try:
+        import pyarrow  # type: ignore # NOQA
+    except ImportError:
+        pass
+    # loads this process's libmagic handle, and runs the csv sniffer and
+    # the pandas reader once
+    for _ in parse(io.BytesIO(b"a,b\n1,2\n"), stream_file_name="warm_up.csv"):
+        pass
+    if ready is not None:
+        ready.wait(WARM_UP_TIMEOUT)
+
+
+def _ready() -> None:
+    pass
+
+
+def detect_tree(path: str, passwords: Passwords) -> Dict[str, Any]:
+    """The detection tree of `path`, as the JSON the server returns."""
+    return _node_json(detect(path, passwords=dict(passwords)))
+
+
+def _node_json(node: FileNode) -> Dict[str, Any]:
+    return {
+        "name": node.name,
+        "type": type(node).__name__,
+        "mimetype": node.mimetype,
+        "encrypted": node.encrypted,
+        "children": [_node_json(child) for child in node.children],
+        "extract_errors": [error.message for error in node.extract_errors],
+    }
+
+
+def _remove_stale_socket(socket_path: str) -> None:
+    """Remove the socket file left behind by a server that didn't shut
+    down cleanly. A socket with a server listening on it is left alone.
+    """
+    try:
+        if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+            return
+    except FileNotFoundError:
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except ConnectionRefusedError:
+        os.remove(socket_path)
+    else:
+        raise OSError(f"a server is already listening on '{socket_path}'")
+    finally:
+        probe.close()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    server: "ParseServer"
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                response = {"result": self.server.run_request(json.loads(line))}
+            except Exception as e:
+                response = {"error": f"{type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class ParseServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Listens on `socket_path` and runs the requests of each connection on
+    a pool of `workers` processes, which are started and warmed up before
+    the server is returned. If a worker dies (e.g. killed for using too
+    much memory), the requests it was part of fail and the pool is
+    replaced by a new one, whose workers start as they're needed.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, workers: int = 1) -> None:
+        if workers < 1:
+            raise ValueError("ParseServer needs at least one worker")
+        _remove_stale_socket(socket_path)
+        self.workers = workers
+        self._executor_lock = threading.Lock()
+        # only the first pool waits for all its workers to warm up: the
+        # workers of a replacement pool start one at a time
+        self.executor = self._start_executor(multiprocessing.Barrier(workers))
+        try:
+            # a process is started for each of these, as none is idle yet,
+            # and none of them runs before every worker has warmed up
+            for future in [self.executor.submit(_ready) for _ in range(workers)]:
+                future.result()
+            super().__init__(socket_path, _RequestHandler)
+        except BaseException:
+            self.executor.shutdown(wait=False)
+            raise
+
+    def _start_executor(self, ready: Optional[Any] = None) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers, initializer=warm_up, initargs=(ready,)
+        )
+
+    def _replace_broken_executor(self, broken: ProcessPoolExecutor) -> None:
+        with self._executor_lock:
+            # another request that failed with the same pool may have
+            # replaced it already
+            if self.executor is broken:
+                self.executor = self._start_executor()
+        broken.shutdown(wait=False)
+
+    def run_request(self, request: Any) -> Any:
+        executor = self.executor
+        try:
+            return self._run_request(executor, request)
+        except BrokenProcessPool:
+            self._replace_broken_executor(executor)
+            raise
+
+    def _run_request(self, executor: ProcessPoolExecutor, request: Any) -> Any:
+        if not isinstance(request, dict) or request.get("command") not in COMMANDS:
+            raise ValueError(f"requests need a 'command', one of {COMMANDS}")
+        path = request.get("path")
+        if not isinstance(path, str) or not os.path.exists(path):
+            raise ValueError(f"'path' must be a file or directory, not {path!r}")
+        passwords = request.get("passwords") or {}
+        if not isinstance(passwords, dict):
+            raise ValueError("'passwords' must be an object of path -> password(s)")
+
+        if request["command"] == "detect":
+            return executor.submit(detect_tree, path, passwords).result()
+
+        output_dir = request.get("output_dir")
+        if not isinstance(output_dir, str):
+            raise ValueError("parse requests need an 'output_dir'")
+        output_format = request.get("output_format", "arrow")
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"'output_format' must be one of {sorted(OUTPUT_FORMATS)}")
+        sheets = request.get("sheets")
+        if sheets is not None and not (
+            isinstance(sheets, list) and all(isinstance(sheet, str) for sheet in sheets)
+        ):
+            raise ValueError("'sheets' must be a list of sheet names")
+        os.makedirs(output_dir, exist_ok=True)
+        job_args = (output_dir, output_format, passwords, sheets)
+        futures = [
+            executor.submit(parse_to_files, name, *job_args)
+            for name in input_files([path])
+        ]
+        return [asdict(future.result()) for future in futures]
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.executor.shutdown(wait=True)
+        try:
+            os.remove(self.server_address)  # type: ignore
+        except FileNotFoundError:
+            pass
+
+
+class ParseClient:
+    """A connection to a `ParseServer`. Requests on one connection are run
+    one at a time; open a client per thread to run them concurrently.
+    """
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = None) -> None:
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        try:
+            self._socket.connect(socket_path)
+        except BaseException:
+            self._socket.close()
+            raise
+        self._file = self._socket.makefile("rwb")
+
+    def _request(self, **request: Any) -> Any:
+        self._file.write(json.dumps(request).encode("utf-8") + b"\n")
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("the parse server closed the connection")
+        response = json.loads(line)
+        if "error" in response:
+            raise ServerError(response["error"])
+        return response["result"]
+
+    def detect(
+        self, path: str, passwords: Optional[Passwords] = None
+    ) -> Dict[str, Any]:
+        """The detection tree of `path`: nested dicts with the name, type,
+        mimetype, encrypted flag, children and extract errors of each node.
+        """
+        return dict(
+            self._request(
+                command="detect", path=os.path.abspath(path), passwords=passwords
+            )
+        )
+
+    def parse(
+        self,
+        path: str,
+        output_dir: str,
+        *,
+        output_format: str = "arrow",
+        passwords: Optional[Passwords] = None,
+        sheets: Optional[List[str]] = None,
+    ) -> List[JobSummary]:
+        """Parse the file or directory `path`, writing each table to a file
+        in `output_dir`, and return a summary of each file parsed.
+        """
+        summaries = self._request(
+            command="parse",
+            path=os.path.abspath(path),
+            output_dir=os.path.abspath(output_dir),
+            output_format=output_format,
+            passwords=passwords,
+            sheets=sheets,
+        )
+        return [JobSummary(**summary) for summary in summaries]
+
+    def close(self) -> None:
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self) -> "ParseClient":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
@@ -0,0 +1,468 @@
+"""
+Random access to streams for which every read is a round trip.
+
+Detection and parsing read the start of a stream several times (mimetype,
+encoding, delimiter sniffing, size checks all read then seek back), and
+`zipfile` jumps between the central directory at the end of an archive
+and the member headers. That's free for a file or a BytesIO, but a stream
+backed by object storage (an S3/GCS file object, an HTTP range reader)
+turns each of those reads into a request.
+
+`BlockCachedStream` wraps such a stream and reads it in fixed size blocks:
+a read that misses fetches the missing blocks it needs, plus `read_ahead`
+more, in one read of the wrapped stream, and keeps the last `capacity`
+blocks in an LRU cache. `detect` and `parse` wrap the streams they're
+given with the default settings unless they're in memory, files on disk,
+or already wrapped; wrap a stream yourself to choose the settings or to
+read its `stats`.
+
+`StreamSpooler` copies streams that can't seek at all (pipes, sockets,
+HTTP response bodies) into memory, or into a temporary file once they're
+bigger than `SPOOL_MEMORY_SIZE`, so that they can be detected and parsed
+like any other stream.
+
+`spooled_copy` makes the same kind of copy of a stream that can only be
+read cheaply once (e.g. one decompressed as it's read), hashing it on the
+way.
+
+`AgileDecryptedStream` is a `BlockCachedStream` of the plaintext of an
+ECMA-376 agile encrypted workbook, which decrypts the 4096 byte segments
+of its encrypted package as they're read, so that a decrypted workbook
+isn't copied into memory in full.
+
+`HighLatencyStream` is an in-memory stream that sleeps on every read, to
+test and measure code against a remote stream locally.
+"""
+
+import hashlib
+import io
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import IO, Any, List, Optional, Tuple, cast
+
+
+DEFAULT_BLOCK_SIZE = 256 * 1024
+
+# blocks kept in memory, i.e. 16 MiB with the default block size
+DEFAULT_CAPACITY = 64
+
+# blocks fetched after one that missed, in the same read
+DEFAULT_READ_AHEAD = 3
+
+# spooled streams move from memory to a temporary file past this size
+SPOOL_MEMORY_SIZE = 32 * 1024**2
+
+SPOOL_CHUNK_SIZE = 1024**2
+
+# agile encrypted packages start with the size of their plaintext, which
+# is encrypted in segments of AGILE_SEGMENT_SIZE bytes, each with its own IV
+AGILE_HEADER_SIZE = 8
+AGILE_SEGMENT_SIZE = 4096
+
+# decrypted segments kept in memory, i.e. 1 MiB
+AGILE_CAPACITY = 256
+
+AGILE_HASH_ALGORITHMS = {
+    "SHA1": hashlib.sha1,
+    "SHA256": hashlib.sha256,
+    "SHA384": hashlib.sha384,
+    "SHA512": hashlib.sha512,
+}
+
+
+@dataclass
+class BlockCacheStats:
+    # blocks served from the cache
+    hits: int = 0
+    # blocks that had to be fetched
+    misses: int = 0
+    # reads of the wrapped stream
+    fetches: int = 0
+    bytes_fetched: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        requested = self.hits + self.misses
+        return self.hits / requested if requested else 0.0
+
+
+class BlockCachedStream(io.BufferedIOBase):
+    """A read-only, seekable view of `stream` that caches it in blocks. Seeking
+    only moves the position; the wrapped stream is read when a read needs
+    a block that isn't cached. Closing this doesn't close `stream`.
+    """
+
+    def __init__(
+        self,
+        stream: IO[bytes],
+        *,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        capacity: int = DEFAULT_CAPACITY,
+        read_ahead: int = DEFAULT_READ_AHEAD,
+    ) -> None:
+        if block_size <= 0 or capacity <= 0 or read_ahead < 0:
+            raise ValueError(
+                "BlockCachedStream needs block_size > 0, capacity > 0 and "
+                + "read_ahead >= 0"
+            )
+        super().__init__()
+        self.stream = stream
+        self.block_size = block_size
+        self.capacity = capacity
+        self.read_ahead = read_ahead
+        self.stats = BlockCacheStats()
+        self._blocks: "OrderedDict[int, bytes]" = OrderedDict()
+        self._position = 0
+        self._lock = threading.Lock()
+        self._size = stream.seek(0, io.SEEK_END)
+
+    @property
+    def name(self) -> Any:
+        # raises AttributeError for nameless streams, like they do
+        return self.stream.name
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self._size + offset
+        else:
+            raise ValueError(f"invalid whence ({whence})")
+        if position < 0:
+            raise ValueError(f"negative seek position {position}")
+        self._position = position
+        return position
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        if self.closed:
+            raise ValueError("read of closed file")
+        start = self._position
+        end = self._size if size is None or size < 0 else min(start + size, self._size)
+        if start >= end:
+            return b""
+        with self._lock:
+            data = self._read_span(start, end)
+        self._position = end
+        return data
+
+    read1 = read
+
+    def readinto(self, buffer: Any) -> int:
+        view = memoryview(buffer).cast("B")
+        data = self.read(len(view))
+        view[: len(data)] = data
+        return len(data)
+
+    readinto1 = readinto
+
+    def _read_span(self, start: int, end: int) -> bytes:
+        first = start // self.block_size
+        last = (end - 1) // self.block_size
+        num_blocks = -(-self._size // self.block_size)
+
+        blocks: List[bytes] = []
+        block = first
+        while block <= last:
+            cached = self._blocks.get(block)
+            if cached is not None:
+                self._blocks.move_to_end(block)
+                self.stats.hits += 1
+                blocks.append(cached)
+                block += 1
+                continue
+
+            # fetch the run of missing blocks this read needs, and read
+            # ahead past it, in one read of the wrapped stream
+            limit = min(max(last + 1, block + 1 + self.read_ahead), num_blocks)
+            run_end = block + 1
+            while run_end < limit and run_end not in self._blocks:
+                run_end += 1
+            fetched = self._fetch(block * self.block_size, run_end * self.block_size)
+            for i in range(block, run_end):
+                offset = (i - block) * self.block_size
+                offset_end = offset + self.block_size
+                data = fetched[offset:offset_end]
+                self._store(i, data)
+                if i <= last:
+                    self.stats.misses += 1
+                    blocks.append(data)
+            block = min(run_end, last + 1)
+
+        skip = start - first * self.block_size
+        stop = end - first * self.block_size
+        return b"".join(blocks)[skip:stop]
+
+    def _fetch(self, start: int, end: int) -> bytes:
+        """The bytes from `start` to `end` (past the end of the stream for
+        the last block), which are both at block boundaries.
+        """
+        return self._read_stream(start, min(end, self._size) - start)
+
+    def _read_stream(self, start: int, size: int) -> bytes:
+        self.stream.seek(start)
+        self.stats.fetches += 1
+        data = self.stream.read(size) or b""
+        # unbuffered streams may return short reads
+        while len(data) < size:
+            more = self.stream.read(size - len(data))
+            if not more:
+                break
+            self.stats.fetches += 1
+            data += more
+        self.stats.bytes_fetched += len(data)
+        return data
+
+    def _store(self, block: int, data: bytes) -> None:
+        self._blocks[block] = data
+        self._blocks.move_to_end(block)
+        while len(self._blocks) > self.capacity:
+            self._blocks.popitem(last=False)
+
+
+class AgileDecryptedStream(BlockCachedStream):
+    """The plaintext of `package`, the `EncryptedPackage` stream of an
+    ECMA-376 agile encrypted file, given the `key` and the `key_data_salt`
+    and `hash_algorithm` of its key data. Each segment is decrypted when a
+    read first needs it, and the last `capacity` decrypted segments are
+    cached, so a zip reader seeking through the plaintext only decrypts
+    the parts it reads.
+    """
+
+    def __init__(
+        self,
+        package: IO[bytes],
+        *,
+        key: bytes,
+        key_data_salt: bytes,
+        hash_algorithm: str,
+        capacity: int = AGILE_CAPACITY,
+        read_ahead: int = DEFAULT_READ_AHEAD,
+    ) -> None:
+        super().__init__(
+            package,
+            block_size=AGILE_SEGMENT_SIZE,
+            capacity=capacity,
+            read_ahead=read_ahead,
+        )
+        package.seek(0)
+        header = package.read(AGILE_HEADER_SIZE)
+        if len(header) < AGILE_HEADER_SIZE:
+            raise ValueError("the encrypted package is too short")
+        (self._size,) = struct.unpack("<Q", header)
+        self._key = key
+        self._key_data_salt = key_data_salt
+        self._hash = AGILE_HASH_ALGORITHMS.get(hash_algorithm, hashlib.sha1)
+
+    def _fetch(self, start: int, end: int) -> bytes:
+        from cryptography.hazmat.backends import default_backend  # type: ignore
+        from cryptography.hazmat.primitives.ciphers import (  # type: ignore
+            Cipher,
+            algorithms,
+            modes,
+        )
+
+        end = min(end, self._size)
+        first = start // AGILE_SEGMENT_SIZE
+        num_segments = -(-(end - start) // AGILE_SEGMENT_SIZE)
+        # the last segment is padded to the AES block size
+        ciphertext = self._read_stream(
+            AGILE_HEADER_SIZE + start, num_segments * AGILE_SEGMENT_SIZE
+        )
+        plaintext = []
+        for i in range(num_segments):
+            offset = i * AGILE_SEGMENT_SIZE
+            offset_end = offset + AGILE_SEGMENT_SIZE
+            block_key = self._key_data_salt + struct.pack("<I", first + i)
+            iv = self._hash(block_key).digest()[:16]
+            decryptor = Cipher(
+                algorithms.AES(self._key), modes.CBC(iv), backend=default_backend()
+            ).decryptor()
+            plaintext.append(
+                decryptor.update(ciphertext[offset:offset_end]) + decryptor.finalize()
+            )
+        return b"".join(plaintext)[: end - start]
+
+
+def _is_local(stream: IO[bytes]) -> bool:
+    if isinstance(stream, (io.BytesIO, BlockCachedStream)):
+        return True
+    try:
+        stream.fileno()
+        return True
+    except (AttributeError, OSError, ValueError):
+        return False
+
+
+def cached_stream(stream: IO[bytes]) -> IO[bytes]:
+    """Wrap `stream` in a `BlockCachedStream` with the default settings,
+    unless it's in memory, a file on disk, already wrapped, or can't seek.
+    """
+    seekable = getattr(stream, "seekable", None)
+    if _is_local(stream) or seekable is None or not seekable():
+        return stream
+    return cast(IO[bytes], BlockCachedStream(stream))
+
+
+def needs_spooling(stream: IO[bytes]) -> bool:
+    seekable = getattr(stream, "seekable", None)
+    return seekable is None or not seekable()
+
+
+class StreamSpooler:
+    """Copy `stream` to a seekable stream on a background thread, so that
+    the caller can look at its first `head_size` bytes (e.g. to detect the
+    mimetype) while the rest is still arriving.
+
+    Reading stops as soon as more than `max_size` bytes have arrived, so a
+    stream that is too big is never read to the end. The copy is a BytesIO
+    until it grows past `memory_size`, then a temporary file.
+    """
+
+    def __init__(
+        self,
+        stream: IO[bytes],
+        *,
+        max_size: int,
+        head_size: int,
+        memory_size: int = SPOOL_MEMORY_SIZE,
+        chunk_size: int = SPOOL_CHUNK_SIZE,
+    ) -> None:
+        self.stream = stream
+        self.max_size = max_size
+        self.head_size = head_size
+        self.memory_size = memory_size
+        self.chunk_size = chunk_size
+        self.size = 0
+        self._spooled: IO[bytes] = io.BytesIO()
+        self._head = b""
+        self._head_ready = threading.Event()
+        self._exception: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._spool, daemon=True)
+        self._thread.start()
+
+    def _spool(self) -> None:
+        try:
+            while self.size <= self.max_size:
+                chunk = self.stream.read(self.chunk_size)
+                if chunk is None:
+                    raise BlockingIOError(
+                        "non-blocking streams can't be spooled; put the stream "
+                        + "in blocking mode"
+                    )
+                if not chunk:
+                    break
+                if len(self._head) < self.head_size:
+                    self._head += chunk[: self.head_size - len(self._head)]
+                    if len(self._head) == self.head_size:
+                        self._head_ready.set()
+                self._write(chunk)
+        except BaseException as e:
+            self._exception = e
+        finally:
+            self._head_ready.set()
+
+    def _write(self, chunk: bytes) -> None:
+        if isinstance(self._spooled, io.BytesIO) and (
+            self.size + len(chunk) > self.memory_size
+        ):
+            spooled = tempfile.TemporaryFile()
+            spooled.write(self._spooled.getbuffer())
+            self._spooled = cast(IO[bytes], spooled)
+        self._spooled.write(chunk)
+        self.size += len(chunk)
+
+    def head(self) -> bytes:
+        """The first `head_size` bytes, or all of them for a shorter stream,
+        as soon as they've arrived.
+        """
+        self._head_ready.wait()
+        return self._head
+
+    def result(self) -> Tuple[IO[bytes], int, bool]:
+        """Wait for the copy: return it, its size, and whether the stream is
+        bigger than `max_size` (in which case the copy is incomplete).
+        Exceptions raised reading the stream are raised here.
+        """
+        self._thread.join()
+        if self._exception is not None:
+            raise self._exception
+        self._spooled.seek(0)
+        return self._spooled, self.size, self.size > self.max_size
+
+
+def spooled_copy(
+    stream: IO[bytes],
+    digest: Optional[Any] = None,
+    *,
+    memory_size: int = SPOOL_MEMORY_SIZE,
+    chunk_size: int = SPOOL_CHUNK_SIZE,
+) -> IO[bytes]:
+    """Copy the rest of `stream` into memory, or into a temporary file once
+    it's bigger than `memory_size`, and update `digest` (a hashlib hash)
+    with the bytes as they're copied. Returns the copy, at its start.
+    """
+    copy: IO[bytes] = io.BytesIO()
+    size = 0
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        if digest is not None:
+            digest.update(chunk)
+        if isinstance(copy, io.BytesIO) and size + len(chunk) > memory_size:
+            spooled = tempfile.TemporaryFile()
+            spooled.write(copy.getbuffer())
+            copy = cast(IO[bytes], spooled)
+        copy.write(chunk)
+        size += len(chunk)
+    copy.seek(0)
+    return copy
+
+
+class HighLatencyStream(io.BufferedIOBase):
+    """An in-memory stream that waits `latency` seconds on every read, like
+    a ranged GET. Seeking is free. `reads` counts the reads.
+    """
+
+    def __init__(self, data: bytes, latency: float = 0.01, name: Optional[str] = None):
+        super().__init__()
+        self._data = io.BytesIO(data)
+        self.latency = latency
+        self.reads = 0
+        if name is not None:
+            self.name = name
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._data.tell()
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._data.seek(offset, whence)
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        self.reads += 1
+        time.sleep(self.latency)
+        return self._data.read(size)
+
+    read1 = read
@@ -1,19 +1,22 @@
 """
 A `Table` is a dataframe, along with info about where it came from i.e.
-the file's 'name' and 'sheet'.
+the file's 'name' and 'sheet'. A `truncated` table holds only the first
+rows of a longer table, e.g. from `parse(..., preview_rows=N)`.
 """
 
 from dataclasses import dataclass
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-import pandas as pd  # type: ignore
+if TYPE_CHECKING:
+    import pandas as pd  # type: ignore
 
 
 @dataclass
 class Table:
-    df: pd.DataFrame
+    df: "pd.DataFrame"
     name: Optional[str] = None
     sheet: Optional[str] = None
+    truncated: bool = False
 
     def __str__(self) -> str:
         s = (
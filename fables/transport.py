@@ -0,0 +1,201 @@
+"""
+Send the tables parsed in a child process to the parent without pickling
+their data.
+
+Pickling a `ParseResult` copies every DataFrame into the pipe and again
+out of it, and object columns are slow to serialize. Instead, the child
+writes each numeric column of each table to its own file in a tmpfs
+directory (/dev/shm where there is one), and only a `SharedParseResult`
+describing the files goes through the pipe. The parent maps the files
+copy-on-write and builds the DataFrames on top of the mappings, so the
+column data is never copied again.
+
+Each file is unlinked as soon as it is mapped: the memory then lives
+exactly as long as the arrays that use it, and is returned to the OS when
+the parent drops the `Table`. Columns without a fixed width numpy dtype
+(strings, objects, extension dtypes) are pickled as before.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+import weakref
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, List, Optional, Union
+
+from fables.errors import ParseError
+from fables.lazy import LazyModule
+from fables.results import ParseResult
+from fables.table import Table
+
+if TYPE_CHECKING:
+    import numpy as np  # type: ignore
+    import pandas as pd  # type: ignore
+else:
+    np = LazyModule("numpy")
+    pd = LazyModule("pandas")
+
+
+# tmpfs, so that the column files are never written to disk.
+SHARED_MEMORY_DIR = "/dev/shm"
+
+# numpy dtype kinds that are written to column files: bool, (unsigned)
+# integer, float, complex, timedelta and datetime.
+SHARED_DTYPE_KINDS = "biufcmM"
+
+
+@dataclass
+class SharedColumn:
+    path: str
+    dtype: str
+    length: int
+
+
+@dataclass
+class SharedTable:
+    columns: pd.Index
+    index: pd.Index
+    data: List[Union[SharedColumn, Any]]
+    name: Optional[str] = None
+    sheet: Optional[str] = None
+    truncated: bool = False
+
+
+@dataclass
+class SharedParseResult:
+    name: Optional[str]
+    tables: List[SharedTable]
+    errors: List[ParseError]
+
+
+def make_shared_directory() -> str:
+    """Create the directory that one child's column files are written to.
+    The caller removes it with `remove_shared_directory` once the results
+    are loaded, which also removes the files of results that never were.
+    """
+    parent = SHARED_MEMORY_DIR if os.path.isdir(SHARED_MEMORY_DIR) else None
+    return tempfile.mkdtemp(prefix="fables-", dir=parent)
+
+
+def remove_shared_directory(directory: str) -> None:
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def _share_column(values: Any, directory: str) -> Union[SharedColumn, Any]:
+    if not (
+        isinstance(values, np.ndarray)
+        and values.dtype.kind in SHARED_DTYPE_KINDS
+        and len(values)
+    ):
+        return values
+    fd, path = tempfile.mkstemp(suffix=".column", dir=directory)
+    with os.fdopen(fd, "wb") as f:
+        # viewed as bytes, since datetime buffers can't be exported as is
+        f.write(np.ascontiguousarray(values).view(np.uint8).data)
+    return SharedColumn(path=path, dtype=values.dtype.str, length=len(values))
+
+
+def _load_column(column: Union[SharedColumn, Any]) -> Any:
+    if not isinstance(column, SharedColumn):
+        return column
+    mapped = np.memmap(column.path, dtype=column.dtype, mode="c", shape=column.length)
+    try:
+        os.unlink(column.path)
+    except OSError:
+        # Windows can't remove a file that is mapped; remove it once the
+        # mapping is gone instead
+        weakref.finalize(mapped, _remove_file, column.path)
+    # a plain ndarray view, so that pandas doesn't carry the memmap subclass
+    return np.asarray(mapped)
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def share_table(table: Table, directory: str) -> SharedTable:
+    df = table.df
+    data = []
+    for position in range(len(df.columns)):
+        # .values of a column with an extension dtype isn't an ndarray (or
+        # loses information, e.g. the time zone), so only numpy dtypes are
+        # written to files
+        column = df.iloc[:, position]
+        values = column.values if isinstance(column.dtype, np.dtype) else column.array
+        data.append(_share_column(values, directory))
+    return SharedTable(
+        columns=df.columns,
+        index=df.index,
+        data=data,
+        name=table.name,
+        sheet=table.sheet,
+        truncated=table.truncated,
+    )
+
+
+def _frame_of_columns(columns: List[Any], index: pd.Index) -> pd.DataFrame:
+    """A DataFrame on top of `columns` that doesn't copy them.
+
+    Built from a dict or a list, pandas before 1.3 consolidates the columns
+    of one dtype into a single 2-D block, which copies them, so the frame is
+    assembled from one block per column instead. Falls back to the dict
+    constructor on pandas versions whose internals don't take these
+    arguments.
+    """
+    try:
+        from pandas.core.internals import (  # type: ignore
+            BlockManager,
+            make_block,
+        )
+
+        blocks = [
+            make_block(
+                values.reshape(1, -1) if isinstance(values, np.ndarray) else values,
+                placement=[i],
+                ndim=2,
+            )
+            for i, values in enumerate(columns)
+        ]
+        return pd.DataFrame(BlockManager(blocks, [pd.RangeIndex(len(blocks)), index]))
+    except (ImportError, TypeError, ValueError, AssertionError):
+        pass
+    return pd.DataFrame(dict(enumerate(columns)), index=index, copy=False)
+
+
+def load_table(shared: SharedTable) -> Table:
+    df = _frame_of_columns(
+        [_load_column(column) for column in shared.data], shared.index
+    )
+    df.columns = shared.columns
+    return Table(
+        df=df, name=shared.name, sheet=shared.sheet, truncated=shared.truncated
+    )
+
+
+def share_results(
+    results: List[ParseResult], directory: str
+) -> List[SharedParseResult]:
+    return [
+        SharedParseResult(
+            name=result.name,
+            tables=[share_table(table, directory) for table in result.tables],
+            errors=result.errors,
+        )
+        for result in results
+    ]
+
+
+def load_results(shared_results: List[SharedParseResult]) -> List[ParseResult]:
+    return [
+        ParseResult(
+            name=shared.name,
+            tables=[load_table(table) for table in shared.tables],
+            errors=shared.errors,
+        )
+        for shared in shared_results
+    ]
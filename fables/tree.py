@@ -5,21 +5,51 @@ cases how they can be identified (e.g. by a heuristic on their mimetype
 and extension)
 
 Also implements the module-level function: `node_from_file()` which
-determines what node to assign an input file.
+determines what node to assign an input file, using the node types
+registered in `NODE_TYPES`.
 """
 
+import abc
+import bz2
+import gzip
 import io
+import itertools
+import lzma
 import os
+import tarfile
+import threading
+import warnings
 import zipfile
-from fnmatch import fnmatch
-from typing import Dict, IO, Iterator, List, Optional, Tuple
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from collections import deque
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    FrozenSet,
+    IO,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    cast,
+)
 
 import magic
-from msoffcrypto import OfficeFile  # type: ignore
-from msoffcrypto.__main__ import is_encrypted
 
 from fables.constants import OS_PATTERNS_TO_SKIP, NUM_BYTES_FOR_MIMETYPE_DETECTION
 from fables.errors import ExtractError
+from fables.passwords import (
+    DERIVED_KEYS,
+    PasswordCandidates,
+    Passwords,
+    encryption_parameters,
+    password_candidates,
+)
+from fables.streams import AgileDecryptedStream
+from fables.walk import DirectoryFilter, scan_directory
 
 
 UNEXPECTED_DECRYPTION_EXCEPTION_MESSAGE = (
@@ -68,6 +98,9 @@ class StreamManager:
 
 
 class FileNode:
+    # True for nodes that hold other nodes rather than tables
+    IS_CONTAINER = False
+
     def __init__(
         self,
         *,
@@ -75,13 +108,19 @@ class FileNode:
         stream: Optional[IO[bytes]] = None,
         mimetype: Optional[str] = None,
         extension: Optional[str] = None,
-        passwords: Dict[str, str] = {},
+        passwords: Optional[Passwords] = None,
     ) -> None:
-        self.name = name or getattr(stream, "name", None)
+        stream_name = getattr(stream, "name", None)
+        # the name of a temporary file or pipe is its file descriptor
+        self.name = name or (stream_name if isinstance(stream_name, str) else None)
         self._stream = stream
         self.mimetype = mimetype
         self.extension = extension
-        self.passwords = passwords
+        # children share the dict of their parent, so that `add_password`
+        # reaches them
+        self.passwords = passwords if passwords is not None else {}
+        # the candidate password that decrypted the file, once one has
+        self.working_password: Optional[str] = None
 
         self.extract_errors: List[ExtractError] = []
 
@@ -107,35 +146,34 @@ class FileNode:
     def encrypted(self) -> bool:
         return False
 
-    def add_password(self, name: str, password: str) -> None:
+    def add_password(self, name: str, password: PasswordCandidates) -> None:
         self.passwords[name] = password
 
     @property
-    def password(self) -> Optional[str]:
-        """Assigns to this node property, the password that is key'd by the
-        longest os-normalized sub-path of the node file name.
+    def password_candidates(self) -> List[str]:
+        """The passwords to try on this node, best first. Candidates are
+        ordered by the longest os-normalized sub-path of the node file name
+        that keys them.
 
-        E.g. for node.name == sub_dir_1/encrypted.xlsx, the following file-paths
+        E.g. for node.name == sub_dir_1/encrypted.xlsx, the candidates of
 
             1. sub_dir_1/encrypted.xlsx
             2. encrypted.xlsx
-            3. sub_dir_2/encrypted.xlsx
 
-        are ordered by best key to use for the password.
+        are tried in that order, and those of sub_dir_2/encrypted.xlsx only
+        if no key matches (see `fables.passwords.password_candidates`).
         """
-        if self.name is None:
-            return None
-
-        match_metrics: List[Tuple[bool, int, str]] = []
-        for path, password in self.passwords.items():
-            is_match = fnmatch(self.name, f"*{path}")
-            match_metrics.append((is_match, len(path), password))
-
-        if not match_metrics:
-            return None
+        return password_candidates(self.name, self.passwords)
 
-        # sort on match truthiness first then on file-path length
-        return sorted(match_metrics, reverse=True)[0][-1]
+    @property
+    def password(self) -> Optional[str]:
+        """The candidate password that decrypted this node, or else the
+        best candidate.
+        """
+        if self.working_password is not None:
+            return self.working_password
+        candidates = self.password_candidates
+        return candidates[0] if candidates else None
 
     def __str__(self) -> str:
         return f"{self.__class__.__name__}(name={self.name}, mimetype={self.mimetype})"
@@ -165,11 +203,47 @@ class MimeTypeFileNode(FileNode):
         return False
 
 
+_PREFETCH_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_PREFETCH_EXECUTOR_LOCK = threading.Lock()
+
+
+def _prefetch_executor() -> ThreadPoolExecutor:
+    """The thread pool that zip members are inflated on, started on first
+    use and shared by every zip: nested ones, and those of other threads.
+    """
+    global _PREFETCH_EXECUTOR
+    with _PREFETCH_EXECUTOR_LOCK:
+        if _PREFETCH_EXECUTOR is None:
+            _PREFETCH_EXECUTOR = ThreadPoolExecutor(
+                max_workers=max(1, Zip.PREFETCH_MEMBERS),
+                thread_name_prefix="fables-prefetch",
+            )
+        return _PREFETCH_EXECUTOR
+
+
+def _forget_prefetch_executor() -> None:
+    # a forked child has none of the pool's threads, so it starts its own
+    global _PREFETCH_EXECUTOR, _PREFETCH_EXECUTOR_LOCK
+    _PREFETCH_EXECUTOR = None
+    _PREFETCH_EXECUTOR_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_prefetch_executor)
+
+
 class Zip(MimeTypeFileNode):
+    IS_CONTAINER = True
     MIMETYPES = ["application/zip"]
     EXTENSIONS = ["zip"]
     EXTENSIONS_TO_EXCLUDE = ["xlsx", "xlsb"]
 
+    # members inflated ahead of the one being consumed, which needs spare
+    # cores (0 inflates them one at a time), and the most uncompressed bytes
+    # held by those
+    PREFETCH_MEMBERS = min(4, (os.cpu_count() or 1) - 1)
+    PREFETCH_BYTES = 256 * 1024**2
+
     @property
     def _bytes_password(self) -> Optional[bytes]:
         str_password = self.password
@@ -188,24 +262,29 @@ class Zip(MimeTypeFileNode):
         return bool(zf.infolist()[0].flag_bits & 0x1)
 
     def _password_decrypts(self) -> bool:
-        if self.password is None:
-            return False
+        """Try the candidate passwords in order, and keep the first one that
+        opens the first member of the zip.
+        """
+        if self.working_password is not None:
+            return True
 
         with self.stream as node_stream:
             with zipfile.ZipFile(node_stream) as zf:
                 first_child_file = zf.namelist()[0]
-                try:
-                    zf.open(first_child_file, pwd=self._bytes_password)
-                    return True
-                except RuntimeError as e:
-                    if "Bad password for file" in str(e):
-                        return False
-                    else:
+                for password in self.password_candidates:
+                    try:
+                        zf.open(first_child_file, pwd=password.encode("utf-8"))
+                    except RuntimeError as e:
+                        if "Bad password for file" in str(e):
+                            continue
                         raise RuntimeError(
                             UNEXPECTED_DECRYPTION_EXCEPTION_MESSAGE.format(
                                 self.name, str(e)
                             )
                         )
+                    self.working_password = password
+                    return True
+        return False
 
     @property
     def encrypted(self) -> bool:
@@ -215,39 +294,70 @@ class Zip(MimeTypeFileNode):
                     return not self._password_decrypts()
         return False
 
+    def _child_node(self, zf: zipfile.ZipFile, child_info: zipfile.ZipInfo) -> FileNode:
+        with zf.open(child_info, pwd=self._bytes_password) as child_stream:
+            # TODO(Thomas: 3/5/2019):
+            #     Reading the zipfile bytes into a BytesIO stream
+            #     instead of using the default zipfile stream because
+            #     our usage of zipfile trips the cyclic redundancy
+            #     checks (bad CRC-32) of the zipfile.ZipExtFile.
+            #     Similar issue: https://stackoverflow.com/questions/5624669/strange-badzipfile-bad-crc-32-problem/5626098  # noqa: E501
+            #     I don't think passing this along to the BytesIO instance
+            #     is too expensive to worry about fixing this issue now.
+            bytes_stream = io.BytesIO(child_stream.read())
+        child_file = child_info.filename
+        if self.name is not None:
+            child_file = os.path.join(os.path.basename(self.name), child_file)
+        return node_from_file(
+            name=child_file, stream=bytes_stream, passwords=self.passwords
+        )
+
+    def _prefetched_child_nodes(self, zf: zipfile.ZipFile) -> Iterator[FileNode]:
+        """Inflate up to PREFETCH_MEMBERS members ahead of the one being
+        consumed, on the shared prefetch pool, keeping the order of the
+        archive. zlib, bz2 and lzma release the GIL while decompressing, and
+        `ZipFile` only holds its lock on the archive stream while reading the
+        compressed bytes, so the members share it. At most PREFETCH_BYTES of
+        uncompressed members (but always at least one member) are in flight.
+        """
+        infos = iter(zf.infolist())
+        pending: Deque[Tuple["Future[FileNode]", int]] = deque()
+        pending_bytes = 0
+        executor = _prefetch_executor()
+        try:
+            while True:
+                for info in infos:
+                    pending.append(
+                        (executor.submit(self._child_node, zf, info), info.file_size)
+                    )
+                    pending_bytes += info.file_size
+                    if (
+                        len(pending) > self.PREFETCH_MEMBERS
+                        or pending_bytes >= self.PREFETCH_BYTES
+                    ):
+                        break
+                if not pending:
+                    return
+                future, size = pending.popleft()
+                pending_bytes -= size
+                yield future.result()
+        finally:
+            for future, _ in pending:
+                future.cancel()
+            # members still being inflated read from `zf`, which the
+            # caller closes next
+            wait([future for future, _ in pending])
+
     @property
     def children(self) -> Iterator[FileNode]:
         try:
             with self.stream as node_stream:
                 with zipfile.ZipFile(node_stream) as zf:
-                    for child_file in zf.namelist():
-                        with zf.open(
-                            child_file, pwd=self._bytes_password
-                        ) as child_stream:
-                            # TODO(Thomas: 3/5/2019):
-                            #     Reading the zipfile bytes into a BytesIO stream
-                            #     instead of using the default zipfile stream because
-                            #     our usage of zipfile trips the cyclic redundancy
-                            #     checks (bad CRC-32) of the zipfile.ZipExtFile.
-                            #     Similar issue: https://stackoverflow.com/questions/5624669/strange-badzipfile-bad-crc-32-problem/5626098  # noqa: E501
-                            #     I don't think passing this along to the BytesIO instance
-                            #     is too expensive to worry about fixing this issue now.
-                            bytes_stream = io.BytesIO(child_stream.read())
-                            if self.name is not None:
-                                child_file_path = os.path.join(
-                                    os.path.basename(self.name), child_file
-                                )
-                                yield node_from_file(
-                                    name=child_file_path,
-                                    stream=bytes_stream,
-                                    passwords=self.passwords,
-                                )
-                            else:
-                                yield node_from_file(
-                                    name=child_file,
-                                    stream=bytes_stream,
-                                    passwords=self.passwords,
-                                )
+                    if self.PREFETCH_MEMBERS > 0:
+                        yield from self._prefetched_child_nodes(zf)
+                    else:
+                        for child_info in zf.infolist():
+                            yield self._child_node(zf, child_info)
         except RuntimeError as e:
             extract_error = ExtractError(
                 message=str(e), exception_type=type(e), name=self.name
@@ -255,6 +365,132 @@ class Zip(MimeTypeFileNode):
             self.extract_errors.append(extract_error)
 
 
+# Errors raised reading a corrupt or truncated tar or compressed file
+# (gzip.BadGzipFile is an OSError).
+STREAM_EXTRACT_ERRORS = (
+    tarfile.TarError,
+    OSError,
+    EOFError,
+    zlib.error,
+    lzma.LZMAError,
+)
+
+
+class Tar(MimeTypeFileNode):
+    """A tar archive, compressed or not. The members are read in one pass
+    over the stream (tarfile's stream mode), so the archive never has to
+    seek, and each member is read into memory as it's reached.
+    """
+
+    IS_CONTAINER = True
+    MIMETYPES = ["application/x-tar"]
+    EXTENSIONS = ["tar"]
+
+    @property
+    def children(self) -> Iterator[FileNode]:
+        try:
+            with self.stream as node_stream:
+                with tarfile.open(fileobj=node_stream, mode="r|*") as tf:
+                    for member in tf:
+                        if not member.isfile():
+                            continue
+                        member_stream = tf.extractfile(member)
+                        if member_stream is None:
+                            continue
+                        # the member can only be read until the archive
+                        # moves on to the next one
+                        bytes_stream = io.BytesIO(member_stream.read())
+                        child_file = member.name
+                        if self.name is not None:
+                            child_file = os.path.join(
+                                os.path.basename(self.name), child_file
+                            )
+                        yield node_from_file(
+                            name=child_file,
+                            stream=bytes_stream,
+                            passwords=self.passwords,
+                        )
+        except STREAM_EXTRACT_ERRORS as e:
+            extract_error = ExtractError(
+                message=str(e), exception_type=type(e), name=self.name
+            )
+            self.extract_errors.append(extract_error)
+
+
+class CompressedFile(MimeTypeFileNode, abc.ABC):
+    """A single compressed file (e.g. data.csv.gz). Its one child reads the
+    decompressed data straight from this node's stream, without spooling it
+    anywhere, so the child is only usable while the children of this node
+    are being iterated. Seeking back in the child decompresses again from
+    the start.
+
+    Subclasses implement `decompressed` for their format.
+    """
+
+    IS_CONTAINER = True
+
+    @staticmethod
+    @abc.abstractmethod
+    def decompressed(stream: IO[bytes]) -> IO[bytes]:
+        """A file object that reads the decompressed data of `stream`."""
+
+    @property
+    def _child_name(self) -> Optional[str]:
+        if self.name is None:
+            return None
+        stem, ext = os.path.splitext(self.name)
+        ext = ext.lstrip(".").lower()
+        if ext == self.EXTENSIONS[0]:
+            return stem
+        if ext in self.EXTENSIONS:
+            # e.g. data.tgz holds data.tar
+            return stem + ".tar"
+        return self.name
+
+    @property
+    def children(self) -> Iterator[FileNode]:
+        try:
+            with self.stream as node_stream:
+                with self.decompressed(node_stream) as child_stream:
+                    yield node_from_file(
+                        name=self._child_name,
+                        stream=child_stream,
+                        passwords=self.passwords,
+                    )
+        except STREAM_EXTRACT_ERRORS as e:
+            extract_error = ExtractError(
+                message=str(e), exception_type=type(e), name=self.name
+            )
+            self.extract_errors.append(extract_error)
+
+
+class Gzip(CompressedFile):
+    MIMETYPES = ["application/gzip", "application/x-gzip"]
+    EXTENSIONS = ["gz", "tgz"]
+
+    @staticmethod
+    def decompressed(stream: IO[bytes]) -> IO[bytes]:
+        return cast(IO[bytes], gzip.GzipFile(fileobj=stream, mode="rb"))
+
+
+class Bz2(CompressedFile):
+    MIMETYPES = ["application/x-bzip2"]
+    EXTENSIONS = ["bz2", "tbz2"]
+
+    @staticmethod
+    def decompressed(stream: IO[bytes]) -> IO[bytes]:
+        return cast(IO[bytes], bz2.BZ2File(stream, mode="rb"))
+
+
+class Xz(CompressedFile):
+    MIMETYPES = ["application/x-xz"]
+    EXTENSIONS = ["xz", "txz"]
+
+    @staticmethod
+    def decompressed(stream: IO[bytes]) -> IO[bytes]:
+        return cast(IO[bytes], lzma.LZMAFile(stream, mode="rb"))
+
+
 class ExcelEncryptionMixin(FileNode):
     def __init__(self, **kwargs) -> None:  # type: ignore
         super().__init__(**kwargs)
@@ -263,13 +499,35 @@ class ExcelEncryptionMixin(FileNode):
 
     @staticmethod
     def decrypt(encrypted_stream: IO[bytes], password: str) -> IO[bytes]:
+        """Decrypt with `password`, reusing the key derived from it for a file
+        with the same encryption parameters before (see `fables.passwords`).
+        """
+        from msoffcrypto import OfficeFile  # type: ignore
+
         try:
             office_file = OfficeFile(encrypted_stream)
-            decrypted_stream = io.BytesIO()
-            office_file.load_key(password=password)
-            office_file.decrypt(decrypted_stream)
-            decrypted_stream.seek(0)
+            parameters = encryption_parameters(office_file)
+            known, key = False, None
+            if parameters is not None:
+                known, key = DERIVED_KEYS.lookup(parameters, password)
+            if known and key is None:
+                raise IncorrectPassword()
+
+            if key is not None:
+                office_file.load_key(secret_key=key)
+            else:
+                office_file.load_key(password=password)
+            try:
+                decrypted_stream = _decrypted_package(office_file)
+            except Exception as e:
+                if parameters is not None and "password" in str(e):
+                    DERIVED_KEYS.rejected(parameters, password)
+                raise
+            if parameters is not None and key is None:
+                DERIVED_KEYS.verified(parameters, password, office_file.secret_key)
             return decrypted_stream
+        except IncorrectPassword:
+            raise
         except Exception as e:
             # xlsx exception message: 'The file could not be decrypted with this password'
             # xls exception message:  'Failed to verify password'
@@ -284,17 +542,28 @@ class ExcelEncryptionMixin(FileNode):
 
     @property
     def encrypted(self) -> bool:
+        if self._decrypted_stream is not None:
+            return False
+        from msoffcrypto.__main__ import is_encrypted
+
         with self._raw_stream_mgr as raw_stream:
             if is_encrypted(raw_stream):
-                if self.password is not None:
+                for password in self.password_candidates:
+                    raw_stream.seek(0)
                     try:  # to see if the password works
-                        self._decrypted_stream = self.decrypt(raw_stream, self.password)
-                        return False
+                        self._decrypted_stream = self.decrypt(raw_stream, password)
                     except IncorrectPassword:
-                        pass
+                        continue
+                    self.working_password = password
+                    return False
                 return True
         return False
 
+    @property
+    def raw_stream(self) -> StreamManager:
+        """The stream of the file as it's stored, encrypted or not."""
+        return self._raw_stream_mgr
+
     @property
     def stream(self) -> StreamManager:
         if not self.encrypted and self._decrypted_stream is not None:
@@ -303,6 +572,30 @@ class ExcelEncryptionMixin(FileNode):
             return self._raw_stream_mgr
 
 
+def _decrypted_package(office_file: Any) -> IO[bytes]:
+    """The plaintext of a msoffcrypto `OfficeFile` that has its key loaded.
+    Agile encrypted packages (xlsx and xlsb from Office 2010 on) are
+    decrypted as they're read (see `AgileDecryptedStream`), others in full.
+    """
+    if getattr(office_file, "type", None) != "agile":
+        decrypted_stream = io.BytesIO()
+        office_file.decrypt(decrypted_stream)
+        decrypted_stream.seek(0)
+        return decrypted_stream
+
+    stream = AgileDecryptedStream(
+        office_file.file.openstream("EncryptedPackage"),
+        key=office_file.secret_key,
+        key_data_salt=office_file.info["keyDataSalt"],
+        hash_algorithm=office_file.info["keyDataHashAlgorithm"],
+    )
+    # the check msoffcrypto makes, which only decrypts the end of the zip
+    if not zipfile.is_zipfile(stream):
+        raise ValueError("The file could not be decrypted with this password")
+    stream.seek(0)
+    return cast(IO[bytes], stream)
+
+
 class Xlsx(MimeTypeFileNode, ExcelEncryptionMixin):
     MIMETYPES = [
         "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
@@ -335,29 +628,205 @@ class Csv(MimeTypeFileNode):
 
 
 class Directory(FileNode):
+    """A directory on disk. Its entries are listed with `os.scandir` and
+    screened by `directory_filter` before any of them is opened. When
+    `workers` > 1, the mimetype detection of the files in the directory
+    runs on a thread pool, which helps most on network file systems.
+    """
+
+    IS_CONTAINER = True
+
+    def __init__(
+        self,
+        *,
+        directory_filter: Optional[DirectoryFilter] = None,
+        workers: Optional[int] = None,
+        depth: int = 0,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.directory_filter = directory_filter
+        self.workers = workers
+        self.depth = depth
+
+    def _child_node(self, entry: "os.DirEntry[str]") -> FileNode:
+        if entry.is_dir():
+            if any(pattern in entry.path for pattern in OS_PATTERNS_TO_SKIP):
+                return Skip(name=entry.path)
+            return Directory(
+                name=entry.path,
+                passwords=self.passwords,
+                directory_filter=self.directory_filter,
+                workers=self.workers,
+                depth=self.depth + 1,
+            )
+        return node_from_file(name=entry.path, passwords=self.passwords, is_dir=False)
+
     @property
     def children(self) -> Iterator[FileNode]:
-        for child_name in os.listdir(self.name):
-            child_path = os.path.join(self.name, child_name)
-            node = node_from_file(name=child_path, passwords=self.passwords)
-            yield node
+        if self.name is None:
+            return
+        entries = scan_directory(self.name, self.directory_filter, self.depth)
+        if self.workers is not None and self.workers > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                # map keeps the listing order of the entries
+                yield from executor.map(self._child_node, entries)
+        else:
+            for entry in entries:
+                yield self._child_node(entry)
 
 
 class Skip(FileNode):
     pass
 
 
+NODE_TYPE_ENTRY_POINT_GROUP = "fables.node_types"
+
+_Rule = Tuple[Type[MimeTypeFileNode], bool, FrozenSet[str], FrozenSet[str]]
+
+
+class NodeTypeRegistry:
+    """Maps a (mimetype, extension) pair to the `MimeTypeFileNode` subclass
+    that handles it.
+
+    The MIMETYPES, EXTENSIONS and EXTENSIONS_TO_EXCLUDE of every registered
+    type are precomputed into a table keyed by mimetype, and the answer for
+    each (mimetype, extension) pair is cached, so after the first file of a
+    kind the lookup is a single dict access. Types are tried in order of
+    descending `priority`, then in registration order, so the outcome does
+    not depend on import order.
+
+    Third-party packages can register their types by calling `register`
+    on import, and by advertising a function or module in the
+    "fables.node_types" entry point group, which is loaded on first lookup.
+    """
+
+    def __init__(self) -> None:
+        self._registrations: List[Tuple[int, int, Type[MimeTypeFileNode]]] = []
+        # registration order, never reused, so that two registrations never
+        # tie and the node types themselves are never compared
+        self._registration_count = itertools.count()
+        self._rules_by_mimetype: Dict[str, List[_Rule]] = {}
+        self._cache: Dict[Tuple[str, str], Optional[Type[MimeTypeFileNode]]] = {}
+        self._entry_points_loaded = False
+
+    @property
+    def node_types(self) -> List[Type[MimeTypeFileNode]]:
+        return [node_type for _, _, node_type in sorted(self._registrations)]
+
+    def register(
+        self, node_type: Type[MimeTypeFileNode], *, priority: int = 0
+    ) -> Type[MimeTypeFileNode]:
+        """Returns `node_type`, so this can also be used as a decorator."""
+        self.unregister(node_type)
+        self._registrations.append(
+            (-priority, next(self._registration_count), node_type)
+        )
+        self._rebuild()
+        return node_type
+
+    def unregister(self, node_type: Type[MimeTypeFileNode]) -> None:
+        self._registrations = [
+            registration
+            for registration in self._registrations
+            if registration[2] is not node_type
+        ]
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        self._rules_by_mimetype = {}
+        for node_type in self.node_types:
+            excluded = frozenset(node_type.EXTENSIONS_TO_EXCLUDE)
+            extensions = frozenset(node_type.EXTENSIONS)
+            for i, mimetype in enumerate(node_type.MIMETYPES):
+                # trust the best mimetype match except when the extension is
+                # excluded, otherwise the extension has to be one of the type's
+                rule = (node_type, i == 0, excluded, extensions)
+                self._rules_by_mimetype.setdefault(mimetype, []).append(rule)
+        self._cache = {}
+
+    def load_entry_points(self) -> None:
+        self._entry_points_loaded = True
+        try:
+            from importlib.metadata import entry_points
+        except ImportError:  # python < 3.8
+            return
+
+        all_entry_points: Any = entry_points()
+        if hasattr(all_entry_points, "select"):
+            group = all_entry_points.select(group=NODE_TYPE_ENTRY_POINT_GROUP)
+        else:
+            group = all_entry_points.get(NODE_TYPE_ENTRY_POINT_GROUP, [])
+        for entry_point in group:
+            try:
+                plugin = entry_point.load()
+                if callable(plugin):
+                    plugin()
+            except Exception as e:
+                warnings.warn(f"Could not load fables plugin '{entry_point.name}': {e}")
+
+    def node_type_for(
+        self, mimetype: Optional[str], extension: Optional[str]
+    ) -> Optional[Type[MimeTypeFileNode]]:
+        if not self._entry_points_loaded:
+            self.load_entry_points()
+
+        key = (mimetype or "_", (extension or "_").lower())
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+
+        node_type: Optional[Type[MimeTypeFileNode]] = None
+        for (
+            candidate,
+            is_best_mimetype,
+            excluded,
+            extensions,
+        ) in self._rules_by_mimetype.get(key[0], []):
+            if (is_best_mimetype and key[1] not in excluded) or key[1] in extensions:
+                node_type = candidate
+                break
+        self._cache[key] = node_type
+        return node_type
+
+
+NODE_TYPES = NodeTypeRegistry()
+for _node_type in [Zip, Tar, Gzip, Bz2, Xz, Xlsx, Xlsb, Xls, Csv]:
+    NODE_TYPES.register(_node_type)
+
+
 def mimetype_from_stream(stream: Optional[IO[bytes]]) -> Optional[str]:
     if stream is None:
         return None
 
     mimebytes = stream.read(NUM_BYTES_FOR_MIMETYPE_DETECTION)
-    mimetype = magic.from_buffer(mimebytes, mime=True)
+    mimetype = mimetype_from_bytes(mimebytes)
     stream.seek(0)
 
     return mimetype
 
 
+def mimetype_from_bytes(mimebytes: bytes) -> str:
+    """The mimetype of a file starting with `mimebytes` (the first
+    NUM_BYTES_FOR_MIMETYPE_DETECTION bytes of it).
+    """
+    return str(_magic_handle().from_buffer(mimebytes))
+
+
+# python-magic's module level functions share one libmagic handle behind
+# a lock, so threads detecting files at once would take turns. Each
+# thread opens its own handle instead, once, and reuses it.
+_MAGIC_HANDLES = threading.local()
+
+
+def _magic_handle() -> magic.Magic:
+    handle: Optional[magic.Magic] = getattr(_MAGIC_HANDLES, "handle", None)
+    if handle is None:
+        handle = _MAGIC_HANDLES.handle = magic.Magic(mime=True)
+    return handle
+
+
 def extension_from_name(name: str) -> Optional[str]:
     _, ext = os.path.splitext(name)
     if ext:
@@ -387,25 +856,45 @@ def node_from_file(
     *,
     name: Optional[str] = None,
     stream: Optional[IO[bytes]] = None,
-    passwords: Dict[str, str] = {},
+    mimetype: Optional[str] = None,
+    passwords: Optional[Passwords] = None,
+    directory_filter: Optional[DirectoryFilter] = None,
+    workers: Optional[int] = None,
+    is_dir: Optional[bool] = None,
 ) -> FileNode:
+    """`is_dir` can be passed by callers that already know whether `name`
+    is a directory (e.g. from a cached `os.DirEntry`) to save a stat call,
+    and `mimetype` by callers that already detected it.
+    """
     if name is not None and any(pattern in name for pattern in OS_PATTERNS_TO_SKIP):
         return Skip(name=name, stream=stream)
 
-    if name is not None and os.path.isdir(name):
-        return Directory(name=name, stream=stream, passwords=passwords)
+    if is_dir is None:
+        is_dir = name is not None and stream is None and os.path.isdir(name)
 
-    mimetype, extension = mimetype_and_extension(name=name, stream=stream)
+    if is_dir:
+        return Directory(
+            name=name,
+            stream=stream,
+            passwords=passwords,
+            directory_filter=directory_filter,
+            workers=workers,
+        )
 
-    for node_type in MimeTypeFileNode.__subclasses__():
-        if node_type.is_my_mimetype_or_extension(mimetype, extension):
-            node: FileNode = node_type(
-                name=name,
-                stream=stream,
-                mimetype=mimetype,
-                extension=extension,
-                passwords=passwords,
-            )
-            return node
+    if mimetype is None:
+        mimetype, extension = mimetype_and_extension(name=name, stream=stream)
+    else:
+        extension = None if name is None else extension_from_name(name)
+
+    node_type = NODE_TYPES.node_type_for(mimetype, extension)
+    if node_type is not None:
+        node: FileNode = node_type(
+            name=name,
+            stream=stream,
+            mimetype=mimetype,
+            extension=extension,
+            passwords=passwords,
+        )
+        return node
 
     return Skip(name=name, stream=stream, mimetype=mimetype, extension=extension)
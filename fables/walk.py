@@ -0,0 +1,87 @@
+"""
+Walk a directory on disk with `os.scandir`, applying a `DirectoryFilter`
+to every entry before any file is opened.
+
+`os.DirEntry` objects cache the file type (and on some platforms the stat
+result) from the directory listing, so deciding whether an entry is a
+sub-directory, or whether it is small enough to detect, costs at most one
+stat call instead of the `os.path.isdir` + `open` done per file by
+`node_from_file`.
+"""
+
+import os
+from dataclasses import dataclass, field
+from fnmatch import fnmatch
+from typing import Iterator, List, Optional
+
+
+@dataclass
+class DirectoryFilter:
+    """Decides which directory entries are visited during detection.
+
+    - include: glob patterns a file must match (on its path or name) to be
+      kept. An empty list keeps every file.
+    - exclude: glob patterns that drop files and prune sub-directories.
+    - extensions: allowed file extensions (without the leading '.'),
+      compared case-insensitively. None allows every extension.
+    - max_depth: number of sub-directory levels below the root directory
+      to descend into. 0 only looks at the entries of the root. None has
+      no limit.
+    - max_file_size: files larger than this many bytes are dropped.
+    """
+
+    include: List[str] = field(default_factory=list)
+    exclude: List[str] = field(default_factory=list)
+    extensions: Optional[List[str]] = None
+    max_depth: Optional[int] = None
+    max_file_size: Optional[int] = None
+
+    def __post_init__(self) -> None:
+        if self.extensions is not None:
+            self.extensions = [ext.lstrip(".").lower() for ext in self.extensions]
+
+    @staticmethod
+    def _matches_any(entry: "os.DirEntry[str]", patterns: List[str]) -> bool:
+        return any(
+            fnmatch(entry.path, pattern) or fnmatch(entry.name, pattern)
+            for pattern in patterns
+        )
+
+    def admits_directory(self, entry: "os.DirEntry[str]", depth: int) -> bool:
+        if self.max_depth is not None and depth > self.max_depth:
+            return False
+        return not self._matches_any(entry, self.exclude)
+
+    def admits_file(self, entry: "os.DirEntry[str]") -> bool:
+        if self._matches_any(entry, self.exclude):
+            return False
+        if self.include and not self._matches_any(entry, self.include):
+            return False
+        if self.extensions is not None:
+            _, ext = os.path.splitext(entry.name)
+            if ext.lstrip(".").lower() not in self.extensions:
+                return False
+        if self.max_file_size is not None:
+            if entry.stat().st_size > self.max_file_size:
+                return False
+        return True
+
+
+def scan_directory(
+    path: str, directory_filter: Optional[DirectoryFilter] = None, depth: int = 0
+) -> Iterator["os.DirEntry[str]"]:
+    """Yield the entries of the directory at `path` that pass the filter,
+    in a deterministic (sorted by name) order. `depth` is the depth of the
+    directory being scanned, where the root directory has depth 0.
+    """
+    with os.scandir(path) as it:
+        entries = sorted(it, key=lambda entry: entry.name)
+
+    for entry in entries:
+        if directory_filter is None:
+            yield entry
+        elif entry.is_dir():
+            if directory_filter.admits_directory(entry, depth + 1):
+                yield entry
+        elif directory_filter.admits_file(entry):
+            yield entry
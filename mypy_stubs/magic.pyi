@@ -1,3 +1,7 @@
 from typing import Optional
 
 def from_buffer(buffer: bytes, mime: bool) -> Optional[str]: ...
+
+class Magic:
+    def __init__(self, mime: bool = ...) -> None: ...
+    def from_buffer(self, buffer: bytes) -> Optional[str]: ...
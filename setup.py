@@ -38,6 +38,8 @@ setuptools.setup(
         'python-magic-bin==0.4.14;platform_system=="Windows"',
         "pyxlsb==1.0.6",
     ],
+    extras_require={"arrow": ["pyarrow"]},
+    entry_points={"console_scripts": ["fables=fables.cli:main"]},
     setup_requires=["pytest-runner"],
     tests_require=["pytest", "pytest-mock"],
     zip_safe=True,
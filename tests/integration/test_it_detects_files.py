@@ -24,6 +24,11 @@ from tests.integration.constants import DATA_DIR
         ("encrypted.xls", fables.Xls, "application/vnd.ms-excel", "xls", 0),
         ("basic.zip", fables.Zip, "application/zip", "zip", 2),
         ("encrypted.zip", fables.Zip, "application/zip", "zip", 0),
+        ("basic.tar", fables.Tar, "application/x-tar", "tar", 3),
+        ("basic.tar.gz", fables.Gzip, "application/gzip", "gz", 1),
+        ("basic.csv.gz", fables.Gzip, "application/gzip", "gz", 1),
+        ("basic.csv.bz2", fables.Bz2, "application/x-bzip2", "bz2", 1),
+        ("basic.csv.xz", fables.Xz, "application/x-xz", "xz", 1),
         ("sub_dir", fables.Directory, None, None, 2),
         ("valid_plain_text.txt", fables.Csv, "text/plain", "txt", 0),
         ("invalid_plain_text.txt", fables.Csv, "text/plain", "txt", 0),
@@ -310,6 +310,32 @@ def test_it_parses_flat_files_in_a_basic_zip():
     _it_parses_flat_files_in_a_basic_zip(zip_file, zip_path)
 
 
+@pytest.mark.parametrize("tar_file", ["basic.tar", "basic.tar.gz"])
+def test_it_parses_flat_files_in_a_tar(tar_file):
+    """
+    basic.tar(.gz)
+        basic.csv
+        ./._basic.xlsx
+        basic.xlsx
+    """
+    tar_path = os.path.join(DATA_DIR, tar_file)
+    parse_results = list(fables.parse(io=tar_path))
+    child_names = [
+        os.path.join("basic.tar", child_file)
+        for child_file in ["basic.csv", "basic.xlsx"]
+    ]
+    _validate_basic_csv_and_basic_xlsx_together(parse_results, child_names)
+
+
+@pytest.mark.parametrize("extension", ["gz", "bz2", "xz"])
+def test_it_parses_a_compressed_csv(extension):
+    csv_name = os.path.join(DATA_DIR, "basic.csv")
+    (parse_result,) = fables.parse(io=f"{csv_name}.{extension}")
+    assert parse_result.name == csv_name
+    assert not parse_result.errors
+    pd.testing.assert_frame_equal(parse_result.tables[0].df, AB_DF, check_dtype=False)
+
+
 def _validate_side_xls_file(xls_result, expected_name):
     # validate basic.xls
     assert xls_result.name == expected_name
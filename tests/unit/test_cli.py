@@ -0,0 +1,99 @@
+import io
+import json
+import os
+import zipfile
+
+import pandas as pd
+import pytest
+
+from tests.context import fables  # NOQA
+from fables.cli import main
+from tests.integration.constants import DATA_DIR
+
+
+@pytest.fixture
+def input_dir(tmp_path):
+    (tmp_path / "in").mkdir()
+    (tmp_path / "in" / "a.csv").write_bytes(b"a,b\n1,2\n3,4\n")
+    (tmp_path / "in" / "sub").mkdir()
+    (tmp_path / "in" / "sub" / "b.csv").write_bytes(b"x;y\n5;6\n")
+    return tmp_path
+
+
+def _run(argv):
+    out, err = io.StringIO(), io.StringIO()
+    exit_code = main(argv, out=out, err=err)
+    return exit_code, out.getvalue(), err.getvalue()
+
+
+@pytest.mark.parametrize("workers", ["1", "2"])
+def test_parse_writes_one_csv_per_table_and_a_summary(input_dir, workers):
+    output_dir = str(input_dir / "out")
+    exit_code, out, err = _run(
+        ["parse", str(input_dir / "in"), "-o", output_dir, "--workers", workers]
+    )
+
+    assert exit_code == 0
+    assert not err
+    outputs = sorted(os.listdir(output_dir))
+    assert len(outputs) == 2
+    assert outputs[0].endswith("a.csv.csv")
+    df = pd.read_csv(os.path.join(output_dir, outputs[0]))
+    pd.testing.assert_frame_equal(df, pd.DataFrame({"a": [1, 3], "b": [2, 4]}))
+    assert "parsed 2 files" in out
+    assert "files/s" in out
+
+
+def test_parse_writes_parquet(input_dir):
+    pytest.importorskip("pyarrow")
+    output_dir = str(input_dir / "out")
+    exit_code, _, _ = _run(
+        ["parse", str(input_dir / "in" / "a.csv"), "-o", output_dir]
+        + ["--output-format", "parquet"]
+    )
+    assert exit_code == 0
+    (output,) = os.listdir(output_dir)
+    df = pd.read_parquet(os.path.join(output_dir, output))
+    assert df["a"].tolist() == [1, 3]
+
+
+def test_parse_reports_errors_and_fails(input_dir):
+    encrypted_xlsx = os.path.join(DATA_DIR, "encrypted.xlsx")
+    passwords_file = input_dir / "passwords.json"
+    passwords_file.write_text(json.dumps({"encrypted.xlsx": "wrong password"}))
+    exit_code, _, err = _run(
+        ["parse", encrypted_xlsx, "-o", str(input_dir / "out")]
+        + ["--passwords-file", str(passwords_file)]
+    )
+    assert exit_code == 1
+    assert "encrypted.xlsx" in err
+
+
+def test_detect_prints_the_tree(input_dir):
+    exit_code, out, _ = _run(["detect", str(input_dir / "in")])
+    assert exit_code == 0
+    lines = out.splitlines()
+    assert lines[0].startswith("Directory(")
+    assert any(line.startswith("    Csv(") for line in lines)
+
+
+def test_tables_of_inputs_with_the_same_names_go_to_different_files(tmp_path):
+    inputs = []
+    for month in ["jan", "feb"]:
+        (tmp_path / month).mkdir()
+        archive = tmp_path / month / "export.zip"
+        with zipfile.ZipFile(str(archive), "w") as zf:
+            zf.writestr("data.csv", f"month\n{month}\n")
+            zf.writestr("data_x.csv", f"month\n{month}\n")
+            zf.writestr("data x.csv", f"month\n{month}\n")
+        inputs.append(str(archive))
+    output_dir = str(tmp_path / "out")
+
+    exit_code, out, err = _run(["parse"] + inputs + ["-o", output_dir])
+
+    assert exit_code == 0, err
+    outputs = out.splitlines()[:6]
+    assert len(set(outputs)) == 6
+    assert sorted(os.listdir(output_dir)) == sorted(map(os.path.basename, outputs))
+    months = [pd.read_csv(output)["month"].tolist() for output in outputs]
+    assert sorted(months) == [["feb"]] * 3 + [["jan"]] * 3
@@ -0,0 +1,130 @@
+import io
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.context import fables
+
+
+@pytest.fixture
+def header_stripped_df():
+    """What's left of a table read with noise above the header: every column
+    has object dtype.
+    """
+    df = pd.DataFrame(
+        {
+            "id": ["001", "002", None],
+            "name": ["x", "1", "2"],
+            "active": ["TRUE", "no", None],
+            "hired": ["2020-01-01", "2021-02-03", "2020-01-05"],
+            "rate": ["1.5", "2", 3],
+            "empty": [None, None, None],
+        },
+        dtype=object,
+    )
+    return df
+
+
+def test_classify_columns_finds_every_kind(header_stripped_df):
+    inference = fables.DtypeInference(datetimes=True, booleans=True)
+    kinds = fables.dtypes.classify_columns(header_stripped_df, inference)
+    assert kinds == [
+        fables.dtypes.NUMERIC,
+        fables.dtypes.STRING,
+        fables.dtypes.BOOLEAN,
+        fables.dtypes.DATETIME,
+        fables.dtypes.NUMERIC,
+        fables.dtypes.STRING,
+    ]
+
+
+def test_infer_dtypes_only_converts_numeric_columns_by_default(header_stripped_df):
+    df = fables.dtypes.infer_dtypes(header_stripped_df)
+    assert list(df.columns) == list(header_stripped_df.columns)
+    assert df["id"].dtype == np.float64
+    assert df["rate"].dtype == np.float64
+    for col in ["name", "active", "hired", "empty"]:
+        assert df[col].dtype == object
+
+
+def test_infer_dtypes_uses_the_requested_dtypes(header_stripped_df):
+    inference = fables.DtypeInference(
+        nullable_integers=True, datetimes=True, booleans=True
+    )
+    df = fables.dtypes.infer_dtypes(header_stripped_df, inference)
+    assert str(df["id"].dtype) == "Int64"
+    assert str(df["active"].dtype) == "boolean"
+    assert pd.api.types.is_datetime64_any_dtype(df["hired"])
+    assert df["active"].tolist()[:2] == [True, False]
+
+
+def test_infer_dtypes_casts_integral_columns_without_nulls_to_int():
+    df = pd.DataFrame({"x": ["001", "002", "003"]}, dtype=object)
+    assert fables.dtypes.infer_dtypes(df)["x"].tolist() == [1, 2, 3]
+    assert fables.dtypes.infer_dtypes(df)["x"].dtype == np.int64
+
+
+@pytest.mark.parametrize(
+    "values", [["1.0", "2.0"], ["1e3", "2"], ["1", None], ["inf", "1"], ["1", "2"]]
+)
+def test_infer_dtypes_casts_like_per_column_to_numeric(values):
+    df = pd.DataFrame({"x": values}, dtype=object)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        inferred = fables.dtypes.infer_dtypes(df)
+    expected = pd.to_numeric(df["x"], errors="ignore")
+    pd.testing.assert_series_equal(inferred["x"], expected)
+
+
+def test_infer_dtypes_leaves_bool_columns_alone():
+    df = pd.DataFrame(
+        {
+            "flag": [True, False],
+            "mixed": pd.Series([False, True], dtype=object),
+            "x": pd.Series(["1", "2"], dtype=object),
+        }
+    )
+    inferred = fables.dtypes.infer_dtypes(df)
+    assert inferred["flag"].dtype == np.bool_
+    assert inferred["mixed"].tolist() == [False, True]
+    assert all(isinstance(value, bool) for value in inferred["mixed"])
+    assert inferred["x"].dtype == np.int64
+
+
+def test_infer_dtypes_validates_sampled_columns_on_every_row():
+    df = pd.DataFrame({"x": ["1", "2", "three"], "y": ["1", "2", "3"]}, dtype=object)
+    inferred = fables.dtypes.infer_dtypes(df, fables.DtypeInference(sample_size=2))
+    assert inferred["x"].tolist() == ["1", "2", "three"]
+    assert inferred["y"].tolist() == [1, 2, 3]
+
+
+def test_infer_dtypes_keeps_duplicate_and_null_column_names():
+    df = pd.DataFrame([["1", "a", "2"], ["3", "b", "4"]], dtype=object)
+    df.columns = ["x", np.nan, "x"]
+    inferred = fables.dtypes.infer_dtypes(df)
+    assert inferred.shape == (2, 3)
+    assert inferred.iloc[:, 0].tolist() == [1, 3]
+    assert inferred.iloc[:, 1].tolist() == ["a", "b"]
+    assert inferred.iloc[:, 2].tolist() == [2, 4]
+
+
+def test_infer_dtypes_keeps_integers_past_float_precision():
+    ids = ["12345678901234567", "98765432109876543"]
+    df = pd.DataFrame({"id": ids, "with_null": [ids[0], None]}, dtype=object)
+    inferred = fables.dtypes.infer_dtypes(
+        df, fables.DtypeInference(nullable_integers=True)
+    )
+    assert inferred["id"].tolist() == [12345678901234567, 98765432109876543]
+    assert inferred["with_null"].tolist()[0] == 12345678901234567
+    assert str(inferred["with_null"].dtype) == "Int64"
+
+
+def test_long_ids_below_a_pre_header_row_are_exact():
+    data = b",\nid,name\n12345678901234567,a\n12345678901234568,b\n"
+    (result,) = fables.parse(io.BytesIO(data), stream_file_name="ids.csv")
+    assert result.tables[0].df["id"].tolist() == [
+        12345678901234567,
+        12345678901234568,
+    ]
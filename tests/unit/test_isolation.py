@@ -0,0 +1,90 @@
+import importlib
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from tests.context import fables  # NOQA
+from fables import isolation
+
+
+def _sleep_and_return(seconds, value):
+    time.sleep(seconds)
+    return value
+
+
+def _raise_value_error():
+    raise ValueError("boom")
+
+
+@pytest.mark.parametrize("kind", isolation.ISOLATIONS)
+def test_call_isolated_returns_the_result(kind):
+    assert isolation.call_isolated(kind, _sleep_and_return, (0, 42), 5) == 42
+
+
+@pytest.mark.parametrize("kind", isolation.ISOLATIONS)
+def test_call_isolated_reraises_the_exception(kind):
+    with pytest.raises(ValueError):
+        isolation.call_isolated(kind, _raise_value_error, (), 5)
+
+
+@pytest.mark.parametrize("kind", isolation.ISOLATIONS)
+def test_call_isolated_times_out(kind):
+    start = time.monotonic()
+    with pytest.raises(fables.ParseTimeoutError):
+        isolation.call_isolated(kind, _sleep_and_return, (10, None), 0.2)
+    assert time.monotonic() - start < 5
+
+
+@pytest.mark.parametrize("kind", isolation.ISOLATIONS)
+def test_call_isolated_can_be_cancelled(kind):
+    cancel = threading.Event()
+    threading.Timer(0.2, cancel.set).start()
+    with pytest.raises(isolation.Cancelled):
+        isolation.call_isolated(kind, _sleep_and_return, (10, None), None, cancel)
+
+
+@pytest.fixture
+def slow_and_fast_csvs(tmp_path, monkeypatch):
+    (tmp_path / "fast.csv").write_bytes(b"a,b\n1,2\n")
+    (tmp_path / "slow.csv").write_bytes(b"slow,b\n1,2\n")
+    parse_module = importlib.import_module("fables.parse")
+    sniff_delimiter = parse_module.sniff_delimiter
+
+    def slow_sniff_delimiter(bytesio, encoding):
+        if bytesio.read(4) == b"slow":
+            time.sleep(10)
+        bytesio.seek(0)
+        return sniff_delimiter(bytesio, encoding)
+
+    monkeypatch.setattr(parse_module, "sniff_delimiter", slow_sniff_delimiter)
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize("kind", isolation.ISOLATIONS)
+def test_a_slow_leaf_times_out_and_the_rest_of_the_tree_is_parsed(
+    slow_and_fast_csvs, kind
+):
+    if kind == "process" and multiprocessing.get_start_method() != "fork":
+        pytest.skip("the monkeypatched parser only reaches forked workers")
+
+    results = {
+        result.name.rsplit("/", 1)[-1]: result
+        for result in fables.parse(slow_and_fast_csvs, leaf_timeout=0.5, isolation=kind)
+    }
+    assert results["fast.csv"].tables[0].df["b"].tolist() == [2]
+    assert not results["slow.csv"].tables
+    (error,) = results["slow.csv"].errors
+    assert error.exception_type is fables.ParseTimeoutError
+
+
+def test_parse_stops_when_cancelled(slow_and_fast_csvs):
+    cancel = threading.Event()
+    cancel.set()
+    assert list(fables.parse(slow_and_fast_csvs, cancel=cancel)) == []
+
+
+def test_parse_rejects_an_unknown_isolation():
+    with pytest.raises(ValueError):
+        list(fables.parse("fables.csv", isolation="fiber"))
@@ -0,0 +1,111 @@
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from tests.context import fables
+from tests.integration.constants import DATA_DIR
+
+
+NOISY_CSV = b"""Payroll export,,
+generated 2020-01-01,,
+id,name,rate
+1,a,1.5
+2,b,2.5
+"""
+
+
+def _parse_one(data, **kwargs):
+    (result,) = fables.parse(io.BytesIO(data), stream_file_name="f.csv", **kwargs)
+    assert not result.errors
+    (table,) = result.tables
+    return table.df
+
+
+@pytest.mark.parametrize(
+    "file_name",
+    [
+        "basic.csv",
+        "basic_semicolon_sep.csv",
+        "basic_tab_sep.tsv",
+        "na.csv",
+        "noisy_opening_rows.csv",
+        "null_middle_cols.csv",
+        "null_opening_rows.csv",
+        "string_vs_numeric_noise_before_header.csv",
+        "basic.xls",
+        "two_sheets.xls",
+        "noisy_opening_rows.xlsx",
+        "null_leading_and_trailing_cols.xlsx",
+        "string_vs_numeric_noise_before_header.xlsx",
+    ],
+)
+def test_a_recorded_layout_parses_the_same_tables(file_name):
+    path = os.path.join(DATA_DIR, file_name)
+    expected = [table.df for result in fables.parse(path) for table in result.tables]
+
+    layout_cache = fables.LayoutCache()
+    list(fables.parse(path, layout_cache=layout_cache))
+    assert layout_cache.hits == 0
+    actual = [
+        table.df
+        for result in fables.parse(path, layout_cache=layout_cache)
+        for table in result.tables
+    ]
+
+    assert layout_cache.hits == len(expected)
+    assert layout_cache.fallbacks == 0
+    assert len(actual) == len(expected)
+    for actual_df, expected_df in zip(actual, expected):
+        pd.testing.assert_frame_equal(actual_df, expected_df)
+
+
+def test_a_file_with_the_same_layout_is_read_with_the_recorded_layout(mocker):
+    layout_cache = fables.LayoutCache()
+    _parse_one(NOISY_CSV, layout_cache=layout_cache)
+
+    sniff = mocker.patch("fables.parse.sniff_delimiter")
+    other = NOISY_CSV.replace(b"1.5", b"7.5").replace(b"2,b", b"3,c")
+    df = _parse_one(other, layout_cache=layout_cache)
+
+    sniff.assert_not_called()
+    assert layout_cache.hits == 1
+    assert list(df.columns) == ["id", "name", "rate"]
+    assert df["id"].tolist() == [1, 3]
+    assert df["rate"].tolist() == [7.5, 2.5]
+
+
+def test_a_layout_that_does_not_match_falls_back_to_full_detection():
+    layout_cache = fables.LayoutCache()
+    _parse_one(NOISY_CSV, layout_cache=layout_cache)
+
+    # same first line, but the header is one row further down
+    other = NOISY_CSV.replace(b"id,name,rate", b"note,,\nid,name,rate")
+    df = _parse_one(other, layout_cache=layout_cache)
+
+    assert layout_cache.fallbacks == 1
+    pd.testing.assert_frame_equal(df, _parse_one(other))
+
+    # the layout of the newer file replaces the one that failed
+    _parse_one(other, layout_cache=layout_cache)
+    assert layout_cache.hits == 1
+
+
+def test_layout_changing_pandas_kwargs_turn_off_the_cache():
+    layout_cache = fables.LayoutCache()
+    _parse_one(NOISY_CSV, layout_cache=layout_cache, pandas_kwargs={"skiprows": 2})
+    assert len(layout_cache) == 0
+
+
+def test_layout_cache_round_trips_through_a_file(tmpdir):
+    path = str(tmpdir.join("layouts.json"))
+    layout_cache = fables.LayoutCache(path)
+    _parse_one(NOISY_CSV, layout_cache=layout_cache)
+    layout_cache.save()
+
+    loaded = fables.LayoutCache(path)
+    assert len(loaded) == 1
+    df = _parse_one(NOISY_CSV, layout_cache=loaded)
+    assert loaded.hits == 1
+    pd.testing.assert_frame_equal(df, _parse_one(NOISY_CSV))
@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+
+from tests.context import fables  # NOQA
+from fables.lazy import LazyModule
+from tests.integration.constants import DATA_DIR
+
+HEAVY_MODULES = [
+    "pandas",
+    "numpy",
+    "clevercsv",
+    "xlrd",
+    "pyxlsb",
+    "cchardet",
+    "msoffcrypto",
+]
+
+
+def _modules_imported_by(code):
+    script = code + "\nimport sys\nprint(' '.join(sorted(sys.modules)))"
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        check=True,
+        stdout=subprocess.PIPE,
+        cwd=os.path.join(os.path.dirname(__file__), "..", ".."),
+    ).stdout
+    return set(output.decode("utf-8").split())
+
+
+def test_detect_does_not_import_the_parsing_dependencies():
+    path = os.path.join(DATA_DIR, "basic.zip")
+    modules = _modules_imported_by(f"import fables\nfables.detect({path!r})")
+    assert not modules & set(HEAVY_MODULES)
+
+
+def test_parsing_a_csv_file_only_imports_what_it_needs():
+    path = os.path.join(DATA_DIR, "basic_tab_sep.tsv")
+    modules = _modules_imported_by(f"import fables\nlist(fables.parse({path!r}))")
+    assert {"pandas", "numpy"} <= modules
+    assert not modules & {"xlrd", "pyxlsb", "msoffcrypto"}
+
+
+def test_lazy_modules_import_on_first_use():
+    module = LazyModule("fractions")
+    assert "not imported yet" in repr(module)
+    assert module.Fraction(1, 2) == 0.5
+    assert "(imported)" in repr(module)
@@ -0,0 +1,801 @@
+import gc
+import gzip
+import io
+import importlib
+import mmap
+import os
+import struct
+import weakref
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+import pyxlsb
+import xlrd
+
+from tests.context import fables  # NOQA
+from fables.parse import (
+    ColumnBuffers,
+    parse_xlsb_sheet,
+    post_process_dataframe,
+    table_extent,
+)
+from tests.integration.constants import DATA_DIR
+
+fables_parse = importlib.import_module("fables.parse")
+
+
+def _extent(header, rows):
+    values = np.array(rows, dtype=object)
+    return table_extent(
+        header, lambda i: values[i], pd.isnull(values).reshape(values.shape)
+    )
+
+
+def test_table_extent_keeps_a_clean_table():
+    num_pre_header_rows, column_mask, row_mask = _extent(["a", "b"], [[1, 2], [3, 4]])
+    assert num_pre_header_rows == 0
+    assert column_mask.tolist() == [True, True]
+    assert row_mask.tolist() == [True, True]
+
+
+def test_table_extent_finds_the_header_below_noise():
+    num_pre_header_rows, column_mask, row_mask = _extent(
+        ["x", "Unnamed: 1", "Unnamed: 2", "Unnamed: 3"],
+        [
+            [None, None, None, None],
+            ["a", "b", "c", None],
+            [1, 2, 3, None],
+            [None, None, None, None],
+            [4, 5, 6, None],
+        ],
+    )
+    assert num_pre_header_rows == 2
+    assert column_mask.tolist() == [True, True, True, False]
+    assert row_mask.tolist() == [True, False, True]
+
+
+def test_table_extent_raises_when_no_header_is_found():
+    with pytest.raises(ValueError) as e:
+        _extent(["Unnamed: 0", "Unnamed: 1"], [[None, None], ["x", None]])
+    assert "no valid header row found" in str(e.value)
+
+
+def test_post_process_dataframe_returns_a_view_when_nothing_is_dropped():
+    df = pd.DataFrame({"a": [1, 2], "b": [3, 4]})
+    processed = post_process_dataframe(df, force_numeric=True)
+    assert np.shares_memory(processed.values, df.values)
+
+
+def test_post_process_dataframe_drops_masked_rows_and_columns_at_once():
+    df = pd.DataFrame(
+        [[1.0, np.nan, 2.0], [np.nan, np.nan, np.nan], [3.0, np.nan, 4.0]],
+        columns=["a", "Unnamed: 1", "b"],
+    )
+    processed = post_process_dataframe(df, force_numeric=True)
+    expected = pd.DataFrame([[1.0, 2.0], [3.0, 4.0]], columns=["a", "b"])
+    pd.testing.assert_frame_equal(processed, expected)
+
+
+def test_xls_sheets_are_loaded_on_demand_from_a_mapped_file(mocker):
+    path = os.path.join(DATA_DIR, "two_sheets.xls")
+    open_workbook = mocker.spy(xlrd, "open_workbook")
+    unload_sheet = mocker.spy(xlrd.Book, "unload_sheet")
+
+    (result,) = fables.parse(path)
+
+    assert [table.sheet for table in result.tables] == ["Sheet1", "Sheet2"]
+    assert not result.errors
+    _, kwargs = open_workbook.call_args
+    assert kwargs["on_demand"] is True
+    assert isinstance(kwargs["file_contents"], mmap.mmap)
+    assert [call.args[1] for call in unload_sheet.call_args_list] == [
+        "Sheet1",
+        "Sheet2",
+    ]
+
+
+def test_xls_tables_are_the_same_from_a_stream_and_from_disk():
+    path = os.path.join(DATA_DIR, "two_sheets.xls")
+    with open(path, "rb") as f:
+        stream = io.BytesIO(f.read())
+    from_disk = [table.df for result in fables.parse(path) for table in result.tables]
+    from_stream = [
+        table.df
+        for result in fables.parse(stream, stream_file_name="two_sheets.xls")
+        for table in result.tables
+    ]
+    assert len(from_disk) == len(from_stream) == 2
+    for disk_df, stream_df in zip(from_disk, from_stream):
+        pd.testing.assert_frame_equal(disk_df, stream_df)
+
+
+def _pandas_xlsb_sheet(rows, force_numeric=True):
+    """What pandas' pyxlsb reader followed by post_process_dataframe gives."""
+    data = []
+    for row_number, values in rows:
+        values = [
+            "" if v is None else int(v) if isinstance(v, float) and v == int(v) else v
+            for v in values
+        ]
+        data.extend([[]] * (row_number - len(data)))
+        data.append(values)
+    width = max(len(values) for values in data)
+    data = [values + [""] * (width - len(values)) for values in data]
+    df = pd.io.parsers.TextParser(data, header=0, skip_blank_lines=False).read()
+    return post_process_dataframe(df, force_numeric)
+
+
+XLSB_ROWS = [
+    (0, ["Payroll", None, None, None]),
+    (2, ["id", "name", "id", None]),
+    (3, [1.0, "a", 2.5, None]),
+    (4, [2.0, None, "NA", None]),
+    (6, [3.0, "c", 4.0, True]),
+]
+
+
+@pytest.mark.parametrize("force_numeric", [True, False])
+def test_parse_xlsb_sheet_matches_the_pandas_reader(force_numeric):
+    df = parse_xlsb_sheet(iter(XLSB_ROWS), force_numeric=force_numeric)
+    expected = _pandas_xlsb_sheet(XLSB_ROWS, force_numeric)
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_column_buffers_grow_and_switch_to_object_columns():
+    buffers = ColumnBuffers(capacity=2)
+    for i in range(1500):
+        buffers.append([float(i), "x" if i == 1200 else float(i)])
+    buffers.append_empty(3)
+    buffers.flush()
+
+    assert buffers.num_rows == 1503
+    assert buffers.capacity >= 1503
+    first, second = buffers.columns
+    assert first.dtype == np.float64
+    assert second.dtype == object
+    assert second[:3].tolist() == [0, 1, 2]
+    assert second[1200] == "x"
+    assert np.isnan(first[1500:1503]).all()
+
+
+def test_xlsb_sheets_are_streamed_unless_pandas_kwargs_are_given(mocker):
+    path = os.path.join(DATA_DIR, "two_sheets.xlsb")
+    excel_file = mocker.spy(pd, "ExcelFile")
+
+    streamed = [table.df for result in fables.parse(path) for table in result.tables]
+    excel_file.assert_not_called()
+
+    read = [
+        table.df
+        for result in fables.parse(path, pandas_kwargs={"na_values": ["-"]})
+        for table in result.tables
+    ]
+    excel_file.assert_called_once()
+    assert len(streamed) == len(read) == 2
+    for streamed_df, read_df in zip(streamed, read):
+        pd.testing.assert_frame_equal(streamed_df, read_df)
+
+
+def _phantom_xlsx(cells):
+    """basic.xlsx with `cells` (cell xml by reference) added below its data."""
+    with zipfile.ZipFile(os.path.join(DATA_DIR, "basic.xlsx")) as basic:
+        members = {
+            name: basic.read(name) for name in basic.namelist() if name != "basic.csv"
+        }
+    sheet = members["xl/worksheets/sheet1.xml"].decode("utf-8")
+    rows = "".join(
+        f'<row r="{reference.lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZ")}">{cell}</row>'
+        for reference, cell in cells.items()
+    )
+    sheet_data_end = sheet.index("</sheetData>")
+    sheet = sheet[:sheet_data_end] + rows + sheet[sheet_data_end:]
+    members["xl/worksheets/sheet1.xml"] = sheet.encode("utf-8")
+    return _zip_of(members.items())
+
+
+def test_xlsx_sheets_are_read_without_their_empty_used_range(mocker):
+    cells = {
+        f"CV{i}": f'<c r="CV{i}" t="str"><f>""</f><v></v></c>' for i in range(5, 500)
+    }
+    cells["XFD1048576"] = '<c r="XFD1048576" s="1"/>'
+    get_sheet_data = mocker.spy(pd.io.excel._xlrd.XlrdReader, "get_sheet_data")
+
+    (result,) = fables.parse(_phantom_xlsx(cells), stream_file_name="phantom.xlsx")
+    assert get_sheet_data.spy_return == [["a", "b"], [1, 2], [3, 4]]
+    (expected,) = fables.parse(os.path.join(DATA_DIR, "basic.xlsx"))
+    assert not result.errors
+    pd.testing.assert_frame_equal(result.tables[0].df, expected.tables[0].df)
+
+    # ""s are values when pandas_kwargs keep them
+    list(
+        fables.parse(
+            _phantom_xlsx(cells),
+            stream_file_name="phantom.xlsx",
+            pandas_kwargs={"keep_default_na": False},
+        )
+    )
+    data = get_sheet_data.spy_return
+    assert (len(data), len(data[0])) == (499, 100)
+
+
+def _xlsb_records(data):
+    """The (id, payload) records of a BIFF12 part."""
+    stream = io.BytesIO(data)
+    while True:
+        record_id = stream.read(1)
+        if not record_id:
+            return
+        while record_id[-1] & 0x80 and len(record_id) < 4:
+            record_id += stream.read(1)
+        length = shift = 0
+        for _ in range(4):
+            (byte,) = stream.read(1)
+            length |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                break
+        yield record_id, stream.read(length)
+
+
+def _xlsb_record(record_id, payload):
+    length, encoded_length = len(payload), b""
+    while True:
+        byte, length = length & 0x7F, length >> 7
+        encoded_length += bytes([byte | (0x80 if length else 0)])
+        if not length:
+            return record_id + encoded_length + payload
+
+
+def _phantom_xlsb(num_styled_rows):
+    """basic.xlsb with its used range stretched to XFD1048576, and
+    `num_styled_rows` rows below the data holding a styled blank cell in
+    column XFD."""
+    dimension, sheet_data_end, row, blank = b"\x94\x01", b"\x92\x01", b"\x00", b"\x01"
+    with zipfile.ZipFile(os.path.join(DATA_DIR, "basic.xlsb")) as basic:
+        members = {name: basic.read(name) for name in basic.namelist()}
+    records = []
+    for record_id, payload in _xlsb_records(members["xl/worksheets/sheet1.bin"]):
+        if record_id == dimension:
+            payload = struct.pack("<4I", 0, 1048575, 0, 16383)
+        elif record_id == sheet_data_end:
+            for r in range(3, 3 + num_styled_rows):
+                records.append(_xlsb_record(row, struct.pack("<I", r)))
+                records.append(_xlsb_record(blank, struct.pack("<2I", 16383, 1)))
+        records.append(_xlsb_record(record_id, payload))
+    members["xl/worksheets/sheet1.bin"] = b"".join(records)
+    return _zip_of(members.items())
+
+
+def test_xlsb_rows_are_read_without_the_empty_used_range():
+    with pyxlsb.open_workbook(_phantom_xlsb(1000)) as workbook:
+        with workbook.get_sheet(1) as sheet:
+            assert sheet.dimension.w == 16384
+            rows = list(fables_parse._xlsb_sheet_rows(sheet))
+    assert rows == [(0, ["a", "b"]), (1, [1.0, 2.0]), (2, [3.0, 4.0])]
+
+    (result,) = fables.parse(_phantom_xlsb(1000), stream_file_name="phantom.xlsb")
+    (expected,) = fables.parse(os.path.join(DATA_DIR, "basic.xlsb"))
+    assert not result.errors
+    pd.testing.assert_frame_equal(result.tables[0].df, expected.tables[0].df)
+
+
+@pytest.fixture
+def bundle_with_copies(tmpdir):
+    """
+    bundle/
+        basic.xlsx
+        backup/basic.xlsx
+        copies.zip
+            basic.xlsx
+            renamed.xlsx
+        basic.csv
+    """
+    with open(os.path.join(DATA_DIR, "basic.xlsx"), "rb") as f:
+        xlsx = f.read()
+    bundle = tmpdir.mkdir("bundle")
+    bundle.join("basic.xlsx").write_binary(xlsx)
+    bundle.mkdir("backup").join("basic.xlsx").write_binary(xlsx)
+    with zipfile.ZipFile(str(bundle.join("copies.zip")), "w") as zf:
+        zf.writestr("basic.xlsx", xlsx)
+        zf.writestr("renamed.xlsx", xlsx)
+    with open(os.path.join(DATA_DIR, "basic.csv"), "rb") as f:
+        bundle.join("basic.csv").write_binary(f.read())
+    return str(bundle)
+
+
+def test_dedup_parses_each_content_once(mocker, bundle_with_copies):
+    expected = list(fables.parse(bundle_with_copies))
+    parse_sheet = mocker.spy(fables_parse, "parse_excel_sheet")
+
+    results = list(fables.parse(bundle_with_copies, dedup=True))
+
+    assert parse_sheet.call_count == 1
+    assert [result.name for result in results] == [result.name for result in expected]
+    xlsx_tables = [
+        table
+        for result in results
+        for table in result.tables
+        if table.name.endswith(".xlsx")
+    ]
+    assert len(xlsx_tables) == 4
+    assert all(table.df is xlsx_tables[0].df for table in xlsx_tables)
+    for result, expected_result in zip(results, expected):
+        assert [table.name for table in result.tables] == [result.name]
+        pd.testing.assert_frame_equal(result.tables[0].df, expected_result.tables[0].df)
+
+
+def test_dedup_copies_the_errors_of_duplicates():
+    with open(os.path.join(DATA_DIR, "malformed.csv"), "rb") as f:
+        data = f.read()
+    zip_stream = _zip_of([("one.csv", data), ("two.csv", data)])
+    results = list(fables.parse(zip_stream, stream_file_name="bad.zip", dedup=True))
+
+    assert [result.name for result in results] == ["bad.zip/one.csv", "bad.zip/two.csv"]
+    first, second = results
+    assert len(first.errors) == 1
+    assert second.errors[0].name == "bad.zip/two.csv"
+    assert second.errors[0].message == first.errors[0].message
+    assert second.errors[0].exception_type is pd.errors.ParserError
+
+
+def test_dedup_doesnt_keep_the_tables_the_caller_dropped():
+    with open(os.path.join(DATA_DIR, "basic.csv"), "rb") as f:
+        data = f.read()
+    zip_stream = _zip_of([("one.csv", data), ("two.csv", data), ("three.csv", data)])
+    results = fables.parse(zip_stream, stream_file_name="copies.zip", dedup=True)
+
+    first = next(results)
+    second = next(results)
+    assert second.tables[0].df is first.tables[0].df
+    first_df = weakref.ref(first.tables[0].df)
+    del first, second
+    gc.collect()
+    assert first_df() is None
+
+    # the copy is parsed again
+    (third,) = results
+    assert third.name == "copies.zip/three.csv"
+    assert third.tables[0].df.to_dict("list") == {"a": [1, 3], "b": [2, 4]}
+
+
+def test_dedup_decompresses_each_leaf_once(mocker, tmpdir):
+    with open(os.path.join(DATA_DIR, "basic.csv"), "rb") as f:
+        data = f.read()
+    for name in ["a.csv.gz", "b.csv.gz", "c.csv.gz"]:
+        tmpdir.join(name).write_binary(gzip.compress(data))
+    decompressed = []
+
+    class CountingGzipFile(gzip.GzipFile):
+        def read(self, size=-1):
+            chunk = super().read(size)
+            decompressed.append(len(chunk))
+            return chunk
+
+    def counting_decompressed(stream):
+        return CountingGzipFile(fileobj=stream, mode="rb")
+
+    mocker.patch.object(
+        fables.Gzip, "decompressed", staticmethod(counting_decompressed)
+    )
+    list(fables.parse(str(tmpdir)))
+    decompressed_without_dedup = sum(decompressed)
+    decompressed.clear()
+    parse_csv = mocker.spy(fables_parse, "parse_csv")
+    results = list(fables.parse(str(tmpdir), dedup=True))
+
+    assert parse_csv.call_count == 1
+    assert [len(result.tables) for result in results] == [1, 1, 1]
+    # the bytes are hashed as they're copied, and parsed from the copy
+    assert sum(decompressed) == decompressed_without_dedup
+
+
+def test_dedup_doesnt_share_encrypted_tables_without_the_password(tmpdir):
+    with open(os.path.join(DATA_DIR, "encrypted.xlsx"), "rb") as f:
+        data = f.read()
+    tmpdir.mkdir("open").join("encrypted.xlsx").write_binary(data)
+    tmpdir.mkdir("other").join("encrypted.xlsx").write_binary(data)
+    tmpdir.mkdir("locked").join("encrypted.xlsx").write_binary(data)
+    passwords = {
+        os.path.join("open", "encrypted.xlsx"): "fables",
+        os.path.join("other", "encrypted.xlsx"): "fables",
+        os.path.join("locked", "encrypted.xlsx"): "foobles",
+    }
+
+    results = list(fables.parse(str(tmpdir), passwords=passwords, dedup=True))
+
+    by_dir = {os.path.basename(os.path.dirname(r.name)): r for r in results}
+    assert by_dir["other"].tables[0].df is by_dir["open"].tables[0].df
+    assert not by_dir["locked"].tables
+    assert by_dir["locked"].errors
+
+
+def _zip_of(members):
+    stream = io.BytesIO()
+    with zipfile.ZipFile(stream, "w") as zf:
+        for name, data in members:
+            zf.writestr(name, data)
+    stream.seek(0)
+    return stream
+
+
+@pytest.mark.parametrize(
+    "file_name",
+    [
+        "basic.csv",
+        "basic.xlsx",
+        "basic.xls",
+        "basic.xlsb",
+        "two_sheets.xlsx",
+        "two_sheets.xls",
+        "two_sheets.xlsb",
+        "noisy_opening_rows.csv",
+        "noisy_opening_rows.xlsx",
+        "null_middle_rows.csv",
+        "null_middle_rows.xlsx",
+        "only_header.csv",
+        "only_header.xlsx",
+    ],
+)
+@pytest.mark.parametrize("preview_rows", [1, 2, 100])
+def test_previews_are_the_first_rows_of_the_tables(file_name, preview_rows):
+    path = os.path.join(DATA_DIR, file_name)
+    expected = [table for result in fables.parse(path) for table in result.tables]
+    previews = [
+        table
+        for result in fables.parse(path, preview_rows=preview_rows)
+        for table in result.tables
+    ]
+
+    assert len(previews) == len(expected)
+    for preview, table in zip(previews, expected):
+        assert preview.sheet == table.sheet
+        assert preview.truncated == (len(table.df) > preview_rows)
+        pd.testing.assert_frame_equal(preview.df, table.df.head(preview_rows))
+
+
+def _big_csv(num_noise_rows, num_rows):
+    lines = ["Payroll export,,"] + [",,"] * num_noise_rows + ["a,b,c"]
+    lines += [f"{i},{i * 2},x{i}" for i in range(num_rows)]
+    return io.BytesIO("\n".join(lines).encode("utf-8"))
+
+
+def test_csv_previews_read_a_bounded_number_of_rows(mocker):
+    read_csv = mocker.spy(pd, "read_csv")
+    (result,) = fables.parse(
+        _big_csv(0, 100_000), stream_file_name="big.csv", preview_rows=5
+    )
+    (table,) = result.tables
+    assert table.truncated
+    assert table.df["a"].tolist() == [0, 1, 2, 3, 4]
+    assert [call.kwargs["nrows"] for call in read_csv.call_args_list] == [
+        5 + fables_parse.PREVIEW_LOOKAHEAD_ROWS
+    ]
+
+
+def test_csv_previews_read_on_until_the_header():
+    (result,) = fables.parse(
+        _big_csv(300, 1000), stream_file_name="noisy.csv", preview_rows=3
+    )
+    (table,) = result.tables
+    assert not result.errors
+    assert list(table.df.columns) == ["a", "b", "c"]
+    assert table.df["c"].tolist() == ["x0", "x1", "x2"]
+
+
+def _big_xlsx(num_rows):
+    """basic.xlsx with `num_rows` rows of numbers under its header."""
+    with zipfile.ZipFile(os.path.join(DATA_DIR, "basic.xlsx")) as basic:
+        # (basic.xlsx also holds an encrypted basic.csv, which is left out)
+        members = {
+            name: basic.read(name) for name in basic.namelist() if name != "basic.csv"
+        }
+    sheet = members["xl/worksheets/sheet1.xml"].decode("utf-8")
+    header_end = sheet.index("</row>") + len("</row>")
+    rows = "".join(
+        f'<row r="{i}"><c r="A{i}"><v>{i}</v></c><c r="B{i}"><v>{-i}</v></c></row>'
+        for i in range(2, num_rows + 2)
+    )
+    sheet_data_end = sheet.index("</sheetData>")
+    sheet = sheet[:header_end] + rows + sheet[sheet_data_end:]
+    members["xl/worksheets/sheet1.xml"] = sheet.encode("utf-8")
+    return _zip_of(members.items())
+
+
+def test_xlsx_previews_stop_reading_sheets_after_the_rows_needed(mocker):
+    do_row = mocker.spy(xlrd.xlsx.X12Sheet, "do_row")
+    (result,) = fables.parse(
+        _big_xlsx(20_000), stream_file_name="big.xlsx", preview_rows=5
+    )
+    (table,) = result.tables
+    assert not result.errors
+    assert table.truncated
+    assert table.df["a"].tolist() == [2, 3, 4, 5, 6]
+    assert table.df["b"].tolist() == [-2, -3, -4, -5, -6]
+    assert do_row.call_count == 5 + fables_parse.PREVIEW_LOOKAHEAD_ROWS + 1
+
+
+def test_previews_are_truncated_in_child_processes_too():
+    (result,) = fables.parse(
+        _big_csv(0, 1000),
+        stream_file_name="big.csv",
+        preview_rows=2,
+        leaf_timeout=60,
+        isolation="process",
+    )
+    (table,) = result.tables
+    assert table.truncated
+    assert table.df["b"].tolist() == [0, 2]
+
+
+@pytest.mark.parametrize("preview_rows", [0, -1, 1.5, True])
+def test_preview_rows_must_be_a_positive_int(preview_rows):
+    with pytest.raises(ValueError):
+        list(
+            fables.parse(os.path.join(DATA_DIR, "basic.csv"), preview_rows=preview_rows)
+        )
+
+
+@pytest.mark.parametrize(
+    "file_name",
+    [
+        "basic.csv",
+        "basic.xlsx",
+        "basic.xls",
+        "basic.xlsb",
+        "noisy_opening_rows.csv",
+        "noisy_opening_rows.xlsx",
+        "string_vs_numeric_noise_before_header.csv",
+        "string_vs_numeric_noise_before_header.xlsx",
+        "null_middle_cols.csv",
+        "null_middle_rows.xlsx",
+    ],
+)
+@pytest.mark.parametrize("force_numeric", [True, False])
+def test_selections_match_selecting_from_the_parsed_tables(file_name, force_numeric):
+    path = os.path.join(DATA_DIR, file_name)
+    (table,) = [
+        table
+        for result in fables.parse(path, force_numeric=force_numeric)
+        for table in result.tables
+    ]
+    columns = list(table.df.columns)[::-1][:2]
+
+    first_value = str(table.df[columns[0]].iloc[0])
+
+    def where(df):
+        return df[columns[0]].astype(str) != first_value
+
+    for selection in [
+        {"columns": columns},
+        {"where": where},
+        {"columns": columns, "where": where},
+    ]:
+        (result,) = fables.parse(path, force_numeric=force_numeric, **selection)
+        assert not result.errors
+        expected = fables_parse.select_rows(table.df, **selection)
+        pd.testing.assert_frame_equal(result.tables[0].df, expected)
+
+
+@pytest.mark.parametrize("noise", [b"", b",,\n"])
+def test_selections_keep_blank_header_columns_with_data_past_the_first_rows(noise):
+    data = noise + b"a,b,\n" + b"1,2,\n" * 40 + b"3,4,late\n"
+    (plain,) = fables.parse(io.BytesIO(data), stream_file_name="late.csv")
+    (selected,) = fables.parse(
+        io.BytesIO(data), stream_file_name="late.csv", where=lambda df: df["a"] > 1
+    )
+    assert len(plain.tables[0].df.columns) == 3
+    expected = fables_parse.select_rows(
+        plain.tables[0].df, where=lambda df: df["a"] > 1
+    )
+    pd.testing.assert_frame_equal(selected.tables[0].df, expected)
+
+
+def _wide_csv(num_columns, num_rows):
+    header = ",".join(f"col{j}" for j in range(num_columns))
+    lines = [header] + [
+        ",".join(str(i * num_columns + j) for j in range(num_columns))
+        for i in range(num_rows)
+    ]
+    return io.BytesIO("\n".join(lines).encode("utf-8"))
+
+
+def test_csv_selections_filter_the_rows_as_they_are_read(mocker):
+    mocker.patch.object(fables_parse, "SELECTION_CHUNK_ROWS", 100)
+    read_csv = mocker.spy(pd, "read_csv")
+    seen_rows = []
+
+    def where(df):
+        seen_rows.append(len(df))
+        return df["col7"] % 3 == 0
+
+    (result,) = fables.parse(
+        _wide_csv(200, 1000),
+        stream_file_name="wide.csv",
+        columns=["col7", "col3"],
+        where=where,
+    )
+    (table,) = result.tables
+    assert list(table.df.columns) == ["col7", "col3"]
+    assert table.df["col7"].tolist() == [
+        i * 200 + 7 for i in range(1000) if (i * 200 + 7) % 3 == 0
+    ]
+    assert read_csv.call_args.kwargs["chunksize"] == 100
+    assert seen_rows == [100] * 10
+
+
+def test_selections_are_made_on_the_tables_with_clashing_pandas_kwargs(mocker):
+    selection = mocker.spy(fables_parse, "parse_csv_selection")
+    (result,) = fables.parse(
+        _wide_csv(5, 10),
+        stream_file_name="wide.csv",
+        columns=["col1"],
+        pandas_kwargs={"usecols": ["col1", "col2"]},
+    )
+    selection.assert_not_called()
+    assert list(result.tables[0].df.columns) == ["col1"]
+
+
+@pytest.mark.parametrize("noise", [b"", b",,\n"])
+def test_selections_drop_the_same_rows_whether_pushed_or_not(mocker, noise):
+    data = noise + b"a,b,c\n1,x,2\n,y,\n3,,4\n,,\n"
+    selection = mocker.spy(fables_parse, "parse_csv_selection")
+
+    def selected(**kwargs):
+        (result,) = fables.parse(
+            io.BytesIO(data), stream_file_name="f.csv", columns=["a", "c"], **kwargs
+        )
+        return result.tables[0].df
+
+    pushed = selected()
+    assert selection.call_count == 1
+    on_the_table = selected(pandas_kwargs={"dtype": object})
+    assert selection.call_count == 1
+
+    assert pd.isnull(pushed["a"].iloc[1])
+    assert len(pushed) == len(on_the_table) == 3
+    assert pushed.isnull().values.tolist() == on_the_table.isnull().values.tolist()
+
+
+def test_missing_columns_are_errors_of_their_table():
+    (result,) = fables.parse(
+        os.path.join(DATA_DIR, "two_sheets.xlsx"),
+        columns=["a"],
+        where=lambda df: df["a"] > 1,
+    )
+    assert [table.sheet for table in result.tables] == ["Sheet1"]
+    assert result.tables[0].df["a"].tolist() == [3]
+    (error,) = result.errors
+    assert error.sheet == "Sheet2"
+    assert error.exception_type is ValueError
+
+
+def test_previews_are_selected_from():
+    (result,) = fables.parse(
+        _wide_csv(5, 100), stream_file_name="wide.csv", columns=["col4"], preview_rows=2
+    )
+    (table,) = result.tables
+    assert table.truncated
+    assert table.df.to_dict("list") == {"col4": [4, 9]}
+
+
+def _small_csvs():
+    return [
+        ("jan.csv", b"id,title,salary\n1,Analyst,50000\n2,Manager,80000\n"),
+        ("feb.csv", b"id,title,salary\n3,Engineer,90000\n"),
+        ("mar.csv", b"Exported 2020-03-31\nid,title,salary\n4,Analyst,51000\n"),
+        ("apr.csv", b"a;b\n1;x\n"),
+    ]
+
+
+def test_small_csv_files_in_a_container_share_their_layouts(mocker):
+    expected = [
+        table.df
+        for name, data in _small_csvs()
+        for result in fables.parse(io.BytesIO(data), stream_file_name=name)
+        for table in result.tables
+    ]
+    sniff = mocker.spy(fables_parse, "sniff_delimiter")
+
+    results = list(fables.parse(_zip_of(_small_csvs()), stream_file_name="small.zip"))
+
+    # feb.csv was read with the layout of jan.csv
+    assert sniff.call_count == 3
+    assert len(results) == len(expected)
+    for result, expected_df in zip(results, expected):
+        pd.testing.assert_frame_equal(result.tables[0].df, expected_df)
+
+
+def test_bigger_csv_files_are_detected_on_their_own(mocker):
+    mocker.patch.object(fables_parse, "SMALL_FILE_SIZE", 10)
+    sniff = mocker.spy(fables_parse, "sniff_delimiter")
+    list(fables.parse(_zip_of(_small_csvs()), stream_file_name="small.zip"))
+    assert sniff.call_count == 4
+
+
+def test_small_csv_files_on_disk_are_read_into_memory(mocker, tmpdir):
+    for name, data in _small_csvs():
+        tmpdir.join(name).write_binary(data)
+    read_csv = mocker.spy(fables_parse.pd, "read_csv")
+    results = sorted(fables.parse(str(tmpdir)), key=lambda result: result.name)
+
+    assert all(isinstance(call.args[0], io.BytesIO) for call in read_csv.call_args_list)
+    assert [os.path.basename(result.name) for result in results] == [
+        "apr.csv",
+        "feb.csv",
+        "jan.csv",
+        "mar.csv",
+    ]
+    assert results[2].tables[0].df.to_dict("list") == {
+        "id": [1, 2],
+        "title": ["Analyst", "Manager"],
+        "salary": [50000, 80000],
+    }
+
+
+@pytest.mark.parametrize(
+    "sample, delimiter",
+    [
+        ("a,b\n1,2\n3,4\n", ","),
+        ("\ta\tb\r\n\t1\t2\r\n", "\t"),
+        ("a;b\n1,5;2,5\n", ";"),
+        ('a,b\n"x, y",2\n"multi\nline, text",3\n', ","),
+        ('a|b\n"x|""y""|z"|2\n', "|"),
+        # no delimiter, two of them, inconsistent counts, one row
+        ("a\nb\n", None),
+        ("a,b;c\n1,2;3\n", None),
+        ("a,b\n1,2,3\n", None),
+        ("a,b\n", None),
+    ],
+)
+def test_consistent_delimiter(sample, delimiter):
+    assert fables_parse.consistent_delimiter(sample) == delimiter
+
+
+def test_clevercsv_only_sniffs_ambiguous_samples(mocker):
+    import clevercsv
+
+    sniff = mocker.spy(clevercsv.Sniffer, "sniff")
+    assert fables_parse.sniff_delimiter(io.BytesIO(b"a;b\n1;2\n"), None) == ";"
+    sniff.assert_not_called()
+
+    noisy = b"Exported 2020-03-31\n\na;b\n1;2\n"
+    assert fables_parse.sniff_delimiter(io.BytesIO(noisy), None) == ";"
+    assert sniff.call_count == 1
+
+
+def test_the_sniffed_sample_grows_for_long_lines():
+    row = ";".join(["x" * 1000] * 3)
+    data = "\n".join([row] * 20).encode("utf-8")
+    bytesio = io.BytesIO(data)
+
+    sample = fables_parse._sniff_sample(bytesio, "utf-8")
+
+    assert bytesio.tell() == 0
+    assert sample.count("\n") >= fables_parse.SNIFF_MIN_ROWS
+    # the last row read was cut off, so it's left out
+    assert sample.endswith("\n")
+    assert len(sample) < fables_parse.SNIFF_MAX_SAMPLE_SIZE
+    assert fables_parse.sniff_delimiter(bytesio, None) == ";"
+
+
+def test_characters_cut_off_by_the_sample_are_left_out():
+    data = b"a,b\n" + b"1,2\n" * 1022 + b"\xc3\xa9,\xc3\xa9\n" * 10
+    with pytest.raises(UnicodeDecodeError):
+        # the sample ends with the first byte of an é
+        data[: fables_parse.SNIFF_SAMPLE_SIZE].decode("utf-8")
+    assert fables_parse.sniff_delimiter(io.BytesIO(data), "utf-8") == ","
+
+
+def test_na_strings_are_the_ones_the_pandas_reader_treats_as_missing():
+    na_strings = sorted(fables_parse.NA_STRINGS - {""})
+    data = "value\n" + "\n".join(f'"{na}"' for na in na_strings) + "\n"
+    df = pd.read_csv(io.StringIO(data), skip_blank_lines=False)
+    assert df["value"].isnull().all()
+    assert len(df) == len(na_strings)
+
+    column = np.array(na_strings + ["1"], dtype=object)
+    typed = fables_parse._typed_column(column)
+    assert typed.dtype == "float64"
+    assert np.isnan(typed[:-1]).all() and typed[-1] == 1
@@ -0,0 +1,96 @@
+import os
+
+import pytest
+from msoffcrypto.format.ooxml import ECMA376Agile
+
+from tests.context import fables  # NOQA
+from fables import passwords as passwords_module
+from tests.integration.constants import DATA_DIR
+
+
+@pytest.fixture(autouse=True)
+def empty_derived_keys():
+    passwords_module.DERIVED_KEYS.clear()
+    yield
+    passwords_module.DERIVED_KEYS.clear()
+
+
+@pytest.mark.parametrize(
+    "name,passwords,expected_candidates",
+    [
+        (None, {"*": ["a", "b"]}, []),
+        ("sub_dir/f.xlsx", {"*": ["a", "b"]}, ["a", "b"]),
+        (
+            "sub_dir/f.xlsx",
+            {"*": ["a", "b"], "f.xlsx": "c", "sub_dir/f.xlsx": ["d", "a"]},
+            ["d", "a", "c", "b"],
+        ),
+        ("sub_dir/f.xlsx", {"other.zip": ["a"], "*": ["b"]}, ["b"]),
+        (
+            "dir/a.xlsx",
+            {"other/b.xlsx": "pb", "c.xlsx": "pc", "a.xlsx": "pa"},
+            ["pa"],
+        ),
+        # with no match, only the first candidate of the longest key
+        ("dir/a.xlsx", {"other/b.xlsx": ["pb", "pb2"], "c.xlsx": "pc"}, ["pb"]),
+        ("sub_dir/f.xlsx", {"*": []}, []),
+    ],
+)
+def test_password_candidates(name, passwords, expected_candidates):
+    assert passwords_module.password_candidates(name, passwords) == expected_candidates
+
+
+def test_derived_key_cache_is_bounded():
+    cache = passwords_module.DerivedKeyCache(max_size=2)
+    cache.verified(("agile", b"salt"), "a", b"key-a")
+    cache.rejected(("agile", b"salt"), "b")
+    assert cache.lookup(("agile", b"salt"), "b") == (True, None)
+    assert cache.lookup(("agile", b"salt"), "a") == (True, b"key-a")
+    assert cache.lookup(("agile", b"other salt"), "a") == (False, None)
+
+    cache.verified(("agile", b"salt"), "c", b"key-c")
+    assert len(cache._keys) == 2
+    # "a" was used more recently than "b"
+    assert cache.lookup(("agile", b"salt"), "b") == (False, None)
+
+
+def test_xlsx_candidates_are_tried_in_order_and_their_keys_reused(mocker):
+    path = os.path.join(DATA_DIR, "encrypted.xlsx")
+    passwords = {"*": ["foobles", "fables"]}
+    make_key = mocker.spy(ECMA376Agile, "makekey_from_password")
+
+    node = fables.detect(path, passwords=passwords)
+    assert not node.encrypted
+    assert node.working_password == "fables"
+    assert make_key.call_count == 2
+
+    node = fables.detect(path, passwords=passwords)
+    assert not node.encrypted
+    assert node.password == "fables"
+    assert make_key.call_count == 2
+
+    (result,) = fables.parse(path, passwords=passwords)
+    assert not result.errors
+    assert result.tables
+    assert make_key.call_count == 2
+
+
+def test_no_candidate_decrypts_the_xlsx():
+    path = os.path.join(DATA_DIR, "encrypted.xlsx")
+    node = fables.detect(path, passwords={"*": ["foobles", "fooblez"]})
+    assert node.encrypted
+    assert node.working_password is None
+
+
+@pytest.mark.parametrize("file_name", ["encrypted.zip", "encrypted.xls"])
+def test_the_working_candidate_is_recorded(file_name):
+    path = os.path.join(DATA_DIR, file_name)
+    node = fables.detect(path, passwords={file_name: ["foobles", "fables"]})
+    assert not node.encrypted
+    assert node.working_password == "fables"
+
+
+@pytest.mark.parametrize("passwords", [{"*": 1}, {"*": ["fables", None]}])
+def test_password_values_must_be_strs_or_lists_of_strs(passwords):
+    with pytest.raises(ValueError):
+        fables.detect(os.path.join(DATA_DIR, "encrypted.zip"), passwords=passwords)
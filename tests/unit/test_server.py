@@ -0,0 +1,122 @@
+import os
+import signal
+import socket
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from tests.context import fables  # NOQA
+from fables.server import ParseClient, ParseServer, ServerError
+from tests.integration.constants import DATA_DIR
+
+
+@pytest.fixture
+def input_dir(tmp_path):
+    (tmp_path / "in").mkdir()
+    (tmp_path / "in" / "a.csv").write_bytes(b"a,b\n1,2\n3,4\n")
+    (tmp_path / "in" / "b.csv").write_bytes(b"x;y\n5;6\n")
+    return tmp_path
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    socket_path = tmp_path_factory.mktemp("server") / "fables.sock"
+    server = ParseServer(str(socket_path), workers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_workers_are_started_before_the_server_listens(server):
+    assert len(server.executor._processes) == 2
+
+
+def test_parse_writes_the_tables_of_each_file(server, input_dir):
+    output_dir = str(input_dir / "out")
+    with ParseClient(server.server_address) as client:
+        summaries = client.parse(str(input_dir / "in"), output_dir, output_format="csv")
+
+    assert sorted(os.path.basename(summary.name) for summary in summaries) == [
+        "a.csv",
+        "b.csv",
+    ]
+    assert all(not summary.errors for summary in summaries)
+    (summary,) = [s for s in summaries if s.name.endswith("a.csv")]
+    (output,) = summary.outputs
+    assert os.path.dirname(output) == output_dir
+    df = pd.read_csv(output)
+    pd.testing.assert_frame_equal(df, pd.DataFrame({"a": [1, 3], "b": [2, 4]}))
+
+
+def test_parse_writes_arrow_files_by_default(server, input_dir):
+    pytest.importorskip("pyarrow")
+    with ParseClient(server.server_address) as client:
+        (summary,) = client.parse(str(input_dir / "in" / "a.csv"), input_dir / "out")
+    (output,) = summary.outputs
+    df = pd.read_feather(output)
+    assert df["a"].tolist() == [1, 3]
+
+
+def test_detect_returns_the_tree(server):
+    with ParseClient(server.server_address) as client:
+        tree = client.detect(
+            os.path.join(DATA_DIR, "encrypted.zip"), passwords={"*": "fables"}
+        )
+    assert tree["type"] == "Zip"
+    assert not tree["encrypted"]
+    assert [child["type"] for child in tree["children"]] == ["Csv", "Xlsx"]
+
+
+def test_errors_are_raised_and_the_connection_stays_open(server, input_dir):
+    with ParseClient(server.server_address) as client:
+        with pytest.raises(ServerError) as e:
+            client.detect(str(input_dir / "missing.csv"))
+        assert "ValueError" in str(e.value)
+        with pytest.raises(ServerError):
+            client.parse(str(input_dir / "in"), input_dir / "out", output_format="xml")
+        assert client.detect(str(input_dir / "in"))["type"] == "Directory"
+
+
+def test_a_pool_with_a_dead_worker_is_replaced(tmp_path, input_dir):
+    server = ParseServer(str(tmp_path / "fables.sock"), workers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        broken = server.executor
+        os.kill(next(iter(broken._processes)), signal.SIGKILL)
+        with ParseClient(server.server_address) as client:
+            # requests may still go through on the other worker until the
+            # pool notices the dead one
+            for _ in range(100):
+                try:
+                    client.detect(str(input_dir / "in"))
+                except ServerError as e:
+                    assert "BrokenProcessPool" in str(e)
+                    break
+                time.sleep(0.05)
+            else:
+                pytest.fail("the pool never broke")
+            assert server.executor is not broken
+
+            summaries = client.parse(str(input_dir / "in"), input_dir / "out")
+            assert len(summaries) == 2 and all(not s.errors for s in summaries)
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def test_stale_sockets_are_replaced_but_live_ones_are_not(tmp_path, server):
+    stale_path = str(tmp_path / "stale.sock")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(stale_path)
+    stale.close()
+    ParseServer(stale_path).server_close()
+
+    with pytest.raises(OSError):
+        ParseServer(server.server_address)
@@ -0,0 +1,230 @@
+import io
+import os
+import random
+import threading
+
+import pandas as pd
+import pytest
+from msoffcrypto import OfficeFile
+
+from tests.context import fables  # NOQA
+from fables import streams
+from tests.integration.constants import DATA_DIR
+
+
+def _data(size):
+    return bytes(random.Random(size).getrandbits(8) for _ in range(size))
+
+
+@pytest.mark.parametrize("read_ahead", [0, 2])
+def test_reads_and_seeks_match_the_wrapped_stream(read_ahead):
+    data = _data(10_000)
+    expected = io.BytesIO(data)
+    cached = streams.BlockCachedStream(
+        io.BytesIO(data), block_size=64, capacity=8, read_ahead=read_ahead
+    )
+    rng = random.Random(0)
+    for _ in range(500):
+        whence = rng.choice([io.SEEK_SET, io.SEEK_CUR, io.SEEK_END])
+        offset = rng.randint(0, 500) * (1 if whence == io.SEEK_SET else -1)
+        if whence == io.SEEK_CUR:
+            offset = max(offset, -expected.tell())
+        assert cached.seek(offset, whence) == expected.seek(offset, whence)
+        size = rng.choice([-1, 0, 1, 63, 64, 65, 300])
+        assert cached.read(size) == expected.read(size)
+        assert cached.tell() == expected.tell()
+
+
+def test_a_miss_reads_ahead_in_one_fetch():
+    slow = streams.HighLatencyStream(_data(1000), latency=0)
+    cached = streams.BlockCachedStream(slow, block_size=100, capacity=10, read_ahead=4)
+
+    assert cached.read(10) == slow._data.getvalue()[:10]
+    assert (cached.stats.misses, cached.stats.fetches) == (1, 1)
+    assert cached.stats.bytes_fetched == 500
+
+    # the next four blocks were read ahead
+    cached.read(490)
+    assert (cached.stats.hits, cached.stats.fetches) == (5, 1)
+    assert cached.stats.hit_rate == 5 / 6
+
+    # a read spanning missing blocks fetches them together
+    cached.read(-1)
+    assert cached.stats.fetches == 2
+    assert cached.stats.bytes_fetched == 1000
+
+
+def test_the_cache_keeps_the_most_recently_used_blocks():
+    slow = streams.HighLatencyStream(_data(1000), latency=0)
+    cached = streams.BlockCachedStream(slow, block_size=100, capacity=2, read_ahead=0)
+    for position in [0, 100, 0, 200, 0]:
+        cached.seek(position)
+        cached.read(1)
+    # block 1 was evicted when block 2 was read, block 0 never was
+    assert cached.stats.misses == 3
+    cached.seek(100)
+    cached.read(1)
+    assert cached.stats.misses == 4
+
+
+def test_only_remote_streams_are_wrapped():
+    slow = streams.HighLatencyStream(b"a,b\n1,2\n", latency=0)
+    wrapped = streams.cached_stream(slow)
+    assert isinstance(wrapped, streams.BlockCachedStream)
+    assert streams.cached_stream(wrapped) is wrapped
+
+    bytesio = io.BytesIO(b"")
+    assert streams.cached_stream(bytesio) is bytesio
+    with open(os.path.join(DATA_DIR, "basic.csv"), "rb") as f:
+        assert streams.cached_stream(f) is f
+
+
+@pytest.mark.parametrize("file_name", ["basic.csv", "basic.zip", "basic.xlsx"])
+def test_parse_reads_remote_streams_through_the_cache(mocker, file_name):
+    with open(os.path.join(DATA_DIR, file_name), "rb") as f:
+        data = f.read()
+    expected = [
+        table.df
+        for result in fables.parse(io.BytesIO(data), stream_file_name=file_name)
+        for table in result.tables
+    ]
+
+    slow = streams.HighLatencyStream(data, latency=0, name=file_name)
+    actual = [table.df for result in fables.parse(slow) for table in result.tables]
+    cached_reads = slow.reads
+
+    mocker.patch("fables.api.cached_stream", side_effect=lambda stream: stream)
+    uncached = streams.HighLatencyStream(data, latency=0, name=file_name)
+    list(fables.parse(uncached))
+
+    assert len(actual) == len(expected)
+    for actual_df, expected_df in zip(actual, expected):
+        pd.testing.assert_frame_equal(actual_df, expected_df)
+    assert cached_reads < uncached.reads
+
+
+class UploadStream(io.RawIOBase):
+    """A non-seekable stream giving `data` in `chunk_size` pieces, which
+    waits for `resume` after the first one."""
+
+    def __init__(self, data, chunk_size, resume=None):
+        chunks = io.BytesIO(data)
+        self.chunks = list(iter(lambda: chunks.read(chunk_size), b""))
+        self.resume = resume
+        self.chunks_read = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if self.chunks_read == 1 and self.resume is not None:
+            self.resume.wait()
+        if self.chunks_read == len(self.chunks):
+            return b""
+        self.chunks_read += 1
+        return self.chunks[self.chunks_read - 1]
+
+
+@pytest.mark.parametrize("file_name", ["basic.csv", "basic.zip", "basic.xlsx"])
+def test_non_seekable_streams_are_spooled(file_name):
+    with open(os.path.join(DATA_DIR, file_name), "rb") as f:
+        data = f.read()
+    expected = [
+        table.df
+        for result in fables.parse(io.BytesIO(data), stream_file_name=file_name)
+        for table in result.tables
+    ]
+
+    upload = UploadStream(data, chunk_size=1000)
+    node = fables.detect(upload, stream_file_name=file_name)
+    assert node.name == file_name
+    actual = [table.df for result in fables.parse(tree=node) for table in result.tables]
+
+    assert len(actual) == len(expected)
+    for actual_df, expected_df in zip(actual, expected):
+        pd.testing.assert_frame_equal(actual_df, expected_df)
+
+
+def test_the_head_is_available_before_the_stream_ends():
+    resume = threading.Event()
+    data = _data(5000)
+    spooler = streams.StreamSpooler(
+        UploadStream(data, chunk_size=2000, resume=resume),
+        max_size=10_000,
+        head_size=1000,
+    )
+    assert spooler.head() == data[:1000]
+    resume.set()
+    spooled, size, too_big = spooler.result()
+    assert (spooled.read(), size, too_big) == (data, 5000, False)
+
+
+def test_big_streams_are_spooled_to_a_temporary_file():
+    data = _data(5000)
+    spooler = streams.StreamSpooler(
+        UploadStream(data, chunk_size=1000),
+        max_size=10_000,
+        head_size=100,
+        memory_size=2500,
+    )
+    spooled, size, too_big = spooler.result()
+    assert not isinstance(spooled, io.BytesIO)
+    assert spooled.read() == data
+
+
+def test_the_size_limit_is_enforced_while_spooling(mocker):
+    mocker.patch("fables.api.MAX_FILE_SIZE", 2500)
+    upload = UploadStream(_data(100_000), chunk_size=1000)
+    with pytest.raises(ValueError) as e:
+        fables.detect(upload)
+    assert "MAX_FILE_SIZE" in str(e.value)
+    assert upload.chunks_read == 3
+
+
+def _agile_package(password="fables"):
+    """The decrypted bytes of encrypted.xlsx, and a stream of its plaintext
+    that decrypts one segment at a time."""
+    with open(os.path.join(DATA_DIR, "encrypted.xlsx"), "rb") as f:
+        office_file = OfficeFile(io.BytesIO(f.read()))
+    office_file.load_key(password=password)
+    decrypted = io.BytesIO()
+    office_file.decrypt(decrypted)
+    stream = streams.AgileDecryptedStream(
+        office_file.file.openstream("EncryptedPackage"),
+        key=office_file.secret_key,
+        key_data_salt=office_file.info["keyDataSalt"],
+        hash_algorithm=office_file.info["keyDataHashAlgorithm"],
+        capacity=1,
+        read_ahead=0,
+    )
+    return decrypted.getvalue(), stream
+
+
+def test_agile_packages_are_decrypted_as_they_are_read():
+    plaintext, stream = _agile_package()
+    assert stream.size == len(plaintext) > 2 * streams.AGILE_SEGMENT_SIZE
+
+    stream.seek(5000)
+    assert stream.read(10) == plaintext[5000:5010]
+    # only the second segment was decrypted
+    assert stream.stats.bytes_fetched == streams.AGILE_SEGMENT_SIZE
+
+    expected = io.BytesIO(plaintext)
+    rng = random.Random(0)
+    for _ in range(200):
+        position = rng.randint(0, len(plaintext))
+        size = rng.choice([-1, 1, 100, 4096, 5000])
+        stream.seek(position)
+        expected.seek(position)
+        assert stream.read(size) == expected.read(size)
+
+
+def test_decrypted_xlsx_files_are_not_copied_into_memory():
+    node = fables.detect(
+        os.path.join(DATA_DIR, "encrypted.xlsx"), passwords={"*": ["foobles", "fables"]}
+    )
+    assert not node.encrypted
+    with node.stream as stream:
+        assert isinstance(stream, streams.AgileDecryptedStream)
+    (result,) = fables.parse(tree=node)
+    assert result.tables[0].df.columns.tolist() == ["a", "b"]
@@ -0,0 +1,90 @@
+import mmap
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.context import fables  # NOQA
+from fables import transport
+from tests.integration.constants import DATA_DIR
+
+
+@pytest.fixture
+def shared_directory():
+    directory = transport.make_shared_directory()
+    yield directory
+    transport.remove_shared_directory(directory)
+
+
+@pytest.fixture
+def mixed_df():
+    df = pd.DataFrame(
+        {
+            "id": np.arange(4),
+            "rate": [1.5, np.nan, 2.5, 3.0],
+            "name": ["a", "b", None, "d"],
+            "active": [True, False, True, True],
+            "hired": pd.to_datetime(["2020-01-01"] * 4),
+            "bonus": pd.array([1, None, 3, 4], dtype="Int64"),
+        }
+    )
+    df.columns = ["id", "rate", "name", "id", "hired", "bonus"]
+    return df
+
+
+def test_a_shared_table_loads_equal_to_the_original(shared_directory, mixed_df):
+    table = fables.Table(df=mixed_df, name="f.xlsx", sheet="Sheet1")
+    shared = transport.share_table(table, shared_directory)
+
+    kinds = [type(column) for column in shared.data]
+    assert kinds.count(transport.SharedColumn) == 4
+
+    loaded = transport.load_table(shared)
+    assert (loaded.name, loaded.sheet) == ("f.xlsx", "Sheet1")
+    pd.testing.assert_frame_equal(loaded.df, mixed_df)
+
+
+def _is_mapped(values):
+    while values is not None:
+        if isinstance(values, (np.memmap, mmap.mmap)):
+            return True
+        values = values.base
+    return False
+
+
+def test_loaded_columns_are_mapped_and_their_files_removed(shared_directory):
+    df = pd.DataFrame({"a": np.arange(1000.0), "b": np.arange(1000)})
+    shared = transport.share_table(fables.Table(df=df), shared_directory)
+    assert len(os.listdir(shared_directory)) == 2
+
+    loaded = transport.load_table(shared).df
+
+    assert not os.listdir(shared_directory)
+    assert _is_mapped(loaded["a"].values)
+    # copy-on-write mappings can still be modified in the parent
+    loaded.loc[0, "a"] = -1.0
+    assert loaded["a"].iloc[0] == -1.0
+    assert df["a"].iloc[0] == 0.0
+
+
+def test_process_isolation_returns_mapped_tables():
+    path = os.path.join(DATA_DIR, "basic.csv")
+    (expected,) = [result.tables[0].df for result in fables.parse(path)]
+    (result,) = fables.parse(path, leaf_timeout=30, isolation="process")
+
+    assert not result.errors
+    df = result.tables[0].df
+    pd.testing.assert_frame_equal(df, expected)
+    numeric = [column for column in df.columns if df[column].dtype != object]
+    assert numeric and all(_is_mapped(df[column].values) for column in numeric)
+
+
+def test_loaded_columns_of_one_dtype_are_not_consolidated(shared_directory):
+    df = pd.DataFrame({name: np.arange(100.0) * i for i, name in enumerate("abcd")})
+    df["e"] = np.arange(100)
+    shared = transport.share_table(fables.Table(df=df), shared_directory)
+    loaded = transport.load_table(shared).df
+
+    pd.testing.assert_frame_equal(loaded, df)
+    assert all(_is_mapped(loaded[column].values) for column in df.columns)
@@ -1,6 +1,18 @@
+import gzip
+import io
+import os
+import tarfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
 import pytest
 
 from tests.context import fables
+from fables.results import ParseResult
+from tests.integration.constants import DATA_DIR
 
 
 @pytest.mark.parametrize(
@@ -99,6 +111,20 @@ def test_add_password_to_node():
     assert node.passwords == {"basic.zip": "fables", "nested.zip": "foobles"}
 
 
+def test_nodes_dont_share_a_default_passwords_dict():
+    node = fables.FileNode(name="basic.zip")
+    node.add_password(name="basic.zip", password="fables")
+    assert fables.FileNode(name="other.zip").passwords == {}
+
+
+def test_detect_doesnt_add_the_password_to_the_callers_dict():
+    passwords = {"*": "foobles"}
+    fables.detect(
+        os.path.join(DATA_DIR, "encrypted.zip"), password="fables", passwords=passwords
+    )
+    assert passwords == {"*": "foobles"}
+
+
 def test_node_str():
     node = fables.Xls(name="basic.xls", mimetype="application/vnd.ms-excel")
     assert str(node) == "Xls(name=basic.xls, mimetype=application/vnd.ms-excel)"
@@ -110,3 +136,270 @@ def test_node_str():
 def test_mimetype_from_stream_for_empty_stream():
     mimetype = fables.mimetype_from_stream(None)
     assert mimetype is None
+
+
+def test_each_thread_detects_with_its_own_magic_handle():
+    handle = fables.tree._magic_handle()
+    assert fables.tree._magic_handle() is handle
+
+    # both pool threads are running at once, so neither reuses the other's
+    barrier = threading.Barrier(2)
+
+    def thread_handle(_):
+        barrier.wait()
+        return fables.tree._magic_handle()
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        handles = list(pool.map(thread_handle, range(2)))
+    assert len({id(h) for h in handles + [handle]}) == 3
+
+
+def test_concurrent_detection_gives_the_same_mimetypes():
+    names = ["basic.xlsx", "basic.xls", "basic.zip", "basic.xlsb", "basic_tab_sep.tsv"]
+    data = {}
+    for name in names:
+        with open(os.path.join(DATA_DIR, name), "rb") as f:
+            data[name] = f.read()
+    expected = {name: fables.tree.mimetype_from_bytes(data[name]) for name in names}
+
+    def detect(name):
+        return name, fables.tree.mimetype_from_bytes(data[name])
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        detected = list(pool.map(detect, names * 20))
+    assert all(mimetype == expected[name] for name, mimetype in detected)
+
+
+@pytest.mark.parametrize(
+    "mimetype",
+    [
+        "application/zip",
+        "application/encrypted",
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "application/vnd.ms-excel.sheet.binary.macroEnabled.12",
+        "application/vnd.ms-excel",
+        "application/CDFV2",
+        "text/plain",
+        "image/png",
+        None,
+    ],
+)
+@pytest.mark.parametrize(
+    "extension", ["zip", "xlsx", "XLSX", "xlsb", "xls", "csv", "tsv", "png", None]
+)
+def test_registry_matches_the_node_type_heuristics(mimetype, extension):
+    expected = None
+    for node_type in fables.NODE_TYPES.node_types:
+        if node_type.is_my_mimetype_or_extension(mimetype, extension):
+            expected = node_type
+            break
+    assert fables.NODE_TYPES.node_type_for(mimetype, extension) is expected
+
+
+def test_registry_order_is_explicit():
+    assert fables.NODE_TYPES.node_types == [
+        fables.Zip,
+        fables.Tar,
+        fables.Gzip,
+        fables.Bz2,
+        fables.Xz,
+        fables.Xlsx,
+        fables.Xlsb,
+        fables.Xls,
+        fables.Csv,
+    ]
+
+
+class JsonLines(fables.MimeTypeFileNode):
+    MIMETYPES = ["application/x-ndjson", "application/json", "text/plain"]
+    EXTENSIONS = ["jsonl"]
+
+
+def _visit_json_lines(visitor, node):
+    with node.stream as bytesio:
+        df = pd.read_json(bytesio, lines=True)
+    yield ParseResult(
+        name=node.name, tables=[fables.Table(df=df, name=node.name)], errors=[]
+    )
+
+
+@pytest.fixture
+def json_lines_registered():
+    registry = fables.NodeTypeRegistry()
+    registry.register(fables.Csv)
+    registry.register(JsonLines, priority=1)
+    yield registry
+
+
+def test_registry_prefers_higher_priority_types(json_lines_registered):
+    assert json_lines_registered.node_type_for("text/plain", "jsonl") is JsonLines
+    assert json_lines_registered.node_type_for("text/plain", "csv") is fables.Csv
+
+
+def test_reregistering_moves_a_type_to_the_end_of_its_priority():
+    registry = fables.NodeTypeRegistry()
+    registry.register(fables.Zip)
+    registry.register(fables.Csv)
+    registry.register(fables.Zip)
+    assert registry.node_types == [fables.Csv, fables.Zip]
+
+    registry.unregister(fables.Csv)
+    registry.register(fables.Tar)
+    registry.register(fables.Csv)
+    registry.register(JsonLines, priority=1)
+    assert registry.node_types == [JsonLines, fables.Zip, fables.Tar, fables.Csv]
+    assert registry.node_type_for("text/plain", "csv") is fables.Csv
+
+
+def test_register_node_type_makes_detect_and_parse_use_it():
+    fables.register_node_type(JsonLines, visit=_visit_json_lines, priority=1)
+    try:
+        stream = io.BytesIO(b'{"a": 1, "b": 2}\n{"a": 3, "b": 4}\n')
+        node = fables.detect(stream, stream_file_name="rows.jsonl")
+        assert isinstance(node, JsonLines)
+        (result,) = fables.parse(tree=node)
+        assert result.tables[0].df["b"].tolist() == [2, 4]
+    finally:
+        fables.NODE_TYPES.unregister(JsonLines)
+    assert not isinstance(
+        fables.detect(io.BytesIO(b"a,b\n1,2\n"), stream_file_name="rows.jsonl"),
+        JsonLines,
+    )
+
+
+def _zip_of(members):
+    stream = io.BytesIO()
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members:
+            zf.writestr(name, data)
+    stream.seek(0)
+    return stream
+
+
+@pytest.mark.parametrize(
+    "prefetch_members,prefetch_bytes,max_in_flight",
+    [(0, 1024, 1), (3, 1024**2, 4), (3, 2500, 3)],
+)
+def test_zip_members_are_prefetched_in_order_within_bounds(
+    mocker, prefetch_members, prefetch_bytes, max_in_flight
+):
+    members = [(f"m{i}.csv", b"a,b\n" + b"1,2\n" * 250) for i in range(10)]
+    mocker.patch.object(fables.Zip, "PREFETCH_MEMBERS", prefetch_members)
+    mocker.patch.object(fables.Zip, "PREFETCH_BYTES", prefetch_bytes)
+
+    started = []
+    consumed = []
+    child_node = fables.Zip._child_node
+
+    def recording_child_node(self, zf, info):
+        started.append(info.filename)
+        return child_node(self, zf, info)
+
+    mocker.patch.object(fables.Zip, "_child_node", recording_child_node)
+
+    node = fables.detect(_zip_of(members), stream_file_name="members.zip")
+    for child in node.children:
+        # give the prefetching threads time to run ahead
+        time.sleep(0.01)
+        consumed.append(child)
+        assert len(started) - len(consumed) < max_in_flight
+
+    assert [child.name for child in consumed] == [
+        f"members.zip/{name}" for name, _ in members
+    ]
+    for child, (_, data) in zip(consumed, members):
+        with child.stream as child_stream:
+            assert child_stream.read() == data
+
+
+def test_zip_prefetch_errors_become_extract_errors(mocker):
+    mocker.patch.object(fables.Zip, "PREFETCH_MEMBERS", 2)
+    with open(os.path.join(DATA_DIR, "encrypted.zip"), "rb") as f:
+        node = fables.Zip(name="encrypted.zip", stream=io.BytesIO(f.read()))
+    node.add_password("encrypted.zip", "foobles")
+    assert list(node.children) == []
+    assert node.extract_errors[0].exception_type is RuntimeError
+
+
+def test_zips_share_one_prefetch_pool(mocker):
+    mocker.patch.object(fables.Zip, "PREFETCH_MEMBERS", 2)
+    inner = _zip_of([(f"m{i}.csv", b"a,b\n1,2\n") for i in range(5)]).getvalue()
+    outer = _zip_of([(f"inner{i}.zip", inner) for i in range(3)])
+
+    threads = set()
+    child_node = fables.Zip._child_node
+
+    def recording_child_node(self, zf, info):
+        threads.add(threading.current_thread())
+        return child_node(self, zf, info)
+
+    mocker.patch.object(fables.Zip, "_child_node", recording_child_node)
+
+    for _ in range(3):
+        node = fables.detect(outer, stream_file_name="outer.zip")
+        members = [member for child in node.children for member in child.children]
+        assert len(members) == 15
+        outer.seek(0)
+
+    # 12 zips were read, on the threads of one pool (sized by the
+    # PREFETCH_MEMBERS of whichever test used it first)
+    assert len(threads) <= 4
+    assert all(thread.name.startswith("fables-prefetch") for thread in threads)
+
+
+def _tar_of(members):
+    stream = io.BytesIO()
+    with tarfile.open(fileobj=stream, mode="w") as tf:
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return stream.getvalue()
+
+
+def test_compressed_file_types_must_implement_decompressed():
+    with pytest.raises(TypeError):
+        fables.CompressedFile(name="data.csv.gz", stream=io.BytesIO())
+
+    class Plain(fables.CompressedFile):
+        EXTENSIONS = ["plain"]
+
+        @staticmethod
+        def decompressed(stream):
+            return stream
+
+    node = Plain(name="data.csv.plain", stream=io.BytesIO(b"a,b\n1,2\n"))
+    (child,) = node.children
+    assert child.name == "data.csv"
+
+
+def test_passwords_apply_to_the_members_of_compressed_tars():
+    with open(os.path.join(DATA_DIR, "encrypted.xlsx"), "rb") as f:
+        data = gzip.compress(_tar_of([("dump/encrypted.xlsx", f.read())]))
+
+    node = fables.detect(
+        io.BytesIO(data),
+        stream_file_name="dump.tgz",
+        passwords={"dump/encrypted.xlsx": "fables"},
+    )
+    (tar,) = node.children
+    assert isinstance(tar, fables.Tar)
+    assert tar.name == "dump.tar"
+    (results,) = fables.parse(tree=node)
+    assert results.name == "dump.tar/dump/encrypted.xlsx"
+    assert not results.errors
+    assert results.tables
+
+
+@pytest.mark.parametrize(
+    "data,name",
+    [
+        (gzip.compress(b"a,b\n1,2\n" * 1000)[:-50], "truncated.csv.gz"),
+        (_tar_of([("a.csv", b"a,b\n1,2\n" * 1000)])[:1000], "truncated.tar"),
+    ],
+)
+def test_corrupt_streamed_containers_give_extract_errors(data, name):
+    node = fables.detect(io.BytesIO(data), stream_file_name=name)
+    assert node.IS_CONTAINER
+    list(fables.parse(tree=node))
+    assert node.extract_errors
@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from tests.context import fables
+
+
+@pytest.fixture
+def tree_dir(tmp_path):
+    """
+    tmp_path/
+        a.csv
+        b.xlsx
+        big.csv
+        backup/
+            a.csv
+        sub/
+            c.csv
+            deeper/
+                d.csv
+    """
+    (tmp_path / "a.csv").write_bytes(b"a,b\n1,2\n")
+    (tmp_path / "b.xlsx").write_bytes(b"not really a workbook")
+    (tmp_path / "big.csv").write_bytes(b"a,b\n" + b"1,2\n" * 1000)
+    (tmp_path / "backup").mkdir()
+    (tmp_path / "backup" / "a.csv").write_bytes(b"a,b\n1,2\n")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "c.csv").write_bytes(b"a,b\n1,2\n")
+    (tmp_path / "sub" / "deeper").mkdir()
+    (tmp_path / "sub" / "deeper" / "d.csv").write_bytes(b"a,b\n1,2\n")
+    return str(tmp_path)
+
+
+def _scanned_names(path, directory_filter):
+    return [entry.name for entry in fables.walk.scan_directory(path, directory_filter)]
+
+
+def test_scan_directory_without_a_filter_lists_all_entries_sorted(tree_dir):
+    assert _scanned_names(tree_dir, None) == [
+        "a.csv",
+        "b.xlsx",
+        "backup",
+        "big.csv",
+        "sub",
+    ]
+
+
+@pytest.mark.parametrize(
+    "directory_filter,expected_names",
+    [
+        (
+            fables.DirectoryFilter(extensions=[".CSV"]),
+            ["a.csv", "backup", "big.csv", "sub"],
+        ),
+        (
+            fables.DirectoryFilter(exclude=["backup", "*.xlsx"]),
+            ["a.csv", "big.csv", "sub"],
+        ),
+        (fables.DirectoryFilter(include=["a.*"]), ["a.csv", "backup", "sub"]),
+        (
+            fables.DirectoryFilter(max_file_size=100),
+            ["a.csv", "b.xlsx", "backup", "sub"],
+        ),
+        (fables.DirectoryFilter(max_depth=0), ["a.csv", "b.xlsx", "big.csv"]),
+    ],
+)
+def test_scan_directory_applies_the_filter(tree_dir, directory_filter, expected_names):
+    assert _scanned_names(tree_dir, directory_filter) == expected_names
+
+
+def _leaf_names(node):
+    children = list(node.children)
+    if not children:
+        return [node.name]
+    return [name for child in children for name in _leaf_names(child)]
+
+
+def test_directory_respects_max_depth(tree_dir):
+    node = fables.detect(tree_dir, directory_filter=fables.DirectoryFilter(max_depth=1))
+    leaf_names = {os.path.relpath(name, tree_dir) for name in _leaf_names(node)}
+    assert os.path.join("sub", "c.csv") in leaf_names
+    assert not any(
+        name.startswith(os.path.join("sub", "deeper")) for name in leaf_names
+    )
+
+
+def test_threaded_detection_keeps_the_sequential_order(tree_dir):
+    sequential = fables.detect(tree_dir)
+    threaded = fables.detect(tree_dir, workers=4)
+    assert _leaf_names(sequential) == _leaf_names(threaded)
+    assert [type(child) for child in sequential.children] == [
+        type(child) for child in threaded.children
+    ]